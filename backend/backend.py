@@ -1,68 +1,156 @@
-from flask import Flask, send_file, jsonify, after_this_request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 import dotenv
 import json
 import os
 import sys
+import tempfile
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from programs import helpers
-from programs import itemizer
-from programs import clone_summary as get_files
-from programs.codetours import generate_codetour, parse_prompt_1
+from programs.analysis_cache import AnalysisCache
+from programs.llm_cache import LLMCache
+from programs.jobs import JobQueue, QueueFullError, DEFAULT_MAX_WORKERS, DEFAULT_MAX_QUEUE_DEPTH
+from programs.metrics import REGISTRY
+from programs.pipeline import generate_tour
+from programs.repo_data import is_local_source
+
+dotenv.load_dotenv()
 
 app = Flask(__name__)
 CORS(app, origins='http://localhost:3000') # Only accept requests from localhost port 3000 (React.js app)
 
+# Shared across requests so files analyzed or summarized once are never
+# parsed or sent to the LLM again
+analysis_cache = AnalysisCache()
+llm_cache = LLMCache()
+
+# Counters and histograms served at /metrics, on unless GITOURS_METRICS=0
+REGISTRY.enabled = os.getenv('GITOURS_METRICS', '1') != '0'
+
+# Off unless GITOURS_SAVE_RECORDS=1. Then every job saves its maps and LLM
+# prompts to its own directory under RECORD_DIR, so concurrent workers never
+# overwrite each other's records; nothing cleans these up
+SAVE_RECORDS = os.getenv('GITOURS_SAVE_RECORDS', '0') == '1'
+RECORD_DIR = os.getenv('GITOURS_RECORD_DIR', 'data')
+
+def run_pipeline(repo_url: str, commit: str = None, on_event=None) -> dict :
+    record_dir = RECORD_DIR
+    if SAVE_RECORDS:
+        os.makedirs(RECORD_DIR, exist_ok=True)
+        record_dir = tempfile.mkdtemp(prefix='job-', dir=RECORD_DIR)
+    return generate_tour(repo_url, commit=commit, analysis_cache=analysis_cache, llm_cache=llm_cache,
+                         save_record=SAVE_RECORDS, on_event=on_event, record_dir=record_dir)
+
+# Bounded worker pool, e.g. GITOURS_JOB_WORKERS=4 GITOURS_MAX_QUEUE_DEPTH=32
+jobs = JobQueue(run_pipeline,
+                max_workers=int(os.getenv('GITOURS_JOB_WORKERS', DEFAULT_MAX_WORKERS)),
+                max_queue_depth=int(os.getenv('GITOURS_MAX_QUEUE_DEPTH', DEFAULT_MAX_QUEUE_DEPTH)))
+
 @app.route('/')
 def hello_world():
     return 'Hello, World!'
 
+def _submit(repo_url: str, commit: str = None):
+    """
+    Queue (or reuse) a job. Returns (job, None) or (None, error response).
+    """
+    if is_local_source(repo_url):
+        # local directories and archives are for the CLI, never for web clients
+        return None, (jsonify({"error": f"URL is invalid: {repo_url}"}), 400)
+    try:
+        job, created = jobs.submit(repo_url, commit)
+    except helpers.InvalidUrlError as e:
+        return None, (jsonify({"error": str(e)}), 400)
+    except QueueFullError as e:
+        return None, (jsonify({"error": str(e)}), 429, {'Retry-After': '30'})
+
+    print(f"{'Queued' if created else 'Reusing'} job {job.id} for {job.key[0]} @ {job.key[1]}")
+    return job, None
+
+def _accepted(job):
+    return jsonify({
+        "job_id":       job.id,
+        "status":       job.status,
+        "status_url":   f"/jobs/{job.id}",
+        "events_url":   f"/jobs/{job.id}/events"
+    }), 202, {'Location': f"/jobs/{job.id}"}
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    body = request.get_json(silent=True) or {}
+    if not body.get('repo'):
+        return jsonify({"error": 'Expected a JSON body like {"repo": "https://github.com/owner/repo"}'}), 400
+
+    job, error = _submit(body['repo'], body.get('commit'))
+    if error is not None:
+        return error
+    return _accepted(job)
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """
+    Server-sent events for a job: stage progress, summarization chunks,
+    CodeTour steps as soon as each chunk is parsed, then the finished tour.
+    Reconnecting clients resume after the Last-Event-ID they received.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+
+    last_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id', ''))
+    start = int(last_id) + 1 if last_id.isdigit() else 0
+
+    def stream():
+        nonlocal start
+        while True:
+            events = job.wait_events(start, timeout=15)
+            for i, (event, data) in enumerate(events, start):
+                yield f"id: {i}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+            start += len(events)
+            if not events:
+                if job.done.is_set():
+                    return
+                yield ": keep-alive\n\n"
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Prometheus text exposition format
+    if not REGISTRY.enabled:
+        return jsonify({"error": "Metrics are disabled (GITOURS_METRICS=0)"}), 404
+    for status, count in jobs.counts().items():
+        REGISTRY.set('gitours_jobs', count, status=status)
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/retrieve/<path:repolink>', methods=['POST'])
+def retrieve_async(repolink):
+    job, error = _submit("https://" + repolink, request.args.get('commit'))
+    if error is not None:
+        return error
+    return _accepted(job)
+
 @app.route('/retrieve/<path:repolink>', methods=['GET'])
 def retrieve(repolink):
-    dotenv.load_dotenv()
+    # Kept for older clients: a finished job's tour comes back directly,
+    # anything else is accepted like POST and never holds the request open
+    job, error = _submit("https://" + repolink, request.args.get('commit'))
+    if error is not None:
+        return error
 
-    try:
-        cleaned_url = helpers.convert_git_url_to_cloner("https://" + repolink)
-        print(f"Cleaned URL: {cleaned_url}")
-
-        repo = itemizer.generate_repo_mappings(repo_url=cleaned_url, save_record=True)
-        get_files.get_repo_json_tempfile(repo)
-        git_file_json = repo.get_repo_json_data()
-
-        cross_path = os.path.join(repo.get_mapping_path(), 'cross_reference.json')
-        with open(cross_path, "r", encoding="utf-8") as f:
-            cross_reference = json.load(f)
-
-        llm_response_1 = get_files.summarize_with_llm_2(
-            cross_ref_dict=cross_reference,
-            repo_summary_dict=git_file_json
-        )
-
-        codetour_data = parse_prompt_1(data=llm_response_1)
-        codetour = generate_codetour(data=codetour_data, repo=repo)
-        
-        output_path = os.path.join(repo.get_mapping_path(), 'codetour_output.tour')
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(codetour, f, indent=2)
-
-        print(f"Codetour successfully written to: {output_path}")
-
-        @after_this_request
-        def cleanup(response):
-            try:
-                print("Cleaning up after request...")
-                repo._close()
-            except Exception as e:
-                print("Cleanup error:", e)
-            return response
-
-        return jsonify(codetour), 200
-        # return send_file(output_path, mimetype='application/json', as_attachment=True)
-
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return jsonify({"error": str(e)}), 400
+    if job.done.is_set():
+        if job.status == 'failed':
+            return jsonify({"error": job.error}), 400
+        return jsonify(job.result), 200
+    return _accepted(job)
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
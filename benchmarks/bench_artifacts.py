@@ -0,0 +1,81 @@
+"""
+Cost of handing analysis results between stages through JSON temp files
+(indent=2 dump of every map and the repo summary, then json.load of
+cross_reference.json and repo_summary.json) versus passing RepoArtifacts in
+memory, plus the cost of the opt-in compact persistence formats.
+
+Usage (from the project root):
+    python -m benchmarks.bench_artifacts --files 1000
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from programs import itemizer
+from programs.artifacts import ARTIFACT_NAMES
+from programs.scanner import scan_project
+from benchmarks.synthetic_repo import generate_repo
+
+
+def _measure(func) -> tuple :
+    # tracemalloc slows allocation down a lot, so time and memory are separate runs
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+def _repo_summary(scans: dict) -> dict :
+    return {path: {'path': path, 'name': os.path.basename(path), 'type': '.py', 'content': scan['content']}
+            for path, scan in scans.items()}
+
+def _temp_file_round_trip(artifacts, out_dir: str) -> None :
+    # What generate_repo_mappings / get_repo_json_tempfile used to do
+    for name in ARTIFACT_NAMES:
+        with open(os.path.join(out_dir, f'{name}.json'), 'w', encoding='utf-8') as f:
+            json.dump(getattr(artifacts, name), f, indent=2)
+    for name in ('cross_reference', 'repo_summary'):
+        with open(os.path.join(out_dir, f'{name}.json'), 'r', encoding='utf-8') as f:
+            json.load(f)
+
+def _dir_size(path: str) -> int :
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+def main() -> None :
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=1000)
+    args = parser.parse_args()
+
+    root_dir = tempfile.mkdtemp()
+    out_dir = tempfile.mkdtemp()
+    try :
+        generate_repo(root_dir, file_count=args.files)
+        scans = scan_project(root_dir)
+        artifacts = itemizer.build_mappings(root_dir, scans)
+        artifacts.repo_summary = _repo_summary(scans)
+
+        rows = [('temp-file round trip (old)', *_measure(lambda: _temp_file_round_trip(artifacts, out_dir)),
+                 _dir_size(out_dir))]
+        for fmt in ('json', 'ndjson'):
+            shutil.rmtree(out_dir)
+            os.mkdir(out_dir)
+            rows.append((f'opt-in save ({fmt})', *_measure(lambda: artifacts.save(out_dir, fmt)), _dir_size(out_dir)))
+        rows.append(('in-memory (default)', 0.0, 0, 0))
+
+        print(f'{"handoff":<28} {"seconds":>8} {"peak MiB":>9} {"disk MiB":>9}')
+        for label, elapsed, peak, size in rows:
+            print(f'{label:<28} {elapsed:>8.3f} {peak / 1024 ** 2:>9.1f} {size / 1024 ** 2:>9.1f}')
+    finally :
+        shutil.rmtree(root_dir, ignore_errors=True)
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
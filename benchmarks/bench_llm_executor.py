@@ -0,0 +1,37 @@
+"""
+Throughput benchmark for the concurrent LLM executor against a local fake
+OpenAI-compatible server.
+
+Usage (from the project root):
+    python -m benchmarks.bench_llm_executor --requests 32 --latency 0.25
+"""
+import argparse
+import time
+
+from programs.llm_executor import HTTPChatClient, LLMExecutor
+from benchmarks.fake_openai_server import FakeOpenAIServer
+
+
+def main() -> None :
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=32)
+    parser.add_argument('--latency', type=float, default=0.25)
+    parser.add_argument('--error-rate', type=float, default=0.1)
+    parser.add_argument('--max-concurrency', type=int, default=16)
+    args = parser.parse_args()
+
+    requests = [("system", f"prompt {i}") for i in range(args.requests)]
+    print(f'{"concurrency":>11} {"seconds":>8} {"req/s":>8} {"retries":>8}')
+    with FakeOpenAIServer(latency=args.latency, error_rate=args.error_rate) as server :
+        concurrency = 1
+        while concurrency <= args.max_concurrency:
+            executor = LLMExecutor(HTTPChatClient(server.base_url), max_concurrency=concurrency,
+                                   timeout=10, base_delay=0.05, max_retries=10)
+            start = time.perf_counter()
+            executor.run(requests)
+            elapsed = time.perf_counter() - start
+            print(f'{concurrency:>11} {elapsed:>8.2f} {args.requests / elapsed:>8.1f} {executor.retries:>8}')
+            concurrency *= 2
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Scaling benchmark for parallel per-file analysis.
+
+Usage (from the project root):
+    python -m benchmarks.bench_parallel --files 2000 --max-workers 8
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from programs import itemizer
+from programs.scanner import scan_project
+from benchmarks.synthetic_repo import generate_repo
+
+
+def _time_scan(root_dir: str, workers: int, repeat: int) -> float :
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        scan_project(root_dir, workers=workers)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main() -> None :
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=1000)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    root_dir = tempfile.mkdtemp()
+    try :
+        generate_repo(root_dir, file_count=args.files)
+
+        # The parallel result must be identical to the serial one.
+        serial = scan_project(root_dir, workers=1)
+        parallel = scan_project(root_dir, workers=max(2, args.max_workers))
+        assert json.dumps(itemizer.analyze_usages(root_dir, scans=serial)) == \
+               json.dumps(itemizer.analyze_usages(root_dir, scans=parallel))
+        assert json.dumps(itemizer.analyze_project(root_dir, scans=serial)) == \
+               json.dumps(itemizer.analyze_project(root_dir, scans=parallel))
+
+        baseline = _time_scan(root_dir, 1, args.repeat)
+        print(f'{"workers":>8} {"seconds":>10} {"speedup":>8}')
+        workers = 1
+        while workers <= args.max_workers:
+            elapsed = baseline if workers == 1 else _time_scan(root_dir, workers, args.repeat)
+            print(f'{workers:>8} {elapsed:>10.3f} {baseline / elapsed:>8.2f}x')
+            workers *= 2
+    finally :
+        shutil.rmtree(root_dir)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+"""
+Stage-by-stage benchmark of the whole pipeline on a synthetic repository,
+with a fake in-process LLM returning canned summaries.
+
+Every stage records its best wall time over --repeat runs, the process
+peak RSS after it and the size of its output as JSON. Results are written
+to --output; with --baseline the run fails (exit code 1) when any stage is
+slower, bigger or uses more memory than the baseline by more than
+--threshold.
+
+Usage (from the project root):
+    python -m benchmarks.bench_pipeline --files 200 --output bench.json
+    python -m benchmarks.bench_pipeline --update-baseline
+    python -m benchmarks.bench_pipeline --baseline benchmarks/baseline.json --threshold 0.25
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+try :
+    import resource
+except ImportError :
+    # Not available on Windows; peak RSS is then not recorded.
+    resource = None
+
+from programs import itemizer
+from programs import clone_summary as get_files
+from programs.codetours import generate_codetour, parse_prompt_1
+from programs.cross_reference import CrossReferenceIndex
+from programs.import_resolver import build_module_index
+from programs.llm_executor import LLMExecutor
+from programs.repo_data import gitRepo
+from programs.scanner import scan_project
+from benchmarks.fake_openai_server import FakeChatClient
+from benchmarks.synthetic_repo import generate_repo
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+DEFAULT_THRESHOLD = 0.25
+
+# Timing differences below this many seconds are noise, never regressions.
+MIN_SECONDS_DELTA = 0.05
+
+
+def _peak_rss() -> int :
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def _output_bytes(output) -> int :
+    if isinstance(output, str):
+        return len(output.encode('utf-8'))
+    try :
+        return len(json.dumps(output, separators=(',', ':')))
+    except TypeError :
+        return None
+
+def _commit_repo(root_dir: str) -> None :
+    git = ["git", "-C", root_dir, "-c", "user.name=bench", "-c", "user.email=bench@localhost"]
+    subprocess.run(git[:3] + ["init", "-q"], check=True)
+    subprocess.run(git[:3] + ["add", "-A"], check=True)
+    subprocess.run(git + ["commit", "-q", "-m", "synthetic repo"], check=True)
+
+def run_benchmark(files: int, symbols: int, call_density: int, package_depth: int,
+                  seed: int = 0, repeat: int = 1, verbose: bool = False) -> dict :
+    """
+    Generate the synthetic repo and time every pipeline stage on it.
+    """
+    stages = {}
+    work_dir = tempfile.mkdtemp()
+    source_dir = os.path.join(work_dir, 'repo')
+    output = contextlib.ExitStack()
+    if not verbose:
+        output.enter_context(contextlib.redirect_stdout(io.StringIO()))
+        output.enter_context(contextlib.redirect_stderr(io.StringIO()))
+
+    def stage(name: str, func, repeats: int = repeat):
+        best, result = float('inf'), None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = func()
+            best = min(best, time.perf_counter() - start)
+        stages[name] = {
+            'seconds':          round(best, 4),
+            'peak_rss_bytes':   _peak_rss(),
+            'output_bytes':     _output_bytes(result),
+        }
+        return result
+
+    repo = None
+    try :
+        with output :
+            generate_repo(source_dir, file_count=files, symbols_per_file=symbols,
+                          call_density=call_density, package_depth=package_depth, seed=seed)
+            _commit_repo(source_dir)
+
+            # cloning is not repeated, it would leave extra checkouts behind
+            repo = stage('clone', lambda: gitRepo(source_dir, clone_mode='full'), repeats=1)
+            stages['clone']['output_bytes'] = None
+            root = repo.get_repo_path()
+
+            scans = stage('scan_project', lambda: scan_project(root))
+            module_index = build_module_index(root, scans.keys())
+            reference_map = stage('analyze_project',
+                                  lambda: itemizer.analyze_project(root, scans=scans, module_index=module_index))
+            usage_map = stage('analyze_usages', lambda: itemizer.analyze_usages(root, scans=scans))
+            stage('combine_maps', lambda: itemizer.combine_maps(reference_map, usage_map))
+            stage('generate_global_cross_reference',
+                  lambda: itemizer.generate_global_cross_reference(reference_map, usage_map))
+            cross_reference = stage('cross_reference_index', lambda: CrossReferenceIndex(
+                reference_map, scans, root, module_index).to_cross_reference())
+
+            repo.set_scans(scans)
+            stage('get_repo_json_tempfile', lambda: get_files.get_repo_json_tempfile(repo).get_repo_json_data())
+            repo_summary = repo.get_repo_json_data()
+            symbol_table = get_files.build_symbol_table(repo_summary, scans)
+
+            client = FakeChatClient()
+            response = stage('summarize_with_llm_2', lambda: get_files.summarize_with_llm_2(
+                cross_reference, repo_summary, executor=LLMExecutor(client=client)))
+            data = stage('parse_prompt_1', lambda: parse_prompt_1(response, symbol_table))
+            stage('generate_codetour', lambda: generate_codetour(list(data), repo))
+    finally :
+        if repo is not None:
+            with contextlib.redirect_stdout(io.StringIO()) :
+                repo._close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'params': {
+            'files':            files,
+            'symbols':          symbols,
+            'call_density':     call_density,
+            'package_depth':    package_depth,
+            'seed':             seed,
+        },
+        'stages':           stages,
+        'total_seconds':    round(sum(s['seconds'] for s in stages.values()), 4),
+    }
+
+def compare(results: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list :
+    """
+    Regressions of results against baseline, as readable strings.
+    """
+    if results['params'] != baseline['params']:
+        return [f"parameters differ from the baseline: {results['params']} vs {baseline['params']}"]
+
+    regressions = []
+    for name, base in baseline['stages'].items():
+        current = results['stages'].get(name)
+        if current is None:
+            continue
+        for metric in ('seconds', 'peak_rss_bytes', 'output_bytes'):
+            old, new = base.get(metric), current.get(metric)
+            if not old or new is None or new <= old * (1 + threshold):
+                continue
+            if metric == 'seconds' and new - old < MIN_SECONDS_DELTA:
+                continue
+            regressions.append(f"{name}: {metric} {old} -> {new} (+{new / old - 1:.0%})")
+    return regressions
+
+def main() -> None :
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--symbols', type=int, default=10, help='symbols per file')
+    parser.add_argument('--call-density', type=int, default=5, help='calls per function')
+    parser.add_argument('--package-depth', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage, the best time is kept')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='compare against this results file and fail on regressions')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed relative increase over the baseline (default %(default)s)')
+    parser.add_argument('--update-baseline', action='store_true', help=f'store the results as {DEFAULT_BASELINE}')
+    parser.add_argument('--verbose', action='store_true', help='show the pipeline output')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.files, args.symbols, args.call_density, args.package_depth,
+                            seed=args.seed, repeat=args.repeat, verbose=args.verbose)
+
+    print(f'{"stage":<32} {"seconds":>9} {"peak RSS MiB":>13} {"output KiB":>11}')
+    for name, stage in results['stages'].items():
+        rss = f'{stage["peak_rss_bytes"] / 1024 ** 2:.1f}' if stage['peak_rss_bytes'] is not None else '-'
+        size = f'{stage["output_bytes"] / 1024:.1f}' if stage['output_bytes'] is not None else '-'
+        print(f'{name:<32} {stage["seconds"]:>9.4f} {rss:>13} {size:>11}')
+    print(f'{"total":<32} {results["total_seconds"]:>9.4f}')
+
+    for path in filter(None, [args.output, DEFAULT_BASELINE if args.update_baseline else None]):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f'Results written to {path}')
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'\n{len(regressions)} regression(s) beyond {args.threshold:.0%} against {args.baseline}:')
+            for regression in regressions:
+                print(f' - {regression}')
+            sys.exit(1)
+        print(f'\nNo regressions beyond {args.threshold:.0%} against {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
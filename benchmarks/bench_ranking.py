@@ -0,0 +1,61 @@
+"""
+Speed of the local symbol ranking (graph build, PageRank, tour order) on a
+synthetic repository, next to the analysis stages it runs after.
+
+Usage (from the project root):
+    python -m benchmarks.bench_ranking --files 600 --top-k 40
+"""
+import argparse
+import contextlib
+import io
+import shutil
+import tempfile
+import time
+
+from programs import itemizer
+from programs import ranking
+from programs.clone_summary import build_symbol_table
+from programs.scanner import scan_project
+from benchmarks.synthetic_repo import generate_repo
+
+
+def _timed(func) -> tuple :
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def main() -> None :
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=600)
+    parser.add_argument('--symbols', type=int, default=10)
+    parser.add_argument('--call-density', type=int, default=5)
+    parser.add_argument('--top-k', type=int, default=ranking.DEFAULT_TOP_K)
+    args = parser.parse_args()
+
+    root_dir = tempfile.mkdtemp()
+    try :
+        generate_repo(root_dir, file_count=args.files, symbols_per_file=args.symbols, call_density=args.call_density)
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()) :
+            scans, scan_seconds = _timed(lambda: scan_project(root_dir, workers=0))
+            artifacts, map_seconds = _timed(lambda: itemizer.build_mappings(root_dir, scans))
+        summary = {path: {'content': scan['content']} for path, scan in scans.items()}
+        symbols = build_symbol_table(summary, scans)
+
+        (nodes, edges, members), graph_seconds = _timed(
+            lambda: ranking.build_symbol_graph(symbols, scans, artifacts.index))
+        scores, pagerank_seconds = _timed(lambda: ranking.pagerank(len(nodes), edges))
+        result, rank_seconds = _timed(lambda: ranking.rank_symbols(symbols, scans, artifacts.index, args.top_k))
+
+        print(f'{len(scans)} files, {result["nodes"]} symbols, {result["edges"]} symbol edges, '
+              f'{len(artifacts.cross_reference)} cross-reference edges')
+        print(f'{"stage":<28} {"seconds":>8}')
+        for label, seconds in (('scan_project', scan_seconds), ('build_mappings', map_seconds),
+                               ('build_symbol_graph', graph_seconds), ('pagerank', pagerank_seconds),
+                               (f'rank_symbols (top {args.top_k})', rank_seconds)):
+            print(f'{label:<28} {seconds:>8.3f}')
+    finally :
+        shutil.rmtree(root_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Peak memory of the streaming analysis (programs.streaming) against the
+in-memory maps on a large synthetic repository. Each mode runs in its own
+process so their peaks do not mix. Exits with status 1 if the streaming
+peak RSS goes over --max-rss-mib, so it can guard the memory ceiling in CI.
+
+Usage (from the project root):
+    python -m benchmarks.bench_streaming --files 600 --memory-limit-mb 64 --max-rss-mib 128
+"""
+import argparse
+import contextlib
+import io
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+try :
+    import resource
+except ImportError :
+    # Not available on Windows; peak RSS is then not recorded.
+    resource = None
+
+from benchmarks.synthetic_repo import generate_repo
+
+
+def _peak_rss() -> int :
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def _child(mode: str, root_dir: str, out_dir: str, memory_limit_mb: int) -> None :
+    # runs in the measured process, reports on stdout as one JSON line
+    from programs import itemizer
+    from programs.cross_reference import CrossReferenceIndex
+    from programs.scanner import scan_project
+    from programs.streaming import stream_mappings
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()) :
+        if mode == 'streaming':
+            stream_mappings(root_dir, out_dir, memory_limit_mb)
+        else:
+            scans = scan_project(root_dir)
+            reference_map = itemizer.analyze_project(root_dir, scans=scans)
+            usage_map = itemizer.analyze_usages(root_dir, scans=scans)
+            itemizer.combine_maps(reference_map, usage_map)
+            CrossReferenceIndex(reference_map, scans, root_dir).to_cross_reference()
+    print(json.dumps({'seconds': round(time.perf_counter() - start, 3), 'peak_rss_bytes': _peak_rss()}))
+
+def _measure(mode: str, root_dir: str, out_dir: str, memory_limit_mb: int) -> dict :
+    output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_streaming', '--child', mode,
+                             root_dir, out_dir, str(memory_limit_mb)], check=True, capture_output=True, text=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def main() -> None :
+    if len(sys.argv) == 6 and sys.argv[1] == '--child':
+        _child(sys.argv[2], sys.argv[3], sys.argv[4], int(sys.argv[5]))
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=600)
+    parser.add_argument('--symbols', type=int, default=10, help='symbols per file')
+    parser.add_argument('--call-density', type=int, default=5, help='calls per function')
+    parser.add_argument('--memory-limit-mb', type=int, default=64, help='ceiling given to the streaming analysis')
+    parser.add_argument('--max-rss-mib', type=float, default=128, help='fail if the streaming peak RSS is higher')
+    parser.add_argument('--skip-in-memory', action='store_true', help='only measure the streaming analysis')
+    args = parser.parse_args()
+
+    root_dir = tempfile.mkdtemp()
+    out_dir = tempfile.mkdtemp()
+    try :
+        generate_repo(root_dir, file_count=args.files, symbols_per_file=args.symbols,
+                      call_density=args.call_density)
+        results = {'streaming': _measure('streaming', root_dir, out_dir, args.memory_limit_mb)}
+        if not args.skip_in_memory:
+            results['in-memory'] = _measure('in-memory', root_dir, out_dir, args.memory_limit_mb)
+    finally :
+        shutil.rmtree(root_dir, ignore_errors=True)
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    print(f'{"mode":<12} {"seconds":>8} {"peak RSS MiB":>13}')
+    for mode, result in results.items():
+        rss = f'{result["peak_rss_bytes"] / 1024 ** 2:.1f}' if result['peak_rss_bytes'] is not None else '-'
+        print(f'{mode:<12} {result["seconds"]:>8.3f} {rss:>13}')
+
+    peak = results['streaming']['peak_rss_bytes']
+    if peak is not None and peak > args.max_rss_mib * 1024 ** 2:
+        print(f"Streaming peak RSS {peak / 1024 ** 2:.1f} MiB is over the {args.max_rss_mib} MiB limit")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
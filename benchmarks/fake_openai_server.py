@@ -0,0 +1,108 @@
+"""
+Local fake of the OpenAI /v1/chat/completions endpoint for benchmarks.
+
+Every request sleeps for a fixed latency and answers with canned content.
+A fraction of requests can be rejected with 429 to exercise retries.
+FakeChatClient gives the same canned summaries in-process, without HTTP.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def canned_summaries(prompt: str) -> str :
+    """
+    Canned response to a summarization prompt (clone_summary.build_prompt_1):
+    one core section per symbol ID of every python file in the prompt's
+    repo_summary.json, in the format of PROMPT_ONE.
+    """
+    files = json.loads(prompt.rsplit('repo_summary.json:\n', 1)[1])
+    response = {}
+    order = 0
+    for path, entry in files.items():
+        if not entry.get('symbol_ids'):
+            continue
+        sections = response[path] = {}
+        for qualname in entry['symbol_ids']:
+            order += 1
+            sections[qualname] = {
+                "order": order,
+                "summary": f"Summary of {qualname} in {path}.",
+                "core": True
+            }
+    return json.dumps(response)
+
+
+class FakeChatClient:
+    """
+    In-process LLM client (see llm_executor.OpenAIChatClient) returning
+    canned_summaries after a fixed latency.
+    """
+    def __init__(self, latency: float = 0.0) -> None:
+        self.model = 'fake'
+        self.latency = latency
+        self.requests = 0
+
+    def __call__(self, system_prompt: str, prompt: str, timeout: float = None) -> str :
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return canned_summaries(prompt)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        with server.lock:
+            server.requests += 1
+            rejected = server.rng.random() < server.error_rate
+
+        time.sleep(server.latency)
+        if rejected:
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.end_headers()
+            return
+
+        content = server.respond(body) if server.respond else '{}'
+        payload = json.dumps({"choices": [{"message": {"role": "assistant", "content": content}}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeOpenAIServer:
+    """
+    Context manager running the fake server on a free localhost port.
+    base_url is suitable for programs.llm_executor.HTTPChatClient.
+    """
+    def __init__(self, latency: float = 0.2, error_rate: float = 0.0, respond=None, seed: int = 0) -> None:
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.error_rate = error_rate
+        self.httpd.respond = respond
+        self.httpd.rng = random.Random(seed)
+        self.httpd.lock = threading.Lock()
+        self.httpd.requests = 0
+        self.base_url = f'http://127.0.0.1:{self.httpd.server_address[1]}/v1'
+
+    @property
+    def requests(self) -> int :
+        return self.httpd.requests
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
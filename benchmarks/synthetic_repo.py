@@ -0,0 +1,60 @@
+import os
+import random
+
+
+def generate_repo(root_dir: str, file_count: int = 200, symbols_per_file: int = 10,
+                  call_density: int = 5, package_depth: int = 2, seed: int = 0) -> str :
+    """
+    Generate a synthetic Python project under root_dir for benchmarking.
+
+    Files are spread over nested packages package_depth levels deep. Each file
+    defines symbols_per_file functions/classes and every function makes
+    call_density calls to symbols defined in other (imported) files.
+    """
+    rng = random.Random(seed)
+    os.makedirs(root_dir, exist_ok=True)
+
+    modules = []
+    for i in range(file_count):
+        packages = [f'pkg{(i // (10 ** (depth + 1))) % 10}_{depth}' for depth in range(package_depth)]
+        modules.append(packages + [f'mod{i}'])
+
+    for parts in modules:
+        for depth in range(1, len(parts)):
+            init_path = os.path.join(root_dir, *parts[:depth], '__init__.py')
+            if not os.path.exists(init_path):
+                os.makedirs(os.path.dirname(init_path), exist_ok=True)
+                with open(init_path, 'w', encoding='utf-8') as f:
+                    f.write('')
+
+    for i, parts in enumerate(modules):
+        targets = [rng.randrange(file_count) for _ in range(3)]
+        lines = [f'"""Synthetic module {i}."""', 'import os']
+        for t in targets:
+            lines.append(f'from {".".join(modules[t])} import func_{t}_0, Class_{t}_1')
+        lines.append('')
+        lines.append(f'CONSTANT_{i} = {i}')
+        lines.append('')
+
+        for s in range(symbols_per_file):
+            calls = []
+            for _ in range(call_density):
+                t = rng.choice(targets)
+                calls.append(rng.choice([f'func_{t}_0()', f'Class_{t}_1().method_a()', 'os.path.join("a", "b")']))
+            body = '\n'.join(f'    {call}' for call in calls) or '    pass'
+            if s % 2:
+                lines.append(f'class Class_{i}_{s}:')
+                lines.append('    def method_a(self):')
+                lines.append('\n'.join(f'    {line}' for line in body.split('\n')))
+                lines.append('    def method_b(self, value):')
+                lines.append('        return self.method_a() or value')
+            else:
+                lines.append(f'def func_{i}_{s}(*args, **kwargs):')
+                lines.append(f'    """Synthetic function {s}."""')
+                lines.append(body)
+            lines.append('')
+
+        with open(os.path.join(root_dir, *parts) + '.py', 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines))
+
+    return root_dir
@@ -53,8 +53,33 @@ export default function page() {
                                 // Make a request to Python Backend
                                 // Example Input Link: https://github.com/indmdev/Free-Telegram-Store-Bot
                                 const backEndRoute = `http://127.0.0.1:5000/retrieve/${inputLink}`
-                                fetch(backEndRoute)
-                                    .then(response => response.json()).then(data => {
+                                // The backend queues the summarization and streams its progress as server-sent events
+                                const followJob = (eventsUrl) => new Promise((resolve, reject) => {
+                                    const source = new EventSource(`http://127.0.0.1:5000${eventsUrl}`)
+                                    let stepCount = 0
+                                    source.addEventListener('stage', event => console.log('Stage', JSON.parse(event.data)))
+                                    source.addEventListener('steps', event => {
+                                        stepCount += JSON.parse(event.data).steps.length
+                                        console.log(`${stepCount} tour steps ready`)
+                                    })
+                                    source.addEventListener('tour', event => {
+                                        source.close()
+                                        resolve(JSON.parse(event.data).tour)
+                                    })
+                                    source.addEventListener('status', event => {
+                                        const data = JSON.parse(event.data)
+                                        if (data.status === 'failed') {
+                                            source.close()
+                                            reject(new Error(data.error))
+                                        }
+                                    })
+                                })
+                                fetch(backEndRoute, { method: 'POST' })
+                                    .then(response => {
+                                        if (!response.ok) throw new Error(`Request failed with status ${response.status}`)
+                                        return response.json()
+                                    })
+                                    .then(job => followJob(job.events_url)).then(data => {
                                         console.log(data);
                                         console.log(JSON.stringify(data))
                                         setJsonFileText(JSON.stringify(data))
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+import time
+
+from .metrics import REGISTRY
+
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'gitours', 'analysis.sqlite3')
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2
+
+
+def hash_blob(data: bytes) -> str :
+    """
+    Git blob SHA-1 of raw file contents (same as "git hash-object").
+    """
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+def git_blob_shas(root_dir: str) -> dict :
+    """
+    Map tracked file paths (relative, OS separators) to their git blob SHA
+    using a single "git ls-files" call. Files modified in the working tree
+    (e.g. a local checkout analyzed in place) are left out, since their
+    index SHA no longer matches their content. Returns {} if root_dir is
+    not a git checkout.
+    """
+    try :
+        output = subprocess.run(["git", "-C", root_dir, "ls-files", "-s", "-z"],
+                                check=True, capture_output=True).stdout
+        modified = subprocess.run(["git", "-C", root_dir, "ls-files", "-m", "-z"],
+                                  check=True, capture_output=True).stdout
+    except (subprocess.CalledProcessError, OSError) :
+        return {}
+
+    modified = {os.path.normpath(path.decode('utf-8', 'surrogateescape')) for path in modified.split(b'\0') if path}
+    shas = {}
+    for entry in output.split(b'\0'):
+        if not entry:
+            continue
+        meta, path = entry.split(b'\t', 1)
+        path = os.path.normpath(path.decode('utf-8', 'surrogateescape'))
+        if path not in modified:
+            shas[path] = meta.split()[1].decode()
+    return shas
+
+
+class AnalysisCache:
+    '''
+    On-disk, content-addressed cache of per-file scan results.
+
+    Entries are keyed by the git blob SHA of the file plus the scanner
+    version, so unchanged files (across commits or forks) are never parsed
+    twice. The raw file content is not stored. The cache is bounded to
+    max_bytes and evicts the least recently used entries.
+    '''
+    def __init__(self, path: str = None, max_bytes: int = None) -> None:
+        self.path = path or os.getenv('GITOURS_ANALYSIS_CACHE', DEFAULT_CACHE_PATH)
+        self.max_bytes = max_bytes if max_bytes is not None else DEFAULT_MAX_BYTES
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS scans (
+                key         TEXT PRIMARY KEY,
+                value       TEXT NOT NULL,
+                size        INTEGER NOT NULL,
+                last_used   REAL NOT NULL
+            )''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS scans_last_used ON scans (last_used)')
+        self._conn.commit()
+
+    @staticmethod
+    def _key(blob_sha: str, version: int) -> str :
+        return f'{version}:{blob_sha}'
+
+    def get_many(self, blob_shas: list, version: int) -> dict :
+        '''
+        Look up cached scans for blob_shas. Returns {blob_sha: scan} for hits
+        and updates the hit/miss counters.
+        '''
+        found = {}
+        keys = {self._key(sha, version): sha for sha in set(blob_shas)}
+        key_list = list(keys)
+        with self._lock :
+            # stay below SQLite's bound parameter limit
+            for i in range(0, len(key_list), 500):
+                chunk = key_list[i:i + 500]
+                rows = self._conn.execute(
+                    f'SELECT key, value FROM scans WHERE key IN ({",".join("?" * len(chunk))})', chunk)
+                for key, value in rows:
+                    found[keys[key]] = json.loads(value)
+            now = time.time()
+            self._conn.executemany('UPDATE scans SET last_used = ? WHERE key = ?',
+                                   [(now, self._key(sha, version)) for sha in found])
+            self._conn.commit()
+
+        hits = sum(1 for sha in blob_shas if sha in found)
+        self.hits += hits
+        self.misses += len(blob_shas) - hits
+        REGISTRY.inc('gitours_cache_lookups_total', hits, cache='analysis', result='hit')
+        REGISTRY.inc('gitours_cache_lookups_total', len(blob_shas) - hits, cache='analysis', result='miss')
+        return found
+
+    def put_many(self, scans: dict, version: int) -> None :
+        '''
+        Store {blob_sha: scan} (content is dropped) and evict if over budget.
+        '''
+        now = time.time()
+        rows = []
+        for sha, scan in scans.items():
+            value = json.dumps({k: v for k, v in scan.items() if k not in ('path', 'content')},
+                               separators=(',', ':'))
+            rows.append((self._key(sha, version), value, len(value), now))
+        with self._lock :
+            self._conn.executemany('INSERT OR REPLACE INTO scans VALUES (?, ?, ?, ?)', rows)
+            self._conn.commit()
+        self.evict()
+
+    def size(self) -> int :
+        with self._lock :
+            return self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM scans').fetchone()[0]
+
+    def evict(self) -> int :
+        '''
+        Drop least recently used entries until the cache fits in max_bytes.
+        Returns the number of evicted entries.
+        '''
+        with self._lock :
+            total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM scans').fetchone()[0]
+            if total <= self.max_bytes :
+                return 0
+            evicted = []
+            for key, size in self._conn.execute('SELECT key, size FROM scans ORDER BY last_used'):
+                if total <= self.max_bytes :
+                    break
+                evicted.append((key,))
+                total -= size
+            self._conn.executemany('DELETE FROM scans WHERE key = ?', evicted)
+            self._conn.commit()
+        return len(evicted)
+
+    def stats(self) -> dict :
+        lookups = self.hits + self.misses
+        return {
+            'hits':     self.hits,
+            'misses':   self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'bytes':    self.size()
+        }
+
+    def close(self) -> None :
+        with self._lock :
+            self._conn.close()
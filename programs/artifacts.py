@@ -0,0 +1,186 @@
+import json
+import os
+import threading
+from array import array
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+
+from .cross_reference import CrossReferenceIndex
+
+
+# Persistence formats for RepoArtifacts.save:
+#   json    - one compact (unindented) JSON document per artifact
+#   ndjson  - one JSON value per line: list items, or [key, value] pairs for maps
+ARTIFACT_FORMATS = ('json', 'ndjson')
+
+# Artifacts written by RepoArtifacts.save, in order
+ARTIFACT_NAMES = ('reference_map', 'usage_map', 'combined_map', 'cross_reference', 'repo_summary', 'symbols', 'ranking')
+
+
+class _NDJSONFile:
+    '''
+    Random access to the lines of an NDJSON file by byte offset, through
+    one lazily opened handle.
+    '''
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _lines(self) :
+        # (offset, raw line) of every non-empty line, in file order
+        offset = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    yield offset, line
+                offset += len(line)
+
+    def _read(self, offset: int) :
+        with self._lock :
+            if self._file is None:
+                self._file = open(self.path, 'rb')
+            self._file.seek(offset)
+            return json.loads(self._file.readline())
+
+    def close(self) -> None :
+        with self._lock :
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class NDJSONList(_NDJSONFile, Sequence):
+    '''
+    Read-only list view of an NDJSON file of list items (see
+    RepoArtifacts.save). Only the line offsets are kept in memory, items
+    are decoded on access and iteration streams the file.
+    '''
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self._offsets = array('q', (offset for offset, _ in self._lines()))
+
+    def __len__(self) -> int :
+        return len(self._offsets)
+
+    def __getitem__(self, i) :
+        if isinstance(i, slice):
+            return [self._read(offset) for offset in self._offsets[i]]
+        return self._read(self._offsets[i])
+
+    def __iter__(self) :
+        for _, line in self._lines():
+            yield json.loads(line)
+
+
+class NDJSONMap(_NDJSONFile, Mapping):
+    '''
+    Read-only dict view of an NDJSON file of [key, value] pairs (see
+    RepoArtifacts.save). Only the keys and their line offsets are kept in
+    memory, values are decoded on access and items() streams the file.
+    '''
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self._offsets = {json.loads(line)[0]: offset for offset, line in self._lines()}
+
+    def __len__(self) -> int :
+        return len(self._offsets)
+
+    def __getitem__(self, key) :
+        return self._read(self._offsets[key])[1]
+
+    def __iter__(self) :
+        return iter(self._offsets)
+
+    def __contains__(self, key) -> bool :
+        return key in self._offsets
+
+    def items(self) :
+        for _, line in self._lines():
+            key, value = json.loads(line)
+            yield key, value
+
+
+@dataclass
+class RepoArtifacts:
+    '''
+    In-memory result of analyzing one repository, handed from stage to stage
+    instead of being written to and re-read from JSON files.
+
+    scans and index are kept so the result can be patched incrementally
+    (see itemizer.update_mappings). repo_summary and symbols, the symbol
+    table tour steps are joined against, are filled in by
+    clone_summary.get_repo_json_tempfile, ranking by ranking.rank_symbols.
+    repo_summary is an NDJSONMap over a temporary file.
+
+    A streamed result (see itemizer.stream_repo_mappings) holds only the
+    cross_reference, as an NDJSONList, its other maps stay on disk; scans
+    is None and index is the streaming.SpillIndex.
+    '''
+    reference_map:      dict
+    usage_map:          dict
+    combined_map:       dict
+    cross_reference:    list
+    scans:              dict
+    index:              CrossReferenceIndex = None
+    commit:             str = None
+    repo_summary:       dict = field(default=None)
+    symbols:            dict = field(default=None)
+    ranking:            dict = field(default=None)
+
+    def save(self, out_dir: str, fmt: str = 'json') -> dict :
+        '''
+        Write the artifacts to out_dir in a compact format (see
+        ARTIFACT_FORMATS). Returns {artifact name: path}.
+        '''
+        if fmt not in ARTIFACT_FORMATS :
+            raise ValueError(f"Unknown artifact format: {fmt}")
+        os.makedirs(out_dir, exist_ok=True)
+
+        paths = {}
+        for name in ARTIFACT_NAMES:
+            data = getattr(self, name)
+            if data is None:
+                continue
+            path = os.path.join(out_dir, f'{name}.{fmt}')
+            is_map = isinstance(data, Mapping)
+            with open(path, "w", encoding="utf-8") as f:
+                if fmt == 'json' and isinstance(data, (dict, list)):
+                    json.dump(data, f, separators=(',', ':'))
+                elif fmt == 'json':
+                    # lazy NDJSON views are written one item at a time
+                    f.write('{' if is_map else '[')
+                    for i, item in enumerate(data.items() if is_map else data):
+                        f.write(',' if i else '')
+                        f.write(json.dumps(item[0]) + ':' + json.dumps(item[1], separators=(',', ':')) if is_map
+                                else json.dumps(item, separators=(',', ':')))
+                    f.write('}' if is_map else ']')
+                else:
+                    for item in (data.items() if is_map else data):
+                        f.write(json.dumps(list(item) if is_map else item,
+                                           separators=(',', ':')))
+                        f.write('\n')
+            paths[name] = path
+        return paths
+
+    def close(self) -> None :
+        '''
+        Close the spill index of a streamed result and the files behind
+        lazily read artifacts, if any.
+        '''
+        for data in (self.index, self.cross_reference, self.repo_summary):
+            close = getattr(data, 'close', None)
+            if close is not None:
+                close()
+
+    @staticmethod
+    def load(path: str):
+        '''
+        Read back one artifact written by save.
+        '''
+        with open(path, "r", encoding="utf-8") as f:
+            if not path.endswith('.ndjson'):
+                return json.load(f)
+            items = [json.loads(line) for line in f if line.strip()]
+        name = os.path.basename(path)[:-len('.ndjson')]
+        return dict(items) if name != 'cross_reference' else items
@@ -0,0 +1,271 @@
+"""
+Generate tours for many repositories in one process.
+
+Sources (GitHub URLs, local directories or archives, optionally followed
+by a commit) are read one per line from a file; blank lines and lines
+starting with "#" are ignored. Repositories run concurrently with separate
+bounds on cloning, analysis and in-flight LLM requests, sharing one
+analysis cache and one LLM cache. Every tour is written to the output
+directory as it finishes, next to summary.json. Progress is appended to
+batch_state.jsonl, so an interrupted batch run again with the same output
+directory skips the repositories already done.
+
+Usage (from the project root):
+    python main.py batch repos.txt --out-dir tours --jobs 8
+    python -m programs.batch repos.txt --out-dir tours --llm-concurrency 16
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import dotenv
+
+from . import helpers
+from .analysis_cache import AnalysisCache
+from .llm_cache import LLMCache
+from .llm_executor import HTTPChatClient, LLMExecutor, OpenAIChatClient, RateLimiter, DEFAULT_MODEL, DEFAULT_RPM, DEFAULT_TPM
+from .pipeline import generate_tour
+from .repo_data import ARCHIVE_EXTENSIONS, is_local_source
+
+
+DEFAULT_JOBS = 4
+DEFAULT_CLONE_CONCURRENCY = 4
+DEFAULT_ANALYSIS_CONCURRENCY = os.cpu_count() or 1
+DEFAULT_LLM_CONCURRENCY = 8
+
+STATE_FILE = 'batch_state.jsonl'
+SUMMARY_FILE = 'summary.json'
+
+# Pipeline stages (see events.stage) by the resource they are bounded on
+STAGE_GROUPS = {
+    'clone':            'clone',
+    'update':           'analysis',
+    'scan':             'analysis',
+    'definitions':      'analysis',
+    'usages':           'analysis',
+    'cross_reference':  'analysis',
+    'repo_summary':     'analysis',
+    'rank':             'analysis',
+}
+
+
+def read_sources(path: str) -> list :
+    """
+    (source, commit or None) pairs from a batch file, duplicates dropped.
+    """
+    sources = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = line.split()
+            sources.append((parts[0], parts[1] if len(parts) > 1 else None))
+    return list(dict.fromkeys(sources))
+
+def tour_name(source: str, commit: str = None) -> str :
+    """
+    File name of a source's tour: a readable slug plus a short hash, so
+    different sources never share a name.
+    """
+    if is_local_source(source):
+        slug = os.path.basename(os.path.normpath(source))
+        for extension in ARCHIVE_EXTENSIONS:
+            if slug.lower().endswith(extension):
+                slug = slug[:-len(extension)]
+                break
+    else:
+        try :
+            slug = '__'.join(helpers.convert_git_url_to_cloner(source)[len('https://github.com/'):-len('.git')].split('/'))
+        except helpers.InvalidUrlError :
+            slug = source
+    slug = re.sub(r'[^A-Za-z0-9._-]+', '_', slug).strip('_') or 'repo'
+    digest = hashlib.sha1(f'{source}@{commit or "HEAD"}'.encode('utf-8')).hexdigest()[:8]
+    return f'{slug}-{digest}.tour'
+
+
+class StageLimiter:
+    '''
+    Event consumer (see events.emit) that holds the semaphore of a stage's
+    group (see STAGE_GROUPS) from its "started" to its "done" event, so
+    concurrent runs share bounded clone and analysis slots. release()
+    frees whatever a failed run still holds.
+    '''
+    def __init__(self, semaphores: dict, on_event=None) -> None:
+        self.semaphores = semaphores
+        self.on_event = on_event
+        self.held = []
+
+    def __call__(self, event: str, data: dict) -> None :
+        if event == 'stage':
+            semaphore = self.semaphores.get(STAGE_GROUPS.get(data['name']))
+            if semaphore is not None:
+                if data['status'] == 'started':
+                    semaphore.acquire()
+                    self.held.append(semaphore)
+                elif semaphore in self.held:
+                    self.held.remove(semaphore)
+                    semaphore.release()
+        if self.on_event is not None:
+            self.on_event(event, data)
+
+    def release(self) -> None :
+        while self.held:
+            self.held.pop().release()
+
+
+def _load_state(path: str) -> dict :
+    # last record per (source, commit); a torn last line from a crash is ignored
+    records = {}
+    if not os.path.exists(path):
+        return records
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try :
+                record = json.loads(line)
+            except json.JSONDecodeError :
+                continue
+            records[(record['source'], record['commit'])] = record
+    return records
+
+def _write_json(path: str, data) -> None :
+    # write-then-rename, so an interruption never leaves a half-written file
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+def run_batch(sources: list, out_dir: str, jobs: int = DEFAULT_JOBS,
+              clone_concurrency: int = DEFAULT_CLONE_CONCURRENCY,
+              analysis_concurrency: int = DEFAULT_ANALYSIS_CONCURRENCY,
+              llm_concurrency: int = DEFAULT_LLM_CONCURRENCY, client=None,
+              analysis_cache: AnalysisCache = None, llm_cache: LLMCache = None, resume: bool = True,
+              rate_limiter: RateLimiter = None) -> dict :
+    """
+    Generate a tour for every (source, commit) in sources, at most jobs
+    repositories at a time. Returns the run summary, also written to
+    out_dir/summary.json.
+
+    With resume, sources recorded as done in out_dir/batch_state.jsonl
+    whose tour file still exists are skipped. client is the LLM client
+    shared by all runs (default OpenAIChatClient), and rate_limiter (default
+    GITOURS_LLM_RPM / GITOURS_LLM_TPM) bounds their requests together, not
+    each repository's.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    state_path = os.path.join(out_dir, STATE_FILE)
+    previous = _load_state(state_path) if resume else {}
+    analysis_cache = analysis_cache if analysis_cache is not None else AnalysisCache()
+    llm_cache = llm_cache if llm_cache is not None else LLMCache()
+    client = client if client is not None else OpenAIChatClient()
+    rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter(DEFAULT_RPM, DEFAULT_TPM)
+
+    semaphores = {
+        'clone':    threading.BoundedSemaphore(max(1, clone_concurrency)),
+        'analysis': threading.BoundedSemaphore(max(1, analysis_concurrency)),
+    }
+    llm_slots = threading.BoundedSemaphore(max(1, llm_concurrency))
+    state_lock = threading.Lock()
+    records = {}
+
+    pending = []
+    for source, commit in sources:
+        record = previous.get((source, commit))
+        if record is not None and record['status'] == 'done' and \
+           os.path.exists(os.path.join(out_dir, record['tour'])):
+            records[(source, commit)] = dict(record, skipped=True)
+        else:
+            pending.append((source, commit))
+    print(f"Batch: {len(sources)} repositories, {len(records)} already done, {len(pending)} to run "
+          f"({jobs} at a time)")
+
+    def run_one(source: str, commit: str) -> dict :
+        report = {}
+        def on_event(event, data):
+            if event == 'report':
+                report.update(data['report'])
+        limiter = StageLimiter(semaphores, on_event)
+        executor = LLMExecutor(client=client, max_concurrency=llm_concurrency, rate_limiter=rate_limiter,
+                               slots=llm_slots)
+        record = {'source': source, 'commit': commit, 'tour': tour_name(source, commit)}
+        start = time.perf_counter()
+        try :
+            tour = generate_tour(source, commit=commit, analysis_cache=analysis_cache, llm_cache=llm_cache,
+                                 executor=executor, on_event=limiter)
+            _write_json(os.path.join(out_dir, record['tour']), tour)
+            record.update(status='done', steps=len(tour.get('steps', [])))
+        except (Exception, SystemExit) as e :
+            # gitRepo exits the thread when a clone fails; one bad repo must not stop the batch
+            traceback.print_exc()
+            record.update(status='failed', error=str(e) if isinstance(e, Exception) else 'Failed to clone the repository')
+        finally :
+            limiter.release()
+        record.update(seconds=round(time.perf_counter() - start, 3), report=report or None)
+        with state_lock :
+            with open(state_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+        print(f"Batch: {record['status']} {source} ({record['seconds']}s)")
+        return record
+
+    start = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=max(1, jobs), thread_name_prefix='gitours-batch')
+    try :
+        futures = {pool.submit(run_one, source, commit): (source, commit) for source, commit in pending}
+        for future in as_completed(futures):
+            records[futures[future]] = future.result()
+    except KeyboardInterrupt :
+        print("Batch interrupted, waiting for running repositories; run again to resume")
+        pool.shutdown(wait=True, cancel_futures=True)
+        raise
+    finally :
+        pool.shutdown(wait=True)
+        ordered = [records[key] for key in sources if key in records]
+        summary = {
+            'total':        len(sources),
+            'done':         sum(1 for r in ordered if r['status'] == 'done'),
+            'failed':       sum(1 for r in ordered if r['status'] == 'failed'),
+            'skipped':      sum(1 for r in ordered if r.get('skipped')),
+            'not_run':      len(sources) - len(ordered),
+            'seconds':      round(time.perf_counter() - start, 3),
+            'llm_cache':    {'hits': llm_cache.hits, 'misses': llm_cache.misses},
+            'analysis_cache': {'hits': analysis_cache.hits, 'misses': analysis_cache.misses},
+            'repos':        ordered,
+        }
+        _write_json(os.path.join(out_dir, SUMMARY_FILE), summary)
+    print(f"Batch finished: {summary['done']} done ({summary['skipped']} from earlier runs), "
+          f"{summary['failed']} failed in {summary['seconds']}s; summary in {os.path.join(out_dir, SUMMARY_FILE)}")
+    return summary
+
+def main(argv: list = None) -> None :
+    parser = argparse.ArgumentParser(prog='batch', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sources', help='file with one URL, directory or archive per line, optionally + commit')
+    parser.add_argument('--out-dir', default='tours', help='where tours and summary.json go (default %(default)s)')
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS, help='repositories processed at a time')
+    parser.add_argument('--clone-concurrency', type=int, default=DEFAULT_CLONE_CONCURRENCY)
+    parser.add_argument('--analysis-concurrency', type=int, default=DEFAULT_ANALYSIS_CONCURRENCY)
+    parser.add_argument('--llm-concurrency', type=int, default=DEFAULT_LLM_CONCURRENCY,
+                        help='LLM requests in flight across all repositories')
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--base-url', help='OpenAI-compatible endpoint instead of the openai package')
+    parser.add_argument('--no-resume', action='store_true', help='redo repositories finished by an earlier run')
+    args = parser.parse_args(argv)
+
+    dotenv.load_dotenv()
+    client = HTTPChatClient(args.base_url, model=args.model) if args.base_url else OpenAIChatClient(args.model)
+    summary = run_batch(read_sources(args.sources), args.out_dir, jobs=args.jobs,
+                        clone_concurrency=args.clone_concurrency,
+                        analysis_concurrency=args.analysis_concurrency,
+                        llm_concurrency=args.llm_concurrency, client=client, resume=not args.no_resume)
+    if summary['failed']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
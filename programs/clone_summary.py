@@ -1,10 +1,23 @@
 import os
-import subprocess
-import ast
 import openai
 import json
+import tempfile
 
+from .artifacts import NDJSONMap
 from .repo_data import gitRepo
+from .scanner import scan_file, scan_project, symbol_id
+from .source_reader import BINARY_SNIFF_BYTES, DEFAULT_MAX_CONTENT_BYTES, read_source, truncate_text
+from .walker import walk_repo
+from .llm_cache import LLMCache
+from .llm_executor import LLMExecutor
+from .events import emit
+from .prompt_compactor import COMPACT_FORMAT_NOTE, compact_repo_summary
+from .tour_parser import parse_summaries, validate_symbols
+from .prompt_planner import DEFAULT_TOKEN_BUDGET, estimate_tokens, merge_batch_results, plan_batches
+
+# Bump whenever PROMPT_ONE or the expected response format changes, so
+# cached LLM responses from older prompts are not reused (see LLMCache).
+PROMPT_VERSION = 4
 
 SYSTEM_DEF_PROMPT = '''
 You are a GitHub repository summarizer. You will be presented with 2 JSON files for context and reference containing 1. a mapping of all python symbols present in the project mapped to their location and usages, and 2. a json containing all the contents of the project including all python code. 
@@ -19,23 +32,21 @@ You evaluate the contents of a project based on the files provided to you and re
 
 {
     "FILE_NAME_AND_PATH_RELATIVE_TO_ROOT": {
-        "STARTING_LINE_NUMBER": {
-            "RECOMMENDED_ORDER_NUMBER": INTEGER,
-            "STARTING_LINE_NUMBER": INTEGER
-            "LINE_NUMBER_END": INTEGER,
-            "SUMMARY": "INSERT SUMMARY HERE",
-            "CORE": BOOLEAN
+        "SYMBOL_ID": {
+            "order": INTEGER,
+            "summary": "INSERT SUMMARY HERE",
+            "core": BOOLEAN
         },
         ...
     },
     ...
 }
 
-Mark summary items that you deem "essential" or "more important" with a TRUE boolean value in the "CORE" attribute. Note that "RECOMMENDED_ORDER_NUMBER" is a number you can assign to each summary item to indicate the order in which they should be presented if presented in a powerpoint style presentation based on what you believe is the best relative order to present them in.
+Mark summary items that you deem "essential" or "more important" with a TRUE boolean value in the "core" attribute. Note that "order" is a number you can assign to each summary item to indicate the order in which they should be presented if presented in a powerpoint style presentation based on what you believe is the best relative order to present them in.
 
-For each "LINE_NUMBER" parameter (both "STARTING_LINE_NUMBER" and "LINE_NUMBER_END"), use the line numbers from the original file as provided in repo_summary.json. You MUST parse the "content" attribute in "repo_summary.json" and determine the line numbers of each summary item based on the the line break characters.
+Each "SYMBOL_ID" MUST be one of the "symbol_ids" listed for that file in repo_summary.json, copied exactly: "<module>" for the file as a whole and its top-level code, otherwise the dotted name of a class or function (e.g. "Parser", "Parser.parse", "main.helper"). Do NOT return line numbers, they are looked up from the symbol IDs.
 
-Summarize all the contents including every file present.
+Summarize every symbol ID listed in "symbol_ids" of every file present.
 
 
 
@@ -59,7 +70,8 @@ The second JSON context file is by the name of "repo_summary.json" containing a
         "path": "RELATIVE_PATH_FROM_GITHUB_ROOT",
         "name": "FILE_NAME",
         "type": "FILE_EXTENSION",
-        "content": "ALL TEXT CONTENTS WITHIN FILE IF THE FILE IS A PYTHON DOCUMENT"
+        "content": "ALL TEXT CONTENTS WITHIN FILE IF THE FILE IS A PYTHON DOCUMENT",
+        "symbol_ids": ["<module>", "CLASS_OR_FUNCTION_NAME", "CLASS_NAME.METHOD_NAME", ...]
     },
     ...
 }
@@ -75,69 +87,152 @@ The second JSON context file is by the name of "repo_summary.json" containing a
 #         subprocess.run(["git", "clone", repo_url, destination], check=True)
 
 def extract_definitions(file_path):
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            source = f.read()
-        node = ast.parse(source, filename=file_path)
-    except Exception as e:
-        print(f"Failed to parse {file_path}: {e}")
-        return None
+    scan = scan_file(file_path)
+    return _class_function_definitions(scan)
 
-    classes = []
-    functions = []
+def _class_function_definitions(scan: dict) -> dict :
+    if scan["definitions"] is None:
+        print(f"Failed to parse {scan['path']}: {scan['error']}")
+        return None
 
-    for n in node.body:
-        if isinstance(n, ast.ClassDef):
-            methods = [m.name for m in n.body if isinstance(m, ast.FunctionDef)]
-            classes.append({"name": n.name, "methods": methods})
-        elif isinstance(n, ast.FunctionDef):
-            functions.append(n.name)
+    return {"classes":   scan["definitions"]["classes"],
+            "functions": scan["definitions"]["functions"]}
 
-    return {"classes": classes, "functions": functions}
+def analyze_repo(repo_path, scans: dict = None):
+    if scans is None:
+        scans = scan_project(repo_path)
 
-def analyze_repo(repo_path):
     summary = {}
-    
-    for root, _, files in os.walk(repo_path):
-        for file in files:
-            if file.endswith(".py"):
-                file_path = os.path.join(root, file)
-                rel_path = os.path.relpath(file_path, repo_path)
-                definitions = extract_definitions(file_path)
-                if definitions:
-                    summary[rel_path] = definitions
+    for rel_path, scan in scans.items():
+        definitions = _class_function_definitions(scan)
+        if definitions:
+            summary[rel_path] = definitions
 
     return summary
 
-def get_repo_json_tempfile(repo: gitRepo) -> gitRepo:
-    # if isinstance(repo_path, gitRepo):
-    #     repo_path = repo_path.get_repo_path()
-    
-    summary = {}
+def iter_repo_summary(repo: gitRepo, max_content_bytes: int = DEFAULT_MAX_CONTENT_BYTES):
+    """
+    Yield (rel_path, entry) repo summary entries one file at a time, in
+    manifest order.
+
+    Python content comes from the scans when they hold it, otherwise it is
+    read through source_reader.read_source, so a huge or mis-encoded file
+    costs bounded memory and never aborts the run. Content longer than
+    max_content_bytes is cut to its first whole lines and the entry marked
+    "truncated" with the file's full "lines" count. Binary files are left
+    out. Files too large for the scanner (see walker.FileManifest.oversized)
+    are read the same way, so the model still sees their first lines.
+    """
     repo_path = repo.get_repo_path()
-    
-    for root, _, files in os.walk(repo_path):
-        for file in files:
-            file_path = os.path.join(root, file)
-            rel_path = os.path.relpath(file_path, repo_path)
-            
-            split_file_name = os.path.splitext(file)
-            if split_file_name[1] in ['.py']:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-                    summary[rel_path] = {
-                        'path': rel_path,
-                        'name': file,
-                        'type': split_file_name[1],
-                        'content': content
-                    }
-            elif split_file_name[1] in ['.jpeg', '.jpg', '.png']:
-                summary[rel_path] = {
-                    'path': rel_path,
-                    'name': file,
-                    'type': split_file_name[1],
-                }
-    repo.save_repo_json_format(summary)
+    manifest = repo.get_manifest()
+    if manifest is None:
+        manifest = walk_repo(repo_path)
+        repo.set_manifest(manifest)
+    scans = repo.get_scans()
+    if scans is None:
+        scans = scan_project(repo_path, manifest=manifest)
+        repo.set_scans(scans)
+
+    for file_path, rel_path in manifest.paths(('.py', '.jpeg', '.jpg', '.png')):
+        file = os.path.basename(rel_path)
+        split_file_name = os.path.splitext(file)
+        entry = {
+            'path': rel_path,
+            'name': file,
+            'type': split_file_name[1],
+        }
+        if split_file_name[1] in ['.py']:
+            content = scans[rel_path]["content"] if rel_path in scans else None
+            if content is not None and '\0' in content[:BINARY_SNIFF_BYTES]:
+                print(f"Skipping binary file {rel_path}")
+                continue
+            if content is not None:
+                truncated = truncate_text(content, max_content_bytes)
+                if truncated is not content:
+                    entry['truncated'] = True
+                    entry['lines'] = len(content.splitlines())
+                content = truncated
+            else:
+                source = read_source(file_path, max_content_bytes)
+                if source['binary']:
+                    print(f"Skipping binary file {rel_path}")
+                    continue
+                content = source['content']
+                if source['truncated']:
+                    entry['truncated'] = True
+                    entry['lines'] = source['lines']
+            entry['content'] = content
+        yield rel_path, entry
+
+def build_symbol_table(repo_summary: dict, scans: dict) -> dict :
+    """
+    Symbol table of the python files in a repo summary, {symbol ID:
+    {"path", "qualname", "kind", "lineno", "end_lineno"}} (see
+    scanner.symbol_id), with the exact AST spans of the scans.
+
+    Every file with content also gets a "<module>" symbol spanning the
+    whole file, so top-level code and files that could not be parsed can
+    still be summarized. Symbols starting past the end of truncated content
+    are left out, the model never sees them.
+    """
+    table = {}
+    for path, entry in repo_summary.items():
+        content = entry.get('content')
+        if content is None:
+            continue
+        shown = len(content.splitlines())
+        table[symbol_id(path, '<module>')] = {
+            'path':         path,
+            'qualname':     '<module>',
+            'kind':         'module',
+            'lineno':       1,
+            'end_lineno':   max(entry.get('lines', shown), 1),
+        }
+        scan = scans.get(path) if scans is not None else None
+        for symbol in (scan or {}).get('symbols') or []:
+            if symbol['lineno'] <= shown:
+                table[symbol_id(path, symbol['qualname'])] = dict(symbol, path=path)
+    return table
+
+def get_repo_json_tempfile(repo: gitRepo) -> gitRepo:
+    """
+    Write the repo summary (see iter_repo_summary) to repo_summary.ndjson
+    in the repo's mapping path one file at a time, each entry with the
+    "symbol_ids" of its file, and keep it as an NDJSONMap along with the
+    symbol table (see build_symbol_table) on the repo and its mappings.
+
+    Content is dropped from the in-memory scans once written, so sources
+    are not held twice; later readers get it from the summary or the disk.
+    """
+    if repo.get_mapping_path() is None:
+        repo.set_mapping_path(tempfile.mkdtemp(prefix='maps-'))
+    os.makedirs(repo.get_mapping_path(), exist_ok=True)
+    path = os.path.join(repo.get_mapping_path(), 'repo_summary.ndjson')
+
+    symbols, truncated = {}, []
+    with open(path, 'w', encoding='utf-8') as f:
+        for rel_path, entry in iter_repo_summary(repo):
+            # set by iter_repo_summary when the repo had none yet
+            scans = repo.get_scans()
+            file_symbols = build_symbol_table({rel_path: entry}, scans)
+            if file_symbols:
+                entry['symbol_ids'] = [symbol['qualname'] for symbol in file_symbols.values()]
+            symbols.update(file_symbols)
+            if entry.get('truncated'):
+                truncated.append(rel_path)
+            f.write(json.dumps([rel_path, entry], separators=(',', ':')))
+            f.write('\n')
+            scan = scans.get(rel_path) if isinstance(scans, dict) else None
+            if scan is not None:
+                scan['content'] = None
+    if truncated:
+        print(f"Truncated {len(truncated)} oversized file(s) for the prompt: {truncated}")
+
+    summary = NDJSONMap(path)
+    repo.set_repo_summary(summary)
+    if repo.get_mappings() is not None:
+        repo.get_mappings().repo_summary = summary
+        repo.get_mappings().symbols = symbols
     # tempfile_path = 
     return repo
 
@@ -153,10 +248,8 @@ def summarize_with_llm(summary):
     )
     return response['choices'][0]['message']['content']
 
-def summarize_with_llm_2(cross_ref_dict: list, repo_summary_dict: dict) -> str:
-    openai.api_key = os.getenv("OPENAI_API_KEY") 
-
-    prompt = PROMPT_ONE + f"""\n\n
+def build_prompt_1(cross_ref_dict: list, repo_summary_dict: dict, compact: bool = False) -> str :
+    return PROMPT_ONE + (COMPACT_FORMAT_NOTE if compact else '') + f"""\n\n
         The JSON context files are as follows:
         cross_reference.json:
         {json.dumps(cross_ref_dict)}
@@ -164,21 +257,164 @@ def summarize_with_llm_2(cross_ref_dict: list, repo_summary_dict: dict) -> str:
         repo_summary.json:
         {json.dumps(repo_summary_dict)}
     """
-    
-    with open('temp_output_PROMPT.txt', 'w', encoding='utf-8') as f:
-        f.write(prompt)
-    
-    response = openai.ChatCompletion.create(
-        model="o3-mini",              # 200k token limit
-        # model="chatgpt-4o-latest",      # 500k token limit
-        messages=[{"role": "system", "content": SYSTEM_DEF_PROMPT},
-                  {"role": "user", "content": prompt}]
-    )
-    
-    resp_text = response['choices'][0]['message']['content']
-    
-    with open('temp_output_RESPONSE.txt', 'w', encoding='utf-8') as f:
-        f.write(resp_text)
+
+def _load_batch_response(resp_text: str, symbol_ids: dict = None) -> dict :
+    """
+    Decode one batch response, recovering whatever complete file and
+    section objects it contains (see tour_parser). With symbol_ids, section
+    keys are validated against the real symbols of each file and unknown
+    ones dropped.
+    """
+    data = parse_summaries(resp_text)
+    if symbol_ids is None:
+        return data
+    data, problems = validate_symbols(data, symbol_ids)
+    for problem in problems:
+        print(f"Invalid summary: {problem}")
+    return data
+
+def _expects_summary(entry: dict) -> bool :
+    """
+    Whether the model is expected to return summaries for a (possibly
+    compacted) repo summary entry.
+    """
+    return bool(entry.get('symbols') or (entry.get('content') or '').strip())
+
+def summarize_with_llm_2(cross_ref_dict: list, repo_summary_dict: dict,
+                         token_budget: int = DEFAULT_TOKEN_BUDGET, llm=None,
+                         executor: LLMExecutor = None, cache: LLMCache = None, on_event=None,
+                         compact: bool = True, strip_comments: bool = False, strip_docstrings: bool = False,
+                         dump_dir: str = None) -> str:
+    """
+    Summarize the repo in token-budgeted batches and return the merged
+    summaries as a JSON string in the format expected by parse_prompt_1.
+
+    Files are packed with just their relevant cross-reference edges into
+    batches of at most token_budget estimated tokens (see prompt_planner).
+    Batches are sent concurrently through executor (rate limited, retried);
+    by default an LLMExecutor around llm(system_prompt, prompt, timeout=...),
+    which itself defaults to OpenAIChatClient.
+
+    With a cache, files whose exact content was summarized before by the
+    same model and prompt are taken from the cache and never sent.
+
+    With compact (the default), python files are sent as per-symbol slices
+    with line-number prefixes instead of raw content, identical files are
+    sent once, and comments/docstrings can be stripped as well (see
+    prompt_compactor).
+
+    Each finished batch (and the cached files, first) is reported to
+    on_event as a "chunk" event with its decoded summaries, so callers can
+    show partial results before the slowest batch returns.
+
+    The model only names symbols by the "symbol_ids" of their entries (see
+    get_repo_json_tempfile); their line spans are joined back locally by
+    codetours.parse_prompt_1. Responses are parsed tolerantly and unknown
+    symbol IDs dropped. Files missing from the responses (e.g. a truncated reply)
+    are re-requested once on their own; files still missing after that are
+    reported as a "missing" event. A batch that still fails after its
+    retries (see LLMExecutor.run) is reported as a "chunk_failed" event and
+    its files are re-requested the same way, so one failed batch never
+    discards the others; the error is only raised when no batch succeeds.
+    The request, token, latency and cache totals of the call end up in a
+    final "llm" event.
+
+    With a dump_dir, the prompts sent and the merged response are also
+    written there (llm_prompt.txt, llm_response.txt) for debugging; give
+    concurrent runs different directories.
+    """
+    if executor is None:
+        executor = LLMExecutor(client=llm)
+    before = executor.stats()
+    run_hits, run_lookups = 0, 0
+
+    symbol_ids = {path: set(entry['symbol_ids'])
+                  for path, entry in repo_summary_dict.items() if 'symbol_ids' in entry}
+
+    if compact:
+        repo_summary_dict, stats = compact_repo_summary(repo_summary_dict, strip_comments, strip_docstrings)
+        change = (stats['tokens_after'] - stats['tokens_before']) / stats['tokens_before'] if stats['tokens_before'] else 0
+        print(f"Prompt compaction: ~{stats['tokens_before']} -> ~{stats['tokens_after']} tokens "
+              f"({change:+.0%}), {stats['duplicates']} duplicate files")
+
+    cached = {}
+    pending = repo_summary_dict
+    if cache is not None:
+        model = getattr(executor.client, 'model', type(executor.client).__name__)
+        keys = {path: LLMCache.make_key(model, SYSTEM_DEF_PROMPT, PROMPT_VERSION, path, json.dumps(entry))
+                for path, entry in repo_summary_dict.items()}
+        hits, misses = cache.hits, cache.misses
+        found = cache.get_many(list(keys.values()))
+        cached = {path: found[key] for path, key in keys.items() if key in found}
+        pending = {path: entry for path, entry in repo_summary_dict.items() if path not in cached}
+        run_hits, run_lookups = cache.hits - hits, cache.hits - hits + cache.misses - misses
+        print(f"LLM cache: {run_hits}/{run_lookups} files hit "
+              f"({run_hits / run_lookups if run_lookups else 0:.0%}), {len(pending)} to summarize")
+        if cached:
+            emit(on_event, 'chunk', index=None, total=None, files=list(cached), cached=True, summaries=cached)
+
+    overhead = estimate_tokens(SYSTEM_DEF_PROMPT) + estimate_tokens(build_prompt_1([], {}, compact))
+    batches = plan_batches(pending, cross_ref_dict, token_budget, overhead) if pending else []
+    print(f"Summarizing {len(pending)} files in {len(batches)} batch(es) of <= {token_budget} tokens")
+
+    prompts = [build_prompt_1(batch["cross_reference"], batch["files"], compact) for batch in batches]
+    if dump_dir is not None:
+        os.makedirs(dump_dir, exist_ok=True)
+        with open(os.path.join(dump_dir, 'llm_prompt.txt'), 'w', encoding='utf-8') as f:
+            f.write('\n\n'.join(prompts))
+
+    results, failures = [], []
+    def run_batches(batches: list, prompts: list) -> None :
+        first = len(results)
+        results.extend([{}] * len(batches))
+        print(f"Sending {len(prompts)} batch(es) with up to {executor.max_concurrency} concurrent requests")
+
+        def on_result(i, response):
+            results[first + i] = _load_batch_response(response, symbol_ids or None)
+            emit(on_event, 'chunk', index=first + i, total=len(results), files=list(batches[i]["files"]),
+                 cached=False, summaries=results[first + i])
+
+        def on_error(i, error):
+            # the batch's files count as missing and are re-planned below
+            failures.append(error)
+            print(f"Batch {first + i + 1} failed after retries ({error})")
+            emit(on_event, 'chunk_failed', index=first + i, total=len(results), files=list(batches[i]["files"]),
+                 error=str(error))
+
+        executor.run([(SYSTEM_DEF_PROMPT, prompt) for prompt in prompts], on_result=on_result, on_error=on_error)
+
+    def missing_files() -> list :
+        summarized = {path for result in results for path in result}
+        return [path for path, entry in pending.items() if _expects_summary(entry) and path not in summarized]
+
+    run_batches(batches, prompts)
+    missing = missing_files()
+    if missing:
+        # only the files the model skipped or whose objects were lost, not the whole prompt
+        print(f"No summaries for {len(missing)} file(s), re-requesting only those: {missing}")
+        retry_batches = plan_batches({path: pending[path] for path in missing}, cross_ref_dict, token_budget, overhead)
+        run_batches(retry_batches, [build_prompt_1(batch["cross_reference"], batch["files"], compact)
+                                    for batch in retry_batches])
+        missing = missing_files()
+        if missing:
+            print(f"Still no summaries for {len(missing)} file(s): {missing}")
+            emit(on_event, 'missing', files=missing)
+    if failures and not cached and not any(results):
+        # nothing to build a tour from
+        raise failures[-1]
+
+    if cache is not None:
+        cache.put_many({keys[path]: file_sums for result in results
+                        for path, file_sums in result.items() if path in pending})
+    resp_text = json.dumps(merge_batch_results([cached] + results))
+
+    totals = {key: value - before[key] for key, value in executor.stats().items()}
+    totals['seconds'] = round(totals['seconds'], 3)
+    emit(on_event, 'llm', **totals, cache_hits=run_hits, cache_misses=run_lookups - run_hits)
+
+    if dump_dir is not None:
+        with open(os.path.join(dump_dir, 'llm_response.txt'), 'w', encoding='utf-8') as f:
+            f.write(resp_text)
 
     return resp_text
 
@@ -191,7 +427,7 @@ def main(git_repo: gitRepo = None):
 
     # repo_path = "./sample_repo"
     repo_path = git_repo.get_repo_path()
-    summary = analyze_repo(repo_path)
+    summary = analyze_repo(repo_path, scans=git_repo.get_scans())
     
     if summary:
         llm_output = summarize_with_llm(summary)
@@ -3,60 +3,109 @@
 
 
 from cmath import inf
-import json
 import os
 
 from programs.repo_data import gitRepo
+from programs.scanner import symbol_id
+from programs.tour_parser import parse_summaries
 
 
-def parse_prompt_1(data: str, attempt: int = 5) -> list :
+def parse_prompt_1(data: str, symbols: dict = None, order: dict = None) -> list :
     """
     Parse the prompt data for the first prompt for the key information.
+    Malformed or truncated responses keep every complete file and section
+    object (see tour_parser.parse_summaries). Line spans are joined from
+    symbols, the symbol table of clone_summary.build_symbol_table; without
+    it they are read from the response itself, as before symbol tables.
+    """
+    data_dict = parse_summaries(data)
+    if not data_dict :
+        print("No summaries could be recovered from the response.")
+    return summary_items(data_dict, symbols, order)
+
+def summary_items(data_dict: dict, symbols: dict = None, order: dict = None) -> list :
+    """
+    Flatten decoded summaries ({file: {symbol: {...}}}) into the core
+    items used for tour steps, with the line span of each symbol looked up
+    in the symbol table.
+
+    With order ({symbol ID: position}, see ranking.tour_positions) the
+    symbols were picked locally: exactly those become items, at their
+    position, whatever the model answered for "core" and "order".
+
+    Without a symbol table, sections carry their own line span in
+    STARTING_LINE_NUMBER/LINE_NUMBER_END (the response format used before
+    symbol IDs), and the upper-case field names of that format are read too.
     """
-    if attempt <= 0 :
-        print("Max attempts reached. Exiting.")
-        return []
-    
-    try :
-        data_dict = json.loads(data)
-    except json.JSONDecodeError as e :
-        print(f"Error decoding JSON on try {attempt}: {e}")
-        print("Retrying...")
-        return parse_prompt_1(data, attempt - 1)
-    
     parsed_data = []
     
     for file_name_path, file_sums in data_dict.items() :
+        if not isinstance(file_sums, dict) :
+            continue
         for section, sec_data in file_sums.items() :
-            ord_num, start_line, end_line, summary, core = (
-                sec_data.get('RECOMMENDED_ORDER_NUMBER', None),
-                sec_data.get('STARTING_LINE_NUMBER', None),
-                sec_data.get('LINE_NUMBER_END', None),
-                sec_data.get('SUMMARY', None),
-                sec_data.get('CORE', False)
+            if not isinstance(sec_data, dict) :
+                continue
+            ord_num, summary, core = (
+                sec_data.get('order', sec_data.get('RECOMMENDED_ORDER_NUMBER')),
+                sec_data.get('summary', sec_data.get('SUMMARY')),
+                sec_data.get('core', sec_data.get('CORE', False))
             )
+            sid = symbol_id(file_name_path, section)
+            if order is not None :
+                if sid not in order :
+                    continue
+                ord_num, core = order[sid], True
             
             if not core :
                 continue
             if summary is None :
                 print(f"Summary is None for {file_name_path} in section {section}.")
                 continue
-            if start_line is None or end_line is None :
-                print(f"Start or end line is None for {file_name_path} in section {section}.")
-                continue                
+            if symbols is None :
+                symbol = {
+                    'lineno':       sec_data.get('STARTING_LINE_NUMBER'),
+                    'end_lineno':   sec_data.get('LINE_NUMBER_END'),
+                }
+                if symbol['lineno'] is None or symbol['end_lineno'] is None :
+                    print(f"Start or end line is None for {file_name_path} in section {section}.")
+                    continue
+            else :
+                symbol = symbols.get(sid)
+                if symbol is None :
+                    print(f"Unknown symbol {section} in {file_name_path}.")
+                    continue
             if ord_num is None :
                 ord_num = inf
 
             parsed_data.append({
                 'path':         file_name_path,
-                'line_start':   start_line,
-                'line_end':     end_line,
+                'symbol':       sid,
+                'line_start':   symbol['lineno'],
+                'line_end':     symbol['end_lineno'],
                 'summary':      summary,
                 'order':        ord_num,
             })
     
     return parsed_data
 
+def codetour_steps(data: list, repo_path: str) -> list :
+    """
+    CodeTour steps for parsed summary items, in recommended order.
+    """
+    steps = []
+    for item in sorted(data, key=lambda x: x.get('order', inf)) :
+        step = {
+            'description':  item['summary'],
+        }
+        if 'path' in item and os.path.exists(os.path.join(repo_path, item['path'])) :
+            step['file'] = item['path']
+        else :
+            print('Path not found for item:', item)
+        if 'line_start' in item :
+            step['line'] = int(item['line_start'])
+        steps.append(step)
+    return steps
+
 def generate_codetour(data: list, repo: gitRepo) -> dict :
     """
     Generate the codetour from the parsed data.
@@ -74,17 +123,6 @@ def generate_codetour(data: list, repo: gitRepo) -> dict :
     steps.append({
         'description': "## 👋 Welcome to your AI generated codetour!\nPlease proceed by clicking and following the series of \"next\"s to proceed through your project!",
     })
-    
-    for item in data :
-        step = {
-            'description':  item['summary'],
-        }
-        if 'path' in item and os.path.exists(os.path.join(repo.get_repo_path(), item['path'])) :
-            step['file'] = item['path']
-        else :
-            print('Path not found for item:', item)
-        if 'line_start' in item :
-            step['line'] = int(item['line_start'])
-        steps.append(step)
+    steps.extend(codetour_steps(data, repo.get_repo_path()))
     
     return codetour
\ No newline at end of file
@@ -0,0 +1,443 @@
+from collections import defaultdict
+
+from .import_resolver import build_module_index, module_name_for, resolve_import
+
+
+# Receivers that refer to the enclosing class inside a method body.
+_SELF_NAMES = ('self', 'cls')
+
+# How many re-export / base-class hops are followed before giving up.
+_MAX_HOPS = 8
+
+
+def symbol_tables(definitions: dict) -> tuple :
+    """
+    ({top-level name: type}, {class name: set of method names}) of one
+    file's definitions, as kept by CrossReferenceIndex.
+    """
+    symbols, classes = {}, {}
+    for symbol in definitions.get("functions", []):
+        symbols[symbol] = "function"
+    for symbol in definitions.get("variables", []):
+        symbols.setdefault(symbol, "variable")
+    for cls in definitions.get("classes", []):
+        symbols[cls.get("name")] = "class"
+        classes[cls.get("name")] = set(cls.get("methods", []))
+    return symbols, classes
+
+def import_bindings(file: str, records: list, module_index: dict, root_dir: str) -> tuple :
+    """
+    Resolve the import statement records of one file against the module
+    index, as ({local name: (target file, symbol or None for a whole
+    module)}, [target files of "from x import *"]).
+    """
+    bindings, star_imports = {}, []
+    module_name = module_name_for(file, root_dir)
+    for record in records:
+        targets = resolve_import(record, file, module_index, module_name)
+        if not targets:
+            continue
+        target = targets[0]
+        target_file = module_index[target]
+
+        if record["name"] is None:
+            # import a.b.c [as m]: "m" or the full dotted "a.b.c" names the module
+            bindings[record["asname"] or record["module"]] = (target_file, None)
+        elif record["name"] == '*':
+            star_imports.append(target_file)
+        elif target.endswith('.' + record["name"]):
+            # from pkg import submodule
+            bindings[record["asname"] or record["name"]] = (target_file, None)
+        else:
+            bindings[record["asname"] or record["name"]] = (target_file, record["name"])
+    return bindings, star_imports
+
+
+class CallResolver:
+    '''
+    Resolves call sites to the definitions they plausibly refer to, through
+    the calling file's imports and enclosing class.
+
+    Subclasses provide module_index ({module name: file}) and the per-file
+    tables file_symbols, file_classes, class_bases, bindings, star_imports
+    and file_imports (see CrossReferenceIndex). Tables are only read through
+    .get(file, default), so they need not be dicts held in memory.
+    '''
+    def _lookup_symbol(self, file: str, symbol: str, hops: int = 0) -> tuple :
+        '''
+        Find where a top-level symbol visible in file is defined, following
+        re-exports ("from .impl import symbol" in a package __init__).
+        Returns (defining file, type) or None.
+        '''
+        if hops > _MAX_HOPS:
+            return None
+        symbols = self.file_symbols.get(file, {})
+        if symbol in symbols:
+            return file, symbols[symbol]
+        binding = self.bindings.get(file, {}).get(symbol)
+        if binding is not None:
+            target_file, target_symbol = binding
+            if target_symbol is None:
+                return None
+            return self._lookup_symbol(target_file, target_symbol, hops + 1)
+        for target_file in self.star_imports.get(file, []):
+            found = self._lookup_symbol(target_file, symbol, hops + 1)
+            if found is not None:
+                return found
+        return None
+
+    def _resolve_reference(self, file: str, expr: str) -> tuple :
+        '''
+        Resolve a receiver expression in file to ("module", target file) or
+        ("class", (defining file, class name)), or None.
+        '''
+        binding = self.bindings.get(file, {}).get(expr)
+        if binding is not None and binding[1] is None:
+            return "module", binding[0]
+
+        head, _, attr = expr.rpartition('.')
+        if head:
+            owner = self._resolve_reference(file, head)
+            if owner is not None and owner[0] == "module":
+                found = self._lookup_symbol(owner[1], attr)
+                if found is not None and found[1] == "class":
+                    return "class", (found[0], attr)
+            return None
+
+        found = self._lookup_symbol(file, expr)
+        if found is not None and found[1] == "class":
+            return "class", (found[0], expr)
+        return None
+
+    def _lookup_method(self, class_ref: tuple, method: str, hops: int = 0) -> tuple :
+        '''
+        Find the class (file, name) that defines method for class_ref,
+        walking statically resolvable base classes.
+        '''
+        if hops > _MAX_HOPS:
+            return None
+        file, class_name = class_ref
+        if method in self.file_classes.get(file, {}).get(class_name, ()):
+            return class_ref
+        for base in self.class_bases.get(file, {}).get(class_name, []):
+            resolved = self._resolve_reference(file, base)
+            if resolved is not None and resolved[0] == "class":
+                found = self._lookup_method(resolved[1], method, hops + 1)
+                if found is not None:
+                    return found
+        return None
+
+    def resolve_call(self, file: str, call: dict) -> list :
+        '''
+        Resolve one call-site record of file to the definitions it plausibly
+        refers to, as [(defining file, symbol type)].
+        '''
+        name, base, scope = call["name"], call["base"], call["scope"]
+
+        if base is None:
+            found = self._lookup_symbol(file, name)
+            return [found] if found is not None else []
+
+        if base in _SELF_NAMES and scope is not None:
+            found = self._lookup_method((file, scope), name)
+            return [(found[0], "method")] if found is not None else []
+
+        receiver = base[:-2] if base.endswith('()') else base
+        resolved = self._resolve_reference(file, receiver)
+        if resolved is not None:
+            if resolved[0] == "module" and not base.endswith('()'):
+                found = self._lookup_symbol(resolved[1], name)
+                return [found] if found is not None else []
+            if resolved[0] == "class":
+                found = self._lookup_method(resolved[1], name)
+                return [(found[0], "method")] if found is not None else []
+            return []
+
+        # Unknown receiver: only methods of that name in files this file
+        # actually imports are plausible targets.
+        candidates = []
+        for module in self.file_imports.get(file, []):
+            target_file = self.module_index.get(module)
+            for methods in self.file_classes.get(target_file, {}).values():
+                if name in methods and (target_file, "method") not in candidates:
+                    candidates.append((target_file, "method"))
+        return candidates
+
+    def file_edges(self, file: str, calls: list) -> list :
+        '''
+        Cross-reference edges of one file's call sites, in call order, each
+        (symbol, type, defining file) once and calls into file itself left out.
+        '''
+        edges = {}
+        for call in calls:
+            for defined_in, symbol_type in self.resolve_call(file, call):
+                key = (call["name"], symbol_type, defined_in)
+                if defined_in == file or key in edges:
+                    continue
+                edges[key] = {
+                    "symbol": call["name"],
+                    "symbol_type": symbol_type,
+                    "used_in": file,
+                    "defined_in": defined_in
+                }
+        return list(edges.values())
+
+
+class CrossReferenceIndex(CallResolver):
+    '''
+    Scope-aware cross-reference engine.
+
+    Inverted indexes (symbol -> definitions, file -> imports, file -> local
+    name bindings) are built once from the per-file scans. Each call site is
+    then resolved through the calling file's actual imports and enclosing
+    class, so only plausible caller -> definition edges are recorded instead
+    of every bare-name match in the project.
+    '''
+    def __init__(self, reference_map: dict, scans: dict, root_dir: str, module_index: dict = None) -> None:
+        self.root_dir = root_dir
+        self.module_index = module_index if module_index is not None else build_module_index(root_dir, scans.keys())
+
+        # symbol -> [{"file", "type", "class"}]
+        self.definitions = defaultdict(list)
+        # file -> {top-level name: type}
+        self.file_symbols = {}
+        # file -> {class name: set of method names}
+        self.file_classes = {}
+        # file -> {class name: [base expressions]}
+        self.class_bases = {}
+        # file -> [resolved project module names]
+        self.file_imports = {}
+        # file -> {local name: (target file, symbol or None for a whole module)}
+        self.bindings = {}
+        # file -> [target files of "from x import *"]
+        self.star_imports = {}
+        # file -> files whose import statements resolve to it
+        self.importers = defaultdict(dict)
+        # file -> call-site records
+        self.calls = {}
+
+        # (symbol, type, used_in, defined_in) -> edge, and the edges as one
+        # list with each key's position in it, patched in place (see edges)
+        self.edge_map = {}
+        self.edge_list = []
+        self._edge_pos = {}
+        # symbol -> {defined_in: {used_in: edge count}} and used_in -> [edge keys]
+        self.callers = defaultdict(lambda: defaultdict(dict))
+        self.callees = {}
+
+        for file, info in reference_map.items():
+            self.add_file(file, info, scans.get(file))
+        self.resolve_files(scans.keys())
+
+    @property
+    def edges(self) -> list :
+        '''
+        Every edge, in resolution order for a freshly built index. The list
+        is live: resolve_files removes and appends only the edges of the
+        files it re-resolves, so later patches show up in it without
+        rebuilding it (removed edges are replaced by the last one).
+        '''
+        return self.edge_list
+
+    def _add_edge(self, key: tuple, edge: dict) -> None :
+        self.edge_map[key] = edge
+        self._edge_pos[key] = len(self.edge_list)
+        self.edge_list.append(edge)
+
+    def _remove_edge(self, key: tuple) -> None :
+        del self.edge_map[key]
+        pos = self._edge_pos.pop(key)
+        last = self.edge_list.pop()
+        if pos < len(self.edge_list):
+            self.edge_list[pos] = last
+            self._edge_pos[(last["symbol"], last["symbol_type"], last["used_in"], last["defined_in"])] = pos
+
+    # ---------------------------------------------------------------- indexing
+
+    def add_file(self, file: str, info: dict, scan: dict = None) -> None :
+        '''
+        Index the definitions and imports of one file. Call sites are not
+        resolved until resolve_files is called.
+        '''
+        defs = info.get("definitions", {})
+        self.file_symbols[file], self.file_classes[file] = symbol_tables(defs)
+
+        for symbol in defs.get("functions", []):
+            self.definitions[symbol].append({"file": file, "type": "function", "class": None})
+        for symbol in defs.get("variables", []):
+            self.definitions[symbol].append({"file": file, "type": "variable", "class": None})
+        for cls in defs.get("classes", []):
+            self.definitions[cls.get("name")].append({"file": file, "type": "class", "class": None})
+            for method in cls.get("methods", []):
+                self.definitions[method].append({"file": file, "type": "method", "class": cls.get("name")})
+
+        self.class_bases[file] = scan.get("class_bases", {}) if scan is not None else {}
+        self.calls[file] = scan.get("calls", []) if scan is not None else []
+        self.index_imports(file, info.get("imports", []), scan)
+
+    def index_imports(self, file: str, imports: list, scan: dict = None) -> None :
+        '''
+        (Re)build the import bindings of one file against the module index.
+        '''
+        for target_file in self._imported_files(file):
+            self.importers[target_file].pop(file, None)
+
+        self.file_imports[file] = list(imports)
+        self.bindings[file], self.star_imports[file] = import_bindings(
+            file, scan["imports"] if scan is not None else [], self.module_index, self.root_dir)
+
+        for target_file in self._imported_files(file):
+            self.importers[target_file][file] = None
+
+    def _imported_files(self, file: str) -> set :
+        targets = {self.module_index[m] for m in self.file_imports.get(file, []) if m in self.module_index}
+        targets.update(target_file for target_file, _ in self.bindings.get(file, {}).values())
+        targets.update(self.star_imports.get(file, []))
+        return targets
+
+    def remove_file(self, file: str) -> None :
+        '''
+        Drop a file's definitions, imports and outgoing edges from the index.
+        Edges from other files into it are left for resolve_files to redo.
+        '''
+        self._drop_edges(file)
+        for symbol in self.file_symbols.get(file, {}):
+            self._drop_definitions(symbol, file)
+        for methods in self.file_classes.get(file, {}).values():
+            for method in methods:
+                self._drop_definitions(method, file)
+        for target_file in self._imported_files(file):
+            self.importers[target_file].pop(file, None)
+
+        for table in (self.file_symbols, self.file_classes, self.class_bases, self.file_imports,
+                      self.bindings, self.star_imports, self.calls):
+            table.pop(file, None)
+
+    def reindex_imports(self, reference_map: dict, scans: dict) -> set :
+        '''
+        Re-resolve every file's imports after the module index changed
+        (files added, deleted or renamed). Returns the files whose bindings
+        changed.
+        '''
+        before = {file: (self.bindings.get(file), self.star_imports.get(file)) for file in reference_map}
+        self.importers = defaultdict(dict)
+        self.file_imports, self.bindings, self.star_imports = {}, {}, {}
+        for file, info in reference_map.items():
+            self.index_imports(file, info.get("imports", []), scans.get(file))
+        return {file for file in reference_map if before[file] != (self.bindings[file], self.star_imports[file])}
+
+    def _drop_definitions(self, symbol: str, file: str) -> None :
+        remaining = [d for d in self.definitions.get(symbol, []) if d["file"] != file]
+        if remaining:
+            self.definitions[symbol] = remaining
+        else:
+            self.definitions.pop(symbol, None)
+
+    def dependents(self, files) -> set :
+        '''
+        Files whose call resolution may depend on any of files: their direct
+        importers, plus files reaching them through re-exported names (a name
+        bound from a changed file, star imports, or classes whose bases are
+        such names).
+        '''
+        affected = set()
+        # (file, names flowing out of it or None for all of them)
+        pending = [(file, None) for file in files]
+        seen = set()
+        while pending:
+            target, names = pending.pop()
+            for importer in self.importers.get(target, {}):
+                affected.add(importer)
+                flowing = set()
+                for local, (target_file, symbol) in self.bindings.get(importer, {}).items():
+                    if target_file == target and symbol is not None and (names is None or symbol in names):
+                        flowing.add(local)
+                star = target in self.star_imports.get(importer, [])
+                for class_name, bases in self.class_bases.get(importer, {}).items():
+                    if star or any(base.split('.')[0] in flowing for base in bases):
+                        flowing.add(class_name)
+
+                if star and (importer, None) not in seen:
+                    seen.add((importer, None))
+                    pending.append((importer, names))
+                new_names = {name for name in flowing if (importer, name) not in seen}
+                if new_names:
+                    seen.update((importer, name) for name in new_names)
+                    pending.append((importer, new_names))
+        return affected - set(files)
+
+    def _drop_edges(self, file: str) -> None :
+        for key in self.callees.pop(file, []):
+            self._remove_edge(key)
+            symbol, _, used_in, defined_in = key
+            by_used = self.callers[symbol][defined_in]
+            by_used[used_in] -= 1
+            if not by_used[used_in]:
+                del by_used[used_in]
+                if not by_used:
+                    del self.callers[symbol][defined_in]
+                    if not self.callers[symbol]:
+                        del self.callers[symbol]
+
+    def resolve_files(self, files) -> None :
+        '''
+        (Re)resolve the call sites of files and replace their outgoing edges.
+        '''
+        for file in files:
+            self._drop_edges(file)
+            keys = self.callees[file] = []
+            for edge in self.file_edges(file, self.calls.get(file, [])):
+                key = (edge["symbol"], edge["symbol_type"], file, edge["defined_in"])
+                if key in self.edge_map:
+                    continue
+                self._add_edge(key, edge)
+                by_used = self.callers[edge["symbol"]][edge["defined_in"]]
+                by_used[file] = by_used.get(file, 0) + 1
+                keys.append(key)
+
+    # ------------------------------------------------------------------ query
+
+    def defined_where(self, symbol: str) -> list :
+        '''
+        All definitions of symbol as [{"file", "type", "class"}].
+        '''
+        return self.definitions.get(symbol, [])
+
+    def who_calls(self, symbol: str, defined_in: str = None) -> list :
+        '''
+        Files that call symbol, optionally only the definition in defined_in.
+        '''
+        by_origin = self.callers.get(symbol, {})
+        if defined_in is not None:
+            return list(by_origin.get(defined_in, {}))
+        files = {}
+        for used_in in by_origin.values():
+            files.update(used_in)
+        return list(files)
+
+    def calls_from(self, file: str) -> list :
+        '''
+        Cross-reference edges whose caller is file.
+        '''
+        return [self.edge_map[key] for key in self.callees.get(file, [])]
+
+    def imports_of(self, file: str) -> list :
+        '''
+        Project modules imported by file.
+        '''
+        return self.file_imports.get(file, [])
+
+    def to_cross_reference(self) -> list :
+        '''
+        Edges in the cross_reference.json format used by the LLM prompt,
+        kept up to date as files are re-resolved (see edges).
+        '''
+        return self.edges
+
+
+def generate_scoped_cross_reference(reference_map: dict, scans: dict, root_dir: str) -> list :
+    """
+    Build cross-reference entries by resolving every call site through its
+    file's imports and class scope (see CrossReferenceIndex).
+    """
+    return CrossReferenceIndex(reference_map, scans, root_dir).to_cross_reference()
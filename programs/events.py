@@ -0,0 +1,35 @@
+import time
+from contextlib import contextmanager
+
+
+def emit(on_event, event: str, **data) -> None :
+    """
+    Report a progress event to on_event(event, data), if given.
+
+    Events used by the pipeline:
+        stage   {"name", "status": "started" | "done", "elapsed"}, done events
+                also carry the stage's counts (files, bytes_read, symbols, ...)
+        chunk   {"index", "total", "files", "cached", "summaries"}
+                one summarization batch (or the cached files) finished
+        steps   {"chunk", "steps"} CodeTour steps parsed from a chunk
+        missing {"files"} files with no usable summary after a re-request
+        llm     {"requests", "prompt_tokens", "response_tokens", "seconds",
+                 "retries", "cache_hits", "cache_misses"} summarization totals
+        tour    {"tour"} the finished CodeTour
+        report  {"report"} timing report of the run (see metrics.RunReport)
+    """
+    if on_event is not None:
+        on_event(event, data)
+
+@contextmanager
+def stage(on_event, name: str, **data) :
+    """
+    Emit "stage" started/done events around a block of work. The block
+    gets a dict whose entries (counts) are added to the done event.
+    """
+    emit(on_event, 'stage', name=name, status='started', **data)
+    start = time.perf_counter()
+    info = {}
+    yield info
+    emit(on_event, 'stage', name=name, status='done', elapsed=round(time.perf_counter() - start, 3),
+         **data, **info)
@@ -0,0 +1,101 @@
+import os
+
+
+# Directories (relative to the project root) that act as import roots, in
+# priority order. "src" covers the common src/ package layout.
+IMPORT_ROOTS = ['', 'src']
+
+
+def _module_parts(rel_path: str, import_root: str) -> list :
+    """
+    Convert a relative .py path into dotted module parts under the given
+    import root, or None if the file is not below that root.
+    """
+    rel_path = os.path.normpath(rel_path)
+    if import_root:
+        prefix = import_root + os.sep
+        if not rel_path.startswith(prefix):
+            return None
+        rel_path = rel_path[len(prefix):]
+
+    parts = os.path.splitext(rel_path)[0].split(os.sep)
+    if parts[-1] == '__init__':
+        parts = parts[:-1]
+    return parts or None
+
+def _import_roots(root_dir: str) -> list :
+    return [r for r in IMPORT_ROOTS if r == '' or os.path.isdir(os.path.join(root_dir, r))]
+
+def build_module_index(root_dir: str, rel_paths) -> dict :
+    """
+    Build the module index for a project once: a dict mapping every dotted
+    module name importable from the project's own import roots to the
+    relative path of the file that defines it.
+    """
+    index = {}
+    roots = _import_roots(root_dir)
+    # Deeper roots (e.g. src/) win over the project root for the same file.
+    for import_root in reversed(roots):
+        for rel_path in rel_paths:
+            parts = _module_parts(rel_path, import_root)
+            if parts is None:
+                continue
+            index.setdefault('.'.join(parts), rel_path)
+    return index
+
+def module_name_for(rel_path: str, root_dir: str) -> str :
+    """
+    Dotted module name of a project file, preferring the deepest import root.
+    """
+    for import_root in reversed(_import_roots(root_dir)):
+        parts = _module_parts(rel_path, import_root)
+        if parts is not None:
+            return '.'.join(parts)
+    return None
+
+def resolve_import(record: dict, rel_path: str, module_index: dict, module_name: str = None) -> list :
+    """
+    Resolve one import record (see scanner._imports_from_tree) made by the
+    file at rel_path to the project modules it refers to. Anything not found
+    in the module index (stdlib, third-party) resolves to an empty list.
+    """
+    module, name, level = record["module"], record["name"], record["level"]
+    is_package = os.path.basename(rel_path) == '__init__.py'
+
+    if level:
+        if module_name is None:
+            return []
+        package = module_name.split('.') if is_package else module_name.split('.')[:-1]
+        if level - 1 > len(package):
+            return []
+        base = package[:len(package) - (level - 1)]
+        candidates = ['.'.join(base + ([module] if module else []))]
+    else:
+        candidates = [module]
+        # A script's own directory is on sys.path when it runs, so sibling
+        # modules are importable by their bare name.
+        script_dir = os.path.dirname(os.path.normpath(rel_path))
+        if script_dir:
+            candidates.append('.'.join(script_dir.split(os.sep) + [module]))
+
+    for target in candidates:
+        if not target:
+            continue
+        if name is not None and name != '*' and f'{target}.{name}' in module_index:
+            return [f'{target}.{name}']
+        if target in module_index:
+            return [target]
+    return []
+
+def resolve_imports(records: list, rel_path: str, module_index: dict, root_dir: str) -> list :
+    """
+    Resolve all import records of a file to a de-duplicated list of project
+    module names, in statement order.
+    """
+    module_name = module_name_for(rel_path, root_dir)
+    resolved = []
+    for record in records:
+        for target in resolve_import(record, rel_path, module_index, module_name):
+            if target not in resolved:
+                resolved.append(target)
+    return resolved
@@ -1,11 +1,17 @@
 import os
-import ast
-import json
-import tempfile, shutil, subprocess
+import tempfile
 from collections import defaultdict
 from tqdm import tqdm
 
-from .repo_data import gitRepo
+from .repo_data import gitRepo, open_repo, DEFAULT_CLONE_MODE
+from .scanner import list_python_files, scan_file, scan_project
+from .analysis_cache import AnalysisCache
+from .import_resolver import build_module_index, resolve_imports
+from .cross_reference import CrossReferenceIndex
+from .events import stage
+from .artifacts import NDJSONList, RepoArtifacts
+from .streaming import DEFAULT_MEMORY_LIMIT_MB, STREAMING_THRESHOLD_BYTES, SpillIndex, stream_mappings
+from .walker import is_excluded, walk_repo
 
 def extract_definitions(file_path):
     """
@@ -14,111 +20,96 @@ def extract_definitions(file_path):
       - Functions
       - Top-level variables
     """
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            source = f.read()
-        node = ast.parse(source, filename=file_path)
-    except Exception:
-        return None
-
-    classes = []
-    functions = []
-    variables = []
-
-    for n in node.body:
-        if isinstance(n, ast.ClassDef):
-            methods = [m.name for m in n.body if isinstance(m, ast.FunctionDef)]
-            classes.append({"name": n.name, "methods": methods})
-        elif isinstance(n, ast.FunctionDef):
-            functions.append(n.name)
-        elif isinstance(n, ast.Assign):
-            for target in n.targets:
-                if isinstance(target, ast.Name):
-                    variables.append(target.id)
-
-    return {
-        "classes":   classes,
-        "functions": functions,
-        "variables": variables
-    }
+    return scan_file(file_path)["definitions"]
 
-def find_imports(file_path):
+def find_imports(file_path, root_dir: str = None, module_index: dict = None, records: list = None):
     """
-    Uses modulefinder to list imported modules in a file.
+    Statically resolve the project modules imported by a file.
+    Import statements are read from the AST and matched against the project's
+    own module index; stdlib and third-party code is never loaded or scanned.
+    Pass the module_index of the project when resolving many files, otherwise
+    it is built from a walk of root_dir (no file is parsed for it).
     """
-    from modulefinder import ModuleFinder
-    finder = ModuleFinder()
-    try:
-        finder.run_script(file_path)
-    except Exception:
-        return []
-    imports = []
-
-    for name, mod in finder.modules.items():
-        if mod.__file__ and mod.__file__.endswith(".py"):
-            imports.append(name)
-    return imports
-
-def analyze_project(root_dir):
+    if root_dir is None:
+        root_dir = os.path.dirname(file_path)
+    rel_path = os.path.relpath(file_path, root_dir)
+
+    if records is None:
+        records = scan_file(file_path)["imports"]
+    if module_index is None:
+        module_index = build_module_index(root_dir, [path for _, path in list_python_files(root_dir)])
+
+    return resolve_imports(records, rel_path, module_index, root_dir)
+
+def analyze_project(root_dir, scans: dict = None, workers: int = 1, cache: AnalysisCache = None,
+                    module_index: dict = None):
     """
     Walk through the project directory and build a reference map for each Python file.
+    Pass the output of scanner.scan_project as scans to reuse already parsed files.
+    With workers > 1 (or None for all cores) files are parsed in a process pool.
+    With an AnalysisCache only files not analyzed before are parsed.
     """
+    if scans is None:
+        scans = scan_project(root_dir, workers=workers, cache=cache)
+    if module_index is None:
+        module_index = build_module_index(root_dir, scans.keys())
+
     reference_map = {}
-    for subdir, _, files in os.walk(root_dir):
-        for file in files:
-            if file.endswith(".py"):
-                abs_path = os.path.join(subdir, file)
-                rel_path = os.path.relpath(abs_path, root_dir)
-                defs = extract_definitions(abs_path)
-                if defs is None:
-                    continue
-                imports = find_imports(abs_path)
-                reference_map[rel_path] = {
-                    "imports": imports,
-                    "definitions": defs
-                }
+    for rel_path, scan in scans.items():
+        defs = scan["definitions"]
+        if defs is None:
+            continue
+        imports = find_imports(os.path.join(root_dir, rel_path), root_dir=root_dir,
+                               module_index=module_index, records=scan["imports"])
+        reference_map[rel_path] = {
+            "imports": imports,
+            "definitions": defs
+        }
     return reference_map
 
 def extract_usages(file_path):
     """
     Extract names used in function and method calls from a Python file.
     """
-    usages = []
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            tree = ast.parse(f.read(), filename=file_path)
-    except Exception:
-        return usages
-
-    for node in ast.walk(tree):
-        if not isinstance(node, ast.Call):
-            continue
-        func_node = node.func
-        if isinstance(func_node, ast.Name):
-            usages.append(func_node.id)
-        elif isinstance(func_node, ast.Attribute):
-            usages.append(func_node.attr)
-    return usages
-
-def analyze_usages(root_dir):
+    return scan_file(file_path)["usages"]
+
+def analyze_usages(root_dir, scans: dict = None, workers: int = 1, cache: AnalysisCache = None):
     """
     Walk through all Python files in the project directory and build a usage map.
-    The usage map maps each used name to the set of files (relative paths) where it is called.
+    The usage map maps each used name to the files (relative paths) where it is called,
+    in the order the files were walked.
+    Pass the output of scanner.scan_project as scans to reuse already parsed files.
+    With workers > 1 (or None for all cores) files are parsed in a process pool.
+    With an AnalysisCache only files not analyzed before are parsed.
     """
-    usage_map = defaultdict(set)
-    for subdir, _, files in os.walk(root_dir):
-        for file in tqdm(files, desc="Analyzing usages"):
-            if not file.endswith(".py"):
-                continue
-            abs_path = os.path.join(subdir, file)
-            rel_path = os.path.relpath(abs_path, root_dir)
-            names = extract_usages(abs_path)
-
-            for name in names:
-                usage_map[name].add(rel_path)
+    if scans is None:
+        scans = scan_project(root_dir, workers=workers, cache=cache)
+
+    # dict keys act as an insertion-ordered set, keeping the output deterministic
+    usage_map = defaultdict(dict)
+    for rel_path, scan in tqdm(scans.items(), desc="Analyzing usages"):
+        for name in scan["usages"]:
+            usage_map[name][rel_path] = None
 
     return {name: list(files) for name, files in usage_map.items()}
 
+def _combined_entry(info, usage_map):
+    defs = info.get("definitions", {})
+    entry = {
+        "imports": info.get("imports", []),
+        "definitions": defs,
+        "usage": {}
+    }
+    defined_names = defs.get("functions", []) + defs.get("variables", [])
+
+    for cls in defs.get("classes", []):
+        defined_names.append(cls.get("name"))
+        defined_names.extend(cls.get("methods", []))
+
+    for name in defined_names:
+        entry["usage"][name] = usage_map.get(name, [])
+    return entry
+
 def combine_maps(reference_map, usage_map):
     """
     For each file in the reference map, add a 'usage' field that maps each defined name
@@ -126,20 +117,7 @@ def combine_maps(reference_map, usage_map):
     """
     combined = {}
     for file, info in reference_map.items():
-        defs = info.get("definitions", {})
-        combined[file] = {
-            "imports": info.get("imports", []),
-            "definitions": defs,
-            "usage": {}
-        }
-        defined_names = defs.get("functions", []) + defs.get("variables", [])
-
-        for cls in defs.get("classes", []):
-            defined_names.append(cls.get("name"))
-            defined_names.extend(cls.get("methods", []))
-
-        for name in defined_names:
-            combined[file]["usage"][name] = usage_map.get(name, [])
+        combined[file] = _combined_entry(info, usage_map)
 
     return combined
 
@@ -170,6 +148,8 @@ def generate_global_cross_reference(reference_map, usage_map):
     """
     For each symbol in the usage map, determine its origin and type,
     and return cross-reference entries that include file usage and symbol type.
+    Symbols are matched by bare name only; see cross_reference.CrossReferenceIndex
+    for the import- and scope-aware engine used by generate_repo_mappings.
     """
     origin_map = generate_origin_map(reference_map)
     cross_refs = []
@@ -189,78 +169,257 @@ def generate_global_cross_reference(reference_map, usage_map):
                     })
     return cross_refs
 
-def generate_repo_mappings(repo_url: str, save_record: bool = False) -> gitRepo :
-    repo = gitRepo(repo_url=repo_url)
-    
-    temp_dir_outputs = tempfile.mkdtemp()
-    print(f"Created temporary directory for outputs: {temp_dir_outputs}")
-
-    file_names_temp = {
-        'reference_map':    os.path.join(temp_dir_outputs, 'reference_map.json'),
-        'usage_map':        os.path.join(temp_dir_outputs, 'usage_map.json'),
-        'combined_map':     os.path.join(temp_dir_outputs, 'combined_map.json'),
-        'cross_reference':  os.path.join(temp_dir_outputs, 'cross_reference.json')
-    }
-    
-    # Local NONTEMP save if save_record is True for debugging
-    file_names = {
-        'reference_map':    os.path.join('data', 'reference_map.json'),
-        'usage_map':        os.path.join('data', 'usage_map.json'),
-        'combined_map':     os.path.join('data', 'combined_map.json'),
-        'cross_reference':  os.path.join('data', 'cross_reference.json')
-    }
+def build_mappings(root_dir: str, scans: dict, on_event=None) -> RepoArtifacts :
+    """
+    Build every map for a scanned project. Besides the four maps, the result
+    keeps the scans and the cross-reference index so it can later be
+    patched by update_mappings instead of being rebuilt.
+    """
+    module_index = build_module_index(root_dir, scans.keys())
 
     print("Analyzing project for definitions and imports...")
-    reference_map = analyze_project(repo.tempdir)
-    with open(file_names_temp['reference_map'], "w", encoding="utf-8") as f:
-        json.dump(reference_map, f, indent=2)
-    print(f"reference_map.json saved to {file_names_temp['reference_map']}")
+    with stage(on_event, 'definitions') as info:
+        reference_map = analyze_project(root_dir, scans=scans, module_index=module_index)
+        info['symbols'] = sum(len(entry["definitions"]["classes"]) + len(entry["definitions"]["functions"])
+                              for entry in reference_map.values())
 
     print("Analyzing project for usage information...")
-    usage_map = analyze_usages(repo.tempdir)
-    with open(file_names_temp['usage_map'], "w", encoding="utf-8") as f:
-        json.dump(usage_map, f, indent=2)
-    print(f"usage_map.json saved to {file_names_temp['usage_map']}")
+    with stage(on_event, 'usages'):
+        usage_map = analyze_usages(root_dir, scans=scans)
 
     print("Combining reference and usage maps...")
     combined_map = combine_maps(reference_map, usage_map)
-    with open(file_names_temp['combined_map'], "w", encoding="utf-8") as f:
-        json.dump(combined_map, f, indent=2)
-    print(f"combined_map.json saved to {file_names_temp['combined_map']}")
 
     print("Generating global cross-reference map...")
-    cross_reference = generate_global_cross_reference(reference_map, usage_map)
-    with open(file_names_temp['cross_reference'], "w", encoding="utf-8") as f:
-        json.dump(cross_reference, f, indent=2)
-    print(f"cross_reference.json saved to {file_names_temp['cross_reference']}")
-        
-    
-    if save_record :
-        print("Saving all maps to non-temp data directory...")
-        if not os.path.exists('data') :
-            os.mkdir('data')
-        for key, value in file_names.items():
-            shutil.copy(file_names_temp[key], value)
-            print(f"Saved '{key}' to '{value}'")
-
-    print("All maps have been successfully generated and saved!")
-    print("Temporary output folder contents:")
-    for file_name in os.listdir(temp_dir_outputs):
-        print(f" - {file_name}")
+    with stage(on_event, 'cross_reference') as info:
+        index = CrossReferenceIndex(reference_map, scans, root_dir, module_index)
+        cross_reference = index.to_cross_reference()
+        info['edges'] = len(cross_reference)
+
+    return RepoArtifacts(
+        reference_map=reference_map,
+        usage_map=usage_map,
+        combined_map=combined_map,
+        cross_reference=cross_reference,
+        scans=scans,
+        index=index
+    )
+
+def update_mappings(mappings: RepoArtifacts, root_dir: str, changes: list) -> RepoArtifacts :
+    """
+    Patch a result from build_mappings in place for the files reported
+    changed by gitRepo.diff_name_status ((status, old_path, new_path) tuples).
+    Only changed files are re-parsed; usage lists, combined entries and
+    cross-reference edges are updated for the affected names and callers.
+
+    A changed .gitignore can add or drop files that did not change
+    themselves, so the maps are rebuilt from a fresh scan instead and the
+    new result is returned.
+    """
+    if any(os.path.basename(path) == '.gitignore'
+           for _, old_path, new_path in changes for path in (old_path, new_path) if path is not None):
+        print("A .gitignore changed, rebuilding all maps...")
+        return build_mappings(root_dir, scan_project(root_dir))
+
+    scans = mappings.scans
+    reference_map = mappings.reference_map
+    usage_map = mappings.usage_map
+    combined_map = mappings.combined_map
+    index = mappings.index
+    if index is None:
+        index = mappings.index = CrossReferenceIndex(reference_map, scans, root_dir)
+    # the index patches its edge list as files are re-resolved below
+    mappings.cross_reference = index.to_cross_reference()
+
+    removed, updated = [], []
+    for status, old_path, new_path in changes:
+        if old_path is not None and old_path.endswith(".py") and status[0] in 'DR':
+            removed.append(old_path)
+        if new_path is not None and new_path.endswith(".py") and status[0] != 'D':
+            if is_excluded(root_dir, new_path):
+                # treated like a deletion, the full walk would not list it either
+                removed.append(new_path)
+            else:
+                updated.append(new_path)
+    touched = list(dict.fromkeys(removed + updated))
+
+    # Callers of the touched files, found before their imports are re-indexed
+    affected = index.dependents(touched)
+
+    changed_names = set()
+    for file in touched:
+        old_scan = scans.pop(file, None)
+        for name in (old_scan["usages"] if old_scan is not None else []):
+            files = usage_map.get(name)
+            if files is not None and file in files:
+                files.remove(file)
+                if not files:
+                    del usage_map[name]
+                changed_names.add(name)
+        reference_map.pop(file, None)
+        combined_map.pop(file, None)
+        index.remove_file(file)
+
+    for file in updated:
+        abs_path = os.path.join(root_dir, file)
+        if os.path.isfile(abs_path):
+            scans[file] = scan_file(abs_path, file)
+
+    module_index = index.module_index
+    module_set_changed = False
+    # only added, deleted or renamed modules change what imports resolve to
+    if any(status[0] not in 'MT' and any(path is not None and path.endswith(".py") for path in (old_path, new_path))
+           for status, old_path, new_path in changes):
+        module_index = build_module_index(root_dir, scans.keys())
+        module_set_changed = module_index != index.module_index
+        index.module_index = module_index
+
+    for file in updated:
+        scan = scans.get(file)
+        if scan is None:
+            continue
+        for name in scan["usages"]:
+            files = usage_map.setdefault(name, [])
+            if file not in files:
+                files.append(file)
+            changed_names.add(name)
+        if scan["definitions"] is None:
+            continue
+        reference_map[file] = {
+            "imports": find_imports(os.path.join(root_dir, file), root_dir=root_dir,
+                                    module_index=module_index, records=scan["imports"]),
+            "definitions": scan["definitions"]
+        }
+        index.add_file(file, reference_map[file], scan)
+
+    if module_set_changed:
+        # Files were added or removed, so imports elsewhere may resolve differently
+        for file, info in reference_map.items():
+            info["imports"] = find_imports(os.path.join(root_dir, file), root_dir=root_dir,
+                                           module_index=module_index, records=scans[file]["imports"])
+            if file in combined_map:
+                combined_map[file]["imports"] = info["imports"]
+        affected |= index.reindex_imports(reference_map, scans)
+
+    for file in updated:
+        if file in reference_map:
+            combined_map[file] = _combined_entry(reference_map[file], usage_map)
+    for name in changed_names:
+        for definition in index.defined_where(name):
+            if definition["file"] in combined_map:
+                combined_map[definition["file"]]["usage"][name] = usage_map.get(name, [])
+
+    affected.update(updated)
+    index.resolve_files([file for file in affected if file in scans])
+    mappings.repo_summary = None
+    mappings.symbols = None
+    mappings.ranking = None
+
+    print(f"Incrementally updated {len(touched)} changed files, re-resolved {len(affected)} callers")
+    return mappings
+
+def stream_repo_mappings(repo: gitRepo, manifest, memory_limit_mb: int = DEFAULT_MEMORY_LIMIT_MB,
+                         out_dir: str = None, on_event=None) -> RepoArtifacts :
+    """
+    Build the maps of a repository too large to analyze in memory with
+    bounded memory (see streaming.stream_mappings). They are written as
+    NDJSON to out_dir, default the repo's temporary mapping directory, and
+    the cross-reference the summary prompts need is read back lazily (see
+    artifacts.NDJSONList).
+
+    The spill index stays open as the result's index and as the repo's
+    scans (see streaming.SpillIndex), so the summary and ranking stages
+    read files one at a time; it is removed with the repo. The result has
+    no scans and cannot be patched by update_mappings.
+    """
+    repo.set_mapping_path(tempfile.mkdtemp(prefix='maps-'))
+    index = SpillIndex(os.path.join(repo.get_mapping_path(), 'spill.sqlite3'), memory_limit_mb)
+    paths = stream_mappings(repo.tempdir, out_dir if out_dir is not None else repo.get_mapping_path(),
+                            memory_limit_mb, manifest=manifest, on_event=on_event, index=index)
+    for key, value in paths.items():
+        print(f"Saved '{key}' to '{value}'")
+    repo.set_scans(index.scans)
+    return RepoArtifacts(
+        reference_map=None,
+        usage_map=None,
+        combined_map=None,
+        cross_reference=NDJSONList(paths['cross_reference']),
+        scans=None,
+        index=index
+    )
+
+def generate_repo_mappings(repo_url: str, save_record: bool = False, workers: int = 1,
+                           clone_mode: str = DEFAULT_CLONE_MODE, analysis_cache: AnalysisCache = None,
+                           previous: RepoArtifacts = None, previous_commit: str = None, commit: str = None,
+                           on_event=None, record_dir: str = 'data', record_format: str = 'json',
+                           streaming: bool = None, memory_limit_mb: int = DEFAULT_MEMORY_LIMIT_MB) -> gitRepo :
+    """
+    Clone a repository (at commit, default HEAD) and generate its reference,
+    usage, combined and cross-reference maps as a RepoArtifacts kept in
+    memory on the repo (repo.get_mappings()). With a previous result
+    (repo.get_mappings() of an earlier run) and its commit, only the files
+    changed since that commit are re-analyzed and the previous maps are
+    patched in place. Stage progress is reported to on_event (see events.emit).
+    A local directory or archive is analyzed without cloning (see
+    repo_data.open_repo).
+
+    Repositories with more Python source than STREAMING_THRESHOLD_BYTES
+    (or any with streaming=True) are analyzed with memory_limit_mb of
+    memory instead, see stream_repo_mappings.
+
+    Nothing is written to disk unless save_record is True, in which case the
+    maps are saved compactly to record_dir (see RepoArtifacts.save; always
+    NDJSON when streaming).
+    """
+    with stage(on_event, 'clone'):
+        repo = open_repo(repo_url, clone_mode=clone_mode, commit=commit)
+        if commit is not None:
+            repo.checkout(commit)
+
+    if previous is not None and previous_commit is not None and previous.scans is not None:
+        print(f"Updating previous maps from commit {previous_commit}...")
+        with stage(on_event, 'update'):
+            mappings = update_mappings(previous, repo.tempdir, repo.diff_name_status(previous_commit))
+        streaming = False
+    else:
+        manifest = walk_repo(repo.tempdir)
+        repo.set_manifest(manifest)
+        if streaming is None:
+            streaming = manifest.total_bytes(('.py',), oversized=False) > STREAMING_THRESHOLD_BYTES
+
+        if streaming:
+            print(f"Streaming the analysis with a {memory_limit_mb} MiB memory limit...")
+            mappings = stream_repo_mappings(repo, manifest, memory_limit_mb, record_dir if save_record else None,
+                                            on_event=on_event)
+        else:
+            print("Scanning project files...")
+            if analysis_cache is not None:
+                hits, misses = analysis_cache.hits, analysis_cache.misses
+            with stage(on_event, 'scan') as info:
+                scans = scan_project(repo.tempdir, workers=workers, cache=analysis_cache, manifest=manifest)
+                info['files'] = len(scans)
+                info['bytes_read'] = sum(len(scan["content"].encode('utf-8', 'surrogatepass'))
+                                         for scan in scans.values() if scan["content"] is not None)
+                if analysis_cache is not None:
+                    info['analysis_cache_hits'] = analysis_cache.hits - hits
+                    info['analysis_cache_misses'] = analysis_cache.misses - misses
+            if analysis_cache is not None:
+                print(f"Analysis cache: {info['analysis_cache_hits']} hits, {info['analysis_cache_misses']} misses")
+            mappings = build_mappings(repo.tempdir, scans, on_event=on_event)
+
+    mappings.commit = repo.get_commit()
+    repo.set_mappings(mappings)
+    if not streaming:
+        repo.set_scans(mappings.scans)
+        if save_record :
+            print(f"Saving all maps to {record_dir}...")
+            for key, value in mappings.save(record_dir, record_format).items():
+                print(f"Saved '{key}' to '{value}'")
+
+    print("All maps have been successfully generated!")
     print()
     
-    repo.set_mapping_path(temp_dir_outputs)
-    
     return repo
-        
-        
-        # print(f'{os.listdir(temp_dir_outputs) = }')
-        
-        # shutil.rmtree(temp_dir_outputs)
-        # print("Temporary output folder cleaned up.")
-        
-    
-    # return 
 
 def main(repo_url: str) -> None :
     generate_repo_mappings(repo_url)
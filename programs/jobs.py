@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from . import helpers
+from .repo_data import is_local_source
+
+
+DEFAULT_MAX_WORKERS = 2
+DEFAULT_MAX_QUEUE_DEPTH = 16
+
+# Finished jobs are kept this many seconds for polling before being dropped.
+DEFAULT_RESULT_TTL = 3600
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class Job:
+    '''
+    One pipeline run. status goes queued -> running -> done | failed.
+
+    Progress events from the pipeline are appended to events as
+    (event, data) pairs; wait_events lets any number of readers follow
+    them live.
+    '''
+    def __init__(self, key: tuple, repo_url: str, commit: str = None) -> None:
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.repo_url = repo_url
+        self.commit = commit
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.done = threading.Event()
+        self.events = []
+        self._changed = threading.Condition()
+
+    def emit(self, event: str, data: dict) -> None :
+        with self._changed :
+            self.events.append((event, data))
+            self._changed.notify_all()
+
+    def wait_events(self, start: int, timeout: float = None) -> list :
+        '''
+        Events from index start on, waiting up to timeout seconds for new
+        ones. Returns [] if none arrived in time or the job has finished.
+        '''
+        with self._changed :
+            self._changed.wait_for(lambda: len(self.events) > start or self.done.is_set(), timeout)
+            return self.events[start:]
+
+    def to_dict(self) -> dict :
+        data = {
+            'job_id':   self.id,
+            'repo':     self.repo_url,
+            'commit':   self.commit,
+            'status':   self.status,
+            'created':  self.created,
+            'started':  self.started,
+            'finished': self.finished,
+        }
+        if self.status == 'done':
+            data['result'] = self.result
+        elif self.status == 'failed':
+            data['error'] = self.error
+        return data
+
+
+class JobQueue:
+    '''
+    Runs pipeline jobs on a bounded worker pool.
+
+    Submitting a repo+commit that already has an active job returns that
+    job instead of starting another one; pinned commits also reuse an
+    earlier successful result. Submitting fails with QueueFullError once
+    max_queue_depth jobs are queued or running.
+
+    run(repo_url, commit, on_event) -> result is the pipeline, e.g. a
+    wrapper around pipeline.generate_tour.
+    '''
+    def __init__(self, run, max_workers: int = DEFAULT_MAX_WORKERS,
+                 max_queue_depth: int = DEFAULT_MAX_QUEUE_DEPTH, result_ttl: float = DEFAULT_RESULT_TTL) -> None:
+        self.run = run
+        self.max_queue_depth = max_queue_depth
+        self.result_ttl = result_ttl
+        self.jobs = {}
+        self.by_key = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='gitours-job')
+
+    @staticmethod
+    def job_key(repo_url: str, commit: str = None) -> tuple :
+        if is_local_source(repo_url):
+            return os.path.abspath(repo_url), commit or 'HEAD'
+        return helpers.convert_git_url_to_cloner(repo_url), commit or 'HEAD'
+
+    def _active(self) -> int :
+        return sum(1 for job in self.jobs.values() if job.status in ('queued', 'running'))
+
+    def _expire(self) -> None :
+        now = time.time()
+        for job_id, job in list(self.jobs.items()):
+            if job.finished is not None and now - job.finished > self.result_ttl:
+                del self.jobs[job_id]
+                if self.by_key.get(job.key) is job:
+                    del self.by_key[job.key]
+
+    def submit(self, repo_url: str, commit: str = None) -> tuple :
+        '''
+        Queue a job, returns (job, created). created is False when an
+        existing job for the same repo+commit was reused.
+        '''
+        key = self.job_key(repo_url, commit)
+        with self._lock :
+            self._expire()
+            existing = self.by_key.get(key)
+            if existing is not None:
+                if existing.status in ('queued', 'running'):
+                    return existing, False
+                if existing.status == 'done' and commit is not None:
+                    return existing, False
+
+            if self._active() >= self.max_queue_depth:
+                raise QueueFullError(f"Job queue is full ({self.max_queue_depth} jobs)")
+
+            job = Job(key, repo_url, commit)
+            job.emit('status', {'status': job.status})
+            self.jobs[job.id] = job
+            self.by_key[key] = job
+        self._pool.submit(self._execute, job)
+        return job, True
+
+    def _execute(self, job: Job) -> None :
+        job.status = 'running'
+        job.started = time.time()
+        job.emit('status', {'status': job.status})
+        try :
+            job.result = self.run(job.repo_url, job.commit, job.emit)
+            job.status = 'done'
+            job.emit('status', {'status': job.status})
+        except Exception as e :
+            traceback.print_exc()
+            job.error = str(e)
+            job.status = 'failed'
+            job.emit('status', {'status': job.status, 'error': job.error})
+        finally :
+            job.finished = time.time()
+            with job._changed :
+                job.done.set()
+                job._changed.notify_all()
+
+    def get(self, job_id: str) -> Job :
+        with self._lock :
+            return self.jobs.get(job_id)
+
+    def counts(self) -> dict :
+        '''
+        Number of known jobs per status.
+        '''
+        with self._lock :
+            counts = dict.fromkeys(('queued', 'running', 'done', 'failed'), 0)
+            for job in self.jobs.values():
+                counts[job.status] += 1
+            return counts
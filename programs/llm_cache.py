@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .metrics import REGISTRY
+
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'gitours', 'llm.sqlite3')
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+DEFAULT_TTL = 30 * 24 * 3600
+
+
+class LLMCache:
+    '''
+    Persistent cache of LLM summaries, stored in SQLite.
+
+    Keys are hashes of everything that determines a response: the model,
+    the system prompt, the prompt template version and the exact content
+    being summarized. Entries expire after ttl seconds and the least
+    recently used ones are evicted past max_bytes. hits/misses count
+    lookups so callers can report a hit rate per run.
+    '''
+    def __init__(self, path: str = None, max_bytes: int = None, ttl: float = DEFAULT_TTL) -> None:
+        self.path = path or os.getenv('GITOURS_LLM_CACHE', DEFAULT_CACHE_PATH)
+        self.max_bytes = max_bytes if max_bytes is not None else DEFAULT_MAX_BYTES
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key         TEXT PRIMARY KEY,
+                value       TEXT NOT NULL,
+                size        INTEGER NOT NULL,
+                created     REAL NOT NULL,
+                last_used   REAL NOT NULL
+            )''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)')
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(*parts) -> str :
+        '''
+        SHA-256 over the given parts (model, system prompt, template
+        version, content, ...), unambiguously separated.
+        '''
+        digest = hashlib.sha256()
+        for part in parts:
+            data = str(part).encode('utf-8')
+            digest.update(b'%d:' % len(data) + data)
+        return digest.hexdigest()
+
+    def get_many(self, keys: list) -> dict :
+        '''
+        Look up keys, returning {key: value} for live entries. Expired
+        entries are deleted and count as misses.
+        '''
+        found = {}
+        key_list = list(dict.fromkeys(keys))
+        now = time.time()
+        with self._lock :
+            for i in range(0, len(key_list), 500):
+                chunk = key_list[i:i + 500]
+                rows = self._conn.execute(
+                    f'SELECT key, value, created FROM responses WHERE key IN ({",".join("?" * len(chunk))})', chunk)
+                for key, value, created in rows:
+                    if now - created <= self.ttl:
+                        found[key] = json.loads(value)
+            self._conn.executemany('DELETE FROM responses WHERE key = ? AND created < ?',
+                                   [(key, now - self.ttl) for key in key_list if key not in found])
+            self._conn.executemany('UPDATE responses SET last_used = ? WHERE key = ?',
+                                   [(now, key) for key in found])
+            self._conn.commit()
+
+        hits = sum(1 for key in keys if key in found)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        REGISTRY.inc('gitours_cache_lookups_total', hits, cache='llm', result='hit')
+        REGISTRY.inc('gitours_cache_lookups_total', len(keys) - hits, cache='llm', result='miss')
+        return found
+
+    def put_many(self, values: dict) -> None :
+        '''
+        Store {key: JSON-serializable value} and evict if over budget.
+        '''
+        now = time.time()
+        rows = []
+        for key, value in values.items():
+            value = json.dumps(value, separators=(',', ':'))
+            rows.append((key, value, len(value), now, now))
+        with self._lock :
+            self._conn.executemany('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)', rows)
+            self._conn.commit()
+        self.evict()
+
+    def evict(self) -> int :
+        '''
+        Drop expired entries, then least recently used ones until the cache
+        fits in max_bytes. Returns the number of evicted entries.
+        '''
+        with self._lock :
+            evicted = self._conn.execute('DELETE FROM responses WHERE created < ?', (time.time() - self.ttl,)).rowcount
+            total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            stale = []
+            if total > self.max_bytes :
+                for key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY last_used'):
+                    if total <= self.max_bytes :
+                        break
+                    stale.append((key,))
+                    total -= size
+            self._conn.executemany('DELETE FROM responses WHERE key = ?', stale)
+            self._conn.commit()
+        return evicted + len(stale)
+
+    def hit_rate(self) -> float :
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def close(self) -> None :
+        with self._lock :
+            self._conn.close()
@@ -0,0 +1,271 @@
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import openai
+
+from .metrics import REGISTRY
+from .prompt_planner import estimate_tokens
+
+
+DEFAULT_MODEL = "o3-mini"
+DEFAULT_MAX_CONCURRENCY = int(os.getenv('GITOURS_LLM_CONCURRENCY', 4))
+DEFAULT_TIMEOUT = 600
+DEFAULT_MAX_RETRIES = 5
+
+# Optional account limits, e.g. GITOURS_LLM_RPM=500 GITOURS_LLM_TPM=200000
+DEFAULT_RPM = float(os.getenv('GITOURS_LLM_RPM', 0)) or None
+DEFAULT_TPM = float(os.getenv('GITOURS_LLM_TPM', 0)) or None
+
+
+class LLMRequestError(Exception):
+    '''
+    A failed LLM call. retryable is True for rate limits (429), server
+    errors (5xx), timeouts and dropped connections.
+    '''
+    def __init__(self, message: str, retryable: bool = False, retry_after: float = None) -> None:
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class OpenAIChatClient:
+    '''
+    LLM client backed by the openai package (ChatCompletion API).
+    '''
+    def __init__(self, model: str = DEFAULT_MODEL) -> None:
+        self.model = model
+
+    def __call__(self, system_prompt: str, prompt: str, timeout: float = None) -> str :
+        openai.api_key = os.getenv("OPENAI_API_KEY")
+        try :
+            response = openai.ChatCompletion.create(
+                model=self.model,
+                messages=[{"role": "system", "content": system_prompt},
+                          {"role": "user", "content": prompt}],
+                request_timeout=timeout
+            )
+        except (openai.error.RateLimitError, openai.error.ServiceUnavailableError,
+                openai.error.Timeout, openai.error.APIConnectionError, openai.error.TryAgain) as e :
+            raise LLMRequestError(str(e), retryable=True) from e
+        except openai.error.APIError as e :
+            raise LLMRequestError(str(e), retryable=(e.http_status or 500) >= 500) from e
+        return response['choices'][0]['message']['content']
+
+
+class HTTPChatClient:
+    '''
+    LLM client for any OpenAI-compatible /v1/chat/completions endpoint,
+    using only the standard library (e.g. a local fake server for benchmarks).
+    '''
+    def __init__(self, base_url: str, model: str = DEFAULT_MODEL, api_key: str = None) -> None:
+        self.url = base_url.rstrip('/') + '/chat/completions'
+        self.model = model
+        self.api_key = api_key if api_key is not None else os.getenv("OPENAI_API_KEY", "")
+
+    def __call__(self, system_prompt: str, prompt: str, timeout: float = None) -> str :
+        body = json.dumps({
+            "model": self.model,
+            "messages": [{"role": "system", "content": system_prompt},
+                         {"role": "user", "content": prompt}]
+        }).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body, headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        })
+        try :
+            with urllib.request.urlopen(request, timeout=timeout) as response :
+                data = json.loads(response.read())
+        except urllib.error.HTTPError as e :
+            retry_after = e.headers.get('Retry-After')
+            raise LLMRequestError(f"HTTP {e.code} from {self.url}", retryable=e.code == 429 or e.code >= 500,
+                                  retry_after=float(retry_after) if retry_after else None) from e
+        except (urllib.error.URLError, TimeoutError, ConnectionError) as e :
+            raise LLMRequestError(f"Request to {self.url} failed: {e}", retryable=True) from e
+        return data['choices'][0]['message']['content']
+
+
+class RateLimiter:
+    '''
+    Thread-safe token buckets for requests per minute and tokens per minute.
+    None disables the respective limit.
+    '''
+    def __init__(self, requests_per_minute: float = None, tokens_per_minute: float = None) -> None:
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self._requests = requests_per_minute or 0.0
+        self._tokens = tokens_per_minute or 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None :
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens: int = 0) -> None :
+        '''
+        Block until one request of tokens tokens fits in both buckets.
+        Requests larger than the whole token bucket wait for a full bucket.
+        '''
+        while True:
+            with self._lock :
+                now = time.monotonic()
+                self._refill(now)
+                need_tokens = min(tokens, self.tpm) if self.tpm else 0
+                waits = []
+                if self.rpm and self._requests < 1:
+                    waits.append((1 - self._requests) * 60 / self.rpm)
+                if self.tpm and self._tokens < need_tokens:
+                    waits.append((need_tokens - self._tokens) * 60 / self.tpm)
+                if not waits:
+                    if self.rpm:
+                        self._requests -= 1
+                    if self.tpm:
+                        self._tokens -= need_tokens
+                    return
+                wait = max(waits)
+            time.sleep(wait)
+
+
+class LLMExecutor:
+    '''
+    Runs many LLM requests concurrently on a thread pool.
+
+    Every call goes through the rate limiter, gets a per-call timeout and
+    is retried with jittered exponential backoff when the client raises a
+    retryable LLMRequestError (429, 5xx, timeouts). Results are returned in
+    request order.
+
+    client(system_prompt, prompt, timeout=...) -> str is pluggable, see
+    OpenAIChatClient and HTTPChatClient. Executors sharing a slots
+    semaphore never have more requests in flight together than it allows.
+
+    requests, prompt_tokens, response_tokens (estimated), seconds (summed
+    latency of the calls) and retries accumulate over the executor's life.
+    '''
+    def __init__(self, client=None, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 rate_limiter: RateLimiter = None, timeout: float = DEFAULT_TIMEOUT,
+                 max_retries: int = DEFAULT_MAX_RETRIES, base_delay: float = 1.0, max_delay: float = 60.0,
+                 slots: threading.Semaphore = None) -> None:
+        self.client = client if client is not None else OpenAIChatClient()
+        self.slots = slots
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter(DEFAULT_RPM, DEFAULT_TPM)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self.seconds = 0.0
+        self._stats_lock = threading.Lock()
+
+    def _backoff(self, attempt: int, error: LLMRequestError) -> float :
+        if error.retry_after is not None:
+            return error.retry_after
+        # "full jitter" exponential backoff
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, system_prompt: str, prompt: str) -> str :
+        '''
+        Run a single request with rate limiting, timeout and retries.
+        '''
+        tokens = estimate_tokens(system_prompt) + estimate_tokens(prompt)
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(tokens)
+            try :
+                if self.slots is None:
+                    response = self.client(system_prompt, prompt, timeout=self.timeout)
+                else:
+                    with self.slots :
+                        response = self.client(system_prompt, prompt, timeout=self.timeout)
+            except LLMRequestError as e :
+                if not e.retryable or attempt == self.max_retries:
+                    self._record(start, tokens, None)
+                    raise
+                delay = self._backoff(attempt, e)
+                with self._stats_lock :
+                    self.retries += 1
+                REGISTRY.inc('gitours_llm_retries_total')
+                print(f"LLM request failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+            else :
+                self._record(start, tokens, response)
+                return response
+
+    def _record(self, start: float, tokens: int, response: str) -> None :
+        elapsed = time.perf_counter() - start
+        response_tokens = estimate_tokens(response) if response is not None else 0
+        with self._stats_lock :
+            self.requests += 1
+            self.prompt_tokens += tokens
+            self.response_tokens += response_tokens
+            self.seconds += elapsed
+        REGISTRY.inc('gitours_llm_requests_total', status='ok' if response is not None else 'error')
+        REGISTRY.observe('gitours_llm_request_duration_seconds', elapsed)
+        REGISTRY.inc('gitours_llm_prompt_tokens_total', tokens)
+        REGISTRY.inc('gitours_llm_response_tokens_total', response_tokens)
+
+    def stats(self) -> dict :
+        '''
+        Snapshot of the accumulated request, token, latency and retry totals.
+        '''
+        with self._stats_lock :
+            return {
+                'requests':         self.requests,
+                'prompt_tokens':    self.prompt_tokens,
+                'response_tokens':  self.response_tokens,
+                'seconds':          round(self.seconds, 3),
+                'retries':          self.retries,
+            }
+
+    def run(self, requests: list, on_result=None, on_error=None) -> list :
+        '''
+        Run [(system_prompt, prompt)] requests concurrently, results in order.
+        on_result(index, response) is called as each request finishes, in
+        completion order.
+
+        A request that still fails after its retries does not cancel the
+        others. With on_error, on_error(index, error) is called for it and
+        its result is None; without, the first such error is raised once
+        every other request has finished.
+        '''
+        results = [None] * len(requests)
+        errors = []
+
+        def finished(i: int, call) -> None :
+            try :
+                results[i] = call()
+            except LLMRequestError as e :
+                if on_error is None:
+                    errors.append(e)
+                else:
+                    on_error(i, e)
+                return
+            if on_result is not None:
+                on_result(i, results[i])
+
+        if self.max_concurrency == 1 or len(requests) <= 1:
+            for i, (system_prompt, prompt) in enumerate(requests):
+                finished(i, lambda: self.call(system_prompt, prompt))
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(requests))) as pool :
+                futures = {pool.submit(self.call, system_prompt, prompt): i
+                           for i, (system_prompt, prompt) in enumerate(requests)}
+                for future in as_completed(futures):
+                    finished(futures[future], future.result)
+        if errors:
+            raise errors[0]
+        return results
@@ -0,0 +1,164 @@
+import bisect
+import os
+import threading
+import time
+
+
+# Histogram buckets in seconds, from fast local stages up to slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+HELP = {
+    'gitours_runs_total':                   'Pipeline runs by final status.',
+    'gitours_run_duration_seconds':         'Wall time of whole pipeline runs.',
+    'gitours_stage_duration_seconds':       'Wall time of pipeline stages.',
+    'gitours_files_total':                  'Python files scanned.',
+    'gitours_bytes_read_total':             'Bytes of source read by the scanner.',
+    'gitours_symbols_total':                'Top-level symbols found.',
+    'gitours_edges_total':                  'Cross-reference edges produced.',
+    'gitours_llm_requests_total':           'LLM requests by outcome.',
+    'gitours_llm_request_duration_seconds': 'Latency of single LLM requests, retries included.',
+    'gitours_llm_prompt_tokens_total':      'Estimated prompt tokens sent to the LLM.',
+    'gitours_llm_response_tokens_total':    'Estimated response tokens received from the LLM.',
+    'gitours_llm_retries_total':            'Retried LLM requests.',
+    'gitours_cache_lookups_total':          'Cache lookups by cache and result.',
+    'gitours_jobs':                         'Backend jobs by status.',
+}
+
+
+def _escape(value) -> str :
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(labels: tuple, extra: str = '') -> str :
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class Metrics:
+    '''
+    Thread-safe registry of counters, gauges and histograms, rendered in
+    the Prometheus text format by render().
+
+    Every method returns immediately while enabled is False, so
+    instrumented code costs next to nothing when metrics are off.
+    '''
+    def __init__(self, enabled: bool = False, buckets: tuple = DEFAULT_BUCKETS) -> None:
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None :
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock :
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels) -> None :
+        if not self.enabled:
+            return
+        with self._lock :
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name: str, value: float, **labels) -> None :
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock :
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][bisect.bisect_left(self.buckets, value)] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def render(self) -> str :
+        with self._lock :
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {key: [list(h[0]), h[1], h[2]] for key, h in self._histograms.items()}
+
+        lines = []
+        def header(name: str, kind: str, seen: set) -> None:
+            if name in seen:
+                return
+            seen.add(name)
+            if name in HELP:
+                lines.append(f'# HELP {name} {HELP[name]}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        seen = set()
+        for (name, labels), value in sorted(counters.items()):
+            header(name, 'counter', seen)
+            lines.append(f'{name}{_labels(labels)} {value}')
+        for (name, labels), value in sorted(gauges.items()):
+            header(name, 'gauge', seen)
+            lines.append(f'{name}{_labels(labels)} {value}')
+        for (name, labels), (counts, total, count) in sorted(histograms.items()):
+            header(name, 'histogram', seen)
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{float(bound)}"'
+                lines.append(f'{name}_bucket{_labels(labels, le)} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {total}')
+            lines.append(f'{name}_count{_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry, enabled with GITOURS_METRICS=1 (the backend turns it on)
+REGISTRY = Metrics(enabled=os.getenv('GITOURS_METRICS', '0') == '1')
+
+
+class RunReport:
+    '''
+    Event consumer (see events.emit) that builds the structured timing
+    report of one pipeline run and feeds the registry. Events are passed
+    on to on_event unchanged.
+
+    Stage "done" events contribute their elapsed time and counts (files,
+    bytes_read, symbols, edges, ...); the "llm" event its request, token
+    and cache totals.
+    '''
+    def __init__(self, on_event=None, registry: Metrics = None) -> None:
+        self.on_event = on_event
+        self.registry = registry if registry is not None else REGISTRY
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.counts = {}
+        self.llm = {}
+
+    def __call__(self, event: str, data: dict) -> None :
+        if event == 'stage' and data.get('status') == 'done':
+            self.stages[data['name']] = data['elapsed']
+            self.registry.observe('gitours_stage_duration_seconds', data['elapsed'], stage=data['name'])
+            for key, value in data.items():
+                if key in ('name', 'status', 'elapsed') or not isinstance(value, (int, float)):
+                    continue
+                self.counts[key] = self.counts.get(key, 0) + value
+                if key in ('files', 'bytes_read', 'symbols', 'edges'):
+                    self.registry.inc(f'gitours_{key}_total', value)
+        elif event == 'llm':
+            for key, value in data.items():
+                self.llm[key] = self.llm.get(key, 0) + value
+        if self.on_event is not None:
+            self.on_event(event, data)
+
+    def finish(self, status: str = 'done') -> dict :
+        '''
+        Close the run and return its report.
+        '''
+        elapsed = time.perf_counter() - self.start
+        self.registry.inc('gitours_runs_total', status=status)
+        self.registry.observe('gitours_run_duration_seconds', elapsed)
+        return {
+            'status':           status,
+            'total_seconds':    round(elapsed, 3),
+            'stages':           self.stages,
+            'counts':           self.counts,
+            'llm':              self.llm,
+        }
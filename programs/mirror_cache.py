@@ -0,0 +1,187 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import time
+from contextlib import contextmanager
+
+try :
+    import fcntl
+except ImportError :
+    # No advisory file locks on this platform (Windows); the cache still
+    # works but concurrent processes are not serialized.
+    fcntl = None
+
+from . import helpers
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'gitours', 'mirrors')
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3
+
+# Mirrors fetched more recently than this many seconds are reused as-is.
+DEFAULT_FETCH_INTERVAL = 60
+
+_LAST_USED_FILE = 'gitours-last-used'
+_LAST_FETCHED_FILE = 'gitours-last-fetched'
+
+
+class MirrorCache:
+    '''
+    Persistent cache of bare git mirrors, one per normalized repository URL.
+
+    A missing mirror is created with "git clone --mirror", an existing one is
+    refreshed with "git fetch". Each request then gets its own worktree
+    checked out from the local mirror, so repeat requests only pay for an
+    incremental fetch. Per-mirror file locks make concurrent requests for the
+    same repo share one mirror safely, and the least recently used mirrors
+    are evicted once the cache grows past max_bytes.
+    '''
+    def __init__(self, cache_dir: str = None, max_bytes: int = None,
+                 fetch_interval: float = DEFAULT_FETCH_INTERVAL) -> None:
+        self.cache_dir = cache_dir or os.getenv('GITOURS_MIRROR_DIR', DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv('GITOURS_MIRROR_MAX_BYTES', DEFAULT_MAX_BYTES))
+        self.fetch_interval = fetch_interval
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key_for(self, repo_url: str) -> str :
+        '''
+        Stable, filesystem-safe cache key for a repository URL.
+        '''
+        if os.path.isdir(repo_url) :
+            normalized = os.path.abspath(repo_url)
+        elif repo_url.startswith('file://') :
+            normalized = repo_url
+        else :
+            normalized = helpers.convert_git_url_to_cloner(repo_url)
+
+        readable = normalized.rstrip('/').split('/')[-2:]
+        readable = '__'.join(part for part in readable if part).replace('.git', '')
+        digest = hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]
+        return f'{readable}-{digest}'
+
+    def mirror_path(self, repo_url: str) -> str :
+        return os.path.join(self.cache_dir, self.key_for(repo_url) + '.git')
+
+    @contextmanager
+    def _lock(self, mirror_path: str, blocking: bool = True) :
+        '''
+        Exclusive advisory lock on a mirror. Yields False if blocking is
+        False and another process holds the lock.
+        '''
+        with open(mirror_path + '.lock', 'a') as lock_file :
+            if fcntl is None :
+                yield True
+                return
+            try :
+                fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError :
+                yield False
+                return
+            try :
+                yield True
+            finally :
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _stamp(mirror_path: str, name: str) -> None :
+        with open(os.path.join(mirror_path, name), 'w') as f :
+            f.write(str(time.time()))
+
+    @staticmethod
+    def _stamp_time(mirror_path: str, name: str) -> float :
+        try :
+            return os.path.getmtime(os.path.join(mirror_path, name))
+        except OSError :
+            return 0.0
+
+    def _touch(self, mirror_path: str) -> None :
+        self._stamp(mirror_path, _LAST_USED_FILE)
+
+    def _last_used(self, mirror_path: str) -> float :
+        return self._stamp_time(mirror_path, _LAST_USED_FILE)
+
+    def _last_fetched(self, mirror_path: str) -> float :
+        '''
+        Time of the last successful clone or fetch, independent of use, so
+        a mirror requested more often than fetch_interval is still refreshed.
+        '''
+        return self._stamp_time(mirror_path, _LAST_FETCHED_FILE)
+
+    def _ensure_mirror_locked(self, repo_url: str, mirror_path: str) -> None :
+        if os.path.isdir(mirror_path) :
+            if time.time() - self._last_fetched(mirror_path) >= self.fetch_interval :
+                print(f"Fetching into mirror: {mirror_path}")
+                subprocess.run(["git", "--git-dir", mirror_path, "fetch", "--prune", "origin"], check=True)
+                self._stamp(mirror_path, _LAST_FETCHED_FILE)
+        else :
+            print(f"Creating mirror: {mirror_path}")
+            partial_path = mirror_path + '.partial'
+            shutil.rmtree(partial_path, ignore_errors=True)
+            subprocess.run(["git", "clone", "--mirror", repo_url, partial_path], check=True)
+            os.rename(partial_path, mirror_path)
+            self._stamp(mirror_path, _LAST_FETCHED_FILE)
+        self._touch(mirror_path)
+
+    def add_worktree(self, repo_url: str, dest: str) -> str :
+        '''
+        Create or refresh the mirror for repo_url and check out its HEAD into
+        dest as a detached worktree. Returns the mirror path.
+        '''
+        mirror_path = self.mirror_path(repo_url)
+        with self._lock(mirror_path) :
+            self._ensure_mirror_locked(repo_url, mirror_path)
+            subprocess.run(["git", "--git-dir", mirror_path, "worktree", "add", "--detach", dest, "HEAD"], check=True)
+        self.evict()
+        return mirror_path
+
+    def remove_worktree(self, repo_url: str, dest: str) -> None :
+        '''
+        Detach a worktree created by add_worktree from its mirror.
+        '''
+        mirror_path = self.mirror_path(repo_url)
+        if not os.path.isdir(mirror_path) :
+            return
+        with self._lock(mirror_path) :
+            subprocess.run(["git", "--git-dir", mirror_path, "worktree", "remove", "--force", dest],
+                           check=False, capture_output=True)
+            subprocess.run(["git", "--git-dir", mirror_path, "worktree", "prune"], check=False)
+
+    def _has_worktrees(self, mirror_path: str) -> bool :
+        subprocess.run(["git", "--git-dir", mirror_path, "worktree", "prune"], check=False)
+        worktrees = os.path.join(mirror_path, 'worktrees')
+        return os.path.isdir(worktrees) and bool(os.listdir(worktrees))
+
+    @staticmethod
+    def _dir_size(path: str) -> int :
+        total = 0
+        for root, _, files in os.walk(path) :
+            for file in files :
+                try :
+                    total += os.path.getsize(os.path.join(root, file))
+                except OSError :
+                    pass
+        return total
+
+    def evict(self) -> list :
+        '''
+        Remove least recently used mirrors until the cache fits in max_bytes.
+        Mirrors that are locked or still have worktrees checked out are kept.
+        Returns the evicted mirror paths.
+        '''
+        mirrors = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                   if name.endswith('.git') and os.path.isdir(os.path.join(self.cache_dir, name))]
+        sizes = {mirror: self._dir_size(mirror) for mirror in mirrors}
+        total = sum(sizes.values())
+
+        evicted = []
+        for mirror in sorted(mirrors, key=self._last_used) :
+            if total <= self.max_bytes :
+                break
+            with self._lock(mirror, blocking=False) as acquired :
+                if not acquired or self._has_worktrees(mirror) :
+                    continue
+                print(f"Evicting mirror: {mirror}")
+                shutil.rmtree(mirror, ignore_errors=True)
+            total -= sizes[mirror]
+            evicted.append(mirror)
+        return evicted
@@ -0,0 +1,105 @@
+import json
+
+from . import helpers
+from . import itemizer
+from . import clone_summary as get_files
+from .analysis_cache import AnalysisCache
+from .codetours import codetour_steps, generate_codetour, parse_prompt_1, summary_items
+from .events import emit, stage
+from .llm_cache import LLMCache
+from .llm_executor import LLMExecutor
+from .metrics import RunReport
+from .ranking import DEFAULT_TOP_K, rank_symbols, select_summary, tour_positions
+from .repo_data import is_local_source
+from .streaming import DEFAULT_MEMORY_LIMIT_MB
+
+
+def generate_tour(repo_url: str, commit: str = None, analysis_cache: AnalysisCache = None,
+                  llm_cache: LLMCache = None, save_record: bool = False, executor: LLMExecutor = None,
+                  on_event=None, top_k: int = DEFAULT_TOP_K, record_dir: str = 'data',
+                  streaming: bool = None, memory_limit_mb: int = DEFAULT_MEMORY_LIMIT_MB) -> dict :
+    """
+    Run the whole pipeline for one repository (a GitHub URL, or a local
+    directory or archive analyzed without cloning): clone, analyze, summarize
+    with the LLM and assemble the CodeTour. Temporary clone and map
+    directories are always removed. Returns the codetour dict.
+
+    Before the LLM is called, the top_k symbols are picked and ordered
+    locally (see ranking.rank_symbols) and only those are summarized;
+    top_k=0 leaves picking and ordering to the model.
+
+    Large repositories (or any with streaming=True) are analyzed with
+    memory_limit_mb of memory (see itemizer.stream_repo_mappings); their
+    cross-reference and repo summary are then read lazily from NDJSON
+    files by the later stages.
+
+    With save_record, the maps and the LLM prompts and response are written
+    to record_dir; concurrent runs need a record_dir each.
+
+    Progress goes to on_event(event, data) (see events.emit). Every finished
+    summarization chunk is followed by a "steps" event with its CodeTour
+    steps, so a client can render the first steps long before the tour is
+    complete. The run ends with a "report" event holding its timing report
+    (see metrics.RunReport), which is also printed as one JSON line.
+    """
+    report = RunReport(on_event)
+    status = 'failed'
+    repo = None
+    try :
+        if is_local_source(repo_url):
+            cleaned_url = repo_url
+        else:
+            cleaned_url = helpers.convert_git_url_to_cloner(repo_url)
+            print(f"Cleaned URL: {cleaned_url}")
+
+        repo = itemizer.generate_repo_mappings(repo_url=cleaned_url, save_record=save_record,
+                                               analysis_cache=analysis_cache, commit=commit,
+                                               on_event=report, record_dir=record_dir, streaming=streaming,
+                                               memory_limit_mb=memory_limit_mb)
+
+        with stage(report, 'repo_summary'):
+            get_files.get_repo_json_tempfile(repo)
+        artifacts = repo.get_mappings()
+
+        repo_summary, order = artifacts.repo_summary, None
+        if top_k:
+            with stage(report, 'rank') as info:
+                artifacts.ranking = rank_symbols(artifacts.symbols, repo.get_scans(), artifacts.index, top_k)
+                repo_summary = select_summary(artifacts.repo_summary, artifacts.symbols, artifacts.ranking)
+                order = tour_positions(artifacts.ranking)
+                info['symbol_edges'] = artifacts.ranking['edges']
+                info['selected'] = len(order)
+
+        # turns each finished chunk into tour steps with the symbols and order picked above
+        def on_chunk(event, data):
+            if event != 'chunk':
+                emit(report, event, **data)
+                return
+            summaries = data.pop('summaries')
+            emit(report, 'chunk', **data)
+            if on_event is not None:
+                emit(report, 'steps', chunk=data['index'],
+                     steps=codetour_steps(summary_items(summaries, artifacts.symbols, order), repo.get_repo_path()))
+
+        with stage(report, 'summarize'):
+            llm_response_1 = get_files.summarize_with_llm_2(
+                cross_ref_dict=artifacts.cross_reference,
+                repo_summary_dict=repo_summary,
+                executor=executor,
+                cache=llm_cache,
+                on_event=on_chunk,
+                dump_dir=record_dir if save_record else None
+            )
+
+        with stage(report, 'tour'):
+            codetour_data = parse_prompt_1(data=llm_response_1, symbols=artifacts.symbols, order=order)
+            codetour = generate_codetour(data=codetour_data, repo=repo)
+        emit(report, 'tour', tour=codetour)
+        status = 'done'
+        return codetour
+    finally :
+        if repo is not None:
+            repo._close()
+        timing = report.finish(status)
+        print(f"Run report: {json.dumps(timing)}")
+        emit(on_event, 'report', report=timing)
@@ -0,0 +1,178 @@
+import ast
+import hashlib
+import io
+import json
+import tokenize
+
+from .prompt_planner import CHARS_PER_TOKEN, estimate_tokens
+
+
+# Explains the compacted repo_summary.json format to the model (see build_prompt_1).
+COMPACT_FORMAT_NOTE = '''
+The python files in "repo_summary.json" are compacted. Instead of "content", each python file has a "symbols" dictionary mapping every top-level class or function name (and "<module>" for the remaining top-level code) to its source:
+
+{
+    "RELATIVE_PATH_FROM_GITHUB_ROOT": {
+        "path": "RELATIVE_PATH_FROM_GITHUB_ROOT",
+        "name": "FILE_NAME",
+        "type": "FILE_EXTENSION",
+        "symbols": {
+            "<module>": "1|import os\\nimport sys\\n5|CONSTANT = 1",
+            "TOP_LEVEL_CLASS_OR_FUNCTION_NAME": "LINE_NUMBER|SOURCE LINE\\nNEXT SOURCE LINE\\n...",
+            ...
+        },
+        "symbol_ids": ["<module>", "TOP_LEVEL_CLASS_OR_FUNCTION_NAME", "CLASS_NAME.METHOD_NAME", ...]
+    },
+    ...
+}
+
+Blank lines (and possibly comments and docstrings) were removed and indentation is reduced to one space per level. A line prefixed with a number and a "|" has that ORIGINAL line number; a line without a prefix directly follows the line before it (original line number + 1). Nested classes and functions stay inside the source of their top-level symbol but have their own entry in "symbol_ids", which are still the only keys to use in the response.
+
+A file with "duplicate_of" instead of "symbols" is byte-for-byte identical to that file and needs no separate summary.
+'''
+
+
+def _comment_spans(content: str) -> dict :
+    """
+    {line number: column} of every comment, via tokenize. {} if the
+    source cannot be tokenized.
+    """
+    spans = {}
+    try :
+        for token in tokenize.generate_tokens(io.StringIO(content).readline):
+            if token.type == tokenize.COMMENT:
+                spans[token.start[0]] = token.start[1]
+    except (tokenize.TokenError, IndentationError, SyntaxError) :
+        return {}
+    return spans
+
+def _docstring_lines(tree: ast.Module) -> set :
+    lines = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        if node.body and isinstance(node.body[0], ast.Expr) and \
+           isinstance(node.body[0].value, ast.Constant) and isinstance(node.body[0].value.value, str):
+            lines.update(range(node.body[0].lineno, node.body[0].end_lineno + 1))
+    return lines
+
+def _indent_unit(lines: list) -> int :
+    """
+    Smallest indentation width used in the file (usually 4 or 2).
+    """
+    widths = [len(line) - len(line.lstrip(' ')) for line in lines if line.strip()]
+    return min([width for width in widths if width] or [1])
+
+def _symbol_spans(tree: ast.Module) -> list :
+    """
+    (name, first line, last line) of every top-level class and function,
+    decorators included.
+    """
+    spans = []
+    for node in tree.body:
+        if isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+            spans.append((node.name, start, node.end_lineno))
+    return spans
+
+def compact_source(content: str, strip_comments: bool = False, strip_docstrings: bool = False) -> dict :
+    """
+    Split python source into per-symbol slices, {symbol name: code}, with
+    the top-level code outside classes and functions under "<module>".
+
+    Blank lines, and optionally comments and docstrings, are dropped and
+    lines are re-indented to one space per level. Every run of consecutive
+    original lines starts with its line number ("12|..."), so the original
+    numbering can be recovered. Unparsable files become a single "<module>"
+    slice.
+    """
+    # split like the tokenizer does, so indices match AST line numbers
+    lines = [line.expandtabs() for line in content.replace('\r\n', '\n').replace('\r', '\n').split('\n')]
+    unit = _indent_unit(lines)
+    try :
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError) :
+        tree = None
+
+    dropped = _docstring_lines(tree) if strip_docstrings and tree is not None else set()
+    comments = _comment_spans(content) if strip_comments else {}
+
+    def numbered(numbers) -> str :
+        kept = []
+        previous = None
+        for number in numbers:
+            if number in dropped:
+                continue
+            line = lines[number - 1]
+            if number in comments:
+                line = line[:comments[number]]
+            code = line.strip()
+            if not code:
+                continue
+            code = ' ' * ((len(line) - len(line.lstrip(' '))) // unit) + code
+            kept.append(code if previous == number - 1 else f'{number}|{code}')
+            previous = number
+        return '\n'.join(kept)
+
+    spans = _symbol_spans(tree) if tree is not None else []
+    covered = set()
+    for _, start, end in spans:
+        covered.update(range(start, end + 1))
+
+    slices = {}
+    module_code = numbered(n for n in range(1, len(lines) + 1) if n not in covered)
+    if module_code:
+        slices["<module>"] = module_code
+    for name, start, end in spans:
+        code = numbered(range(start, end + 1))
+        if code:
+            # redefinitions of the same name share one entry
+            slices[name] = slices[name] + '\n' + code if name in slices else code
+    return slices
+
+def _json_tokens(summary) -> int :
+    # estimate_tokens(json.dumps(summary)), one entry at a time for lazy summaries
+    if isinstance(summary, dict):
+        return estimate_tokens(json.dumps(summary))
+    length = 2 + 2 * max(len(summary) - 1, 0)
+    for path, entry in summary.items():
+        length += len(json.dumps(path)) + 2 + len(json.dumps(entry))
+    return (length + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def compact_repo_summary(repo_summary: dict, strip_comments: bool = False, strip_docstrings: bool = False,
+                         dedupe: bool = True) -> tuple :
+    """
+    Compact the python entries of a repo summary (see
+    clone_summary.get_repo_json_tempfile) into symbol slices, replacing files
+    identical to an earlier one with {"duplicate_of": path}.
+
+    Returns (compacted summary, stats) where stats holds the file and
+    duplicate counts and the estimated tokens before and after.
+    """
+    compacted = {}
+    seen = {}
+    duplicates = 0
+    for path, entry in repo_summary.items():
+        content = entry.get('content')
+        if content is None:
+            compacted[path] = entry
+            continue
+
+        new_entry = {key: value for key, value in entry.items() if key != 'content'}
+        digest = hashlib.sha1(content.encode('utf-8', 'surrogatepass')).hexdigest()
+        if dedupe and content.strip() and digest in seen:
+            new_entry['duplicate_of'] = seen[digest]
+            new_entry.pop('symbol_ids', None)
+            duplicates += 1
+        else:
+            seen.setdefault(digest, path)
+            new_entry['symbols'] = compact_source(content, strip_comments, strip_docstrings)
+        compacted[path] = new_entry
+
+    stats = {
+        'files':            len(repo_summary),
+        'duplicates':       duplicates,
+        'tokens_before':    _json_tokens(repo_summary),
+        'tokens_after':     estimate_tokens(json.dumps(compacted)),
+    }
+    return compacted, stats
@@ -0,0 +1,108 @@
+import json
+import os
+from array import array
+
+
+# Rough characters-per-token ratio of OpenAI tokenizers on code and JSON.
+CHARS_PER_TOKEN = 4
+
+# Default input token budget per summarization request. Well under the
+# 200k context of o3-mini so the response has room and calls stay fast.
+DEFAULT_TOKEN_BUDGET = 60_000
+
+
+def estimate_tokens(text: str) -> int :
+    """
+    Cheap local token estimate for text, no tokenizer required.
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def _json_tokens(data) -> int :
+    return estimate_tokens(json.dumps(data))
+
+def _index_edges(cross_reference: list) -> tuple :
+    # one pass, so a lazily read cross-reference (artifacts.NDJSONList) is
+    # streamed once and only edge positions and sizes are kept
+    edges, tokens = {}, array('l')
+    for i, edge in enumerate(cross_reference):
+        edges.setdefault(edge["used_in"], []).append(i)
+        if edge["defined_in"] != edge["used_in"]:
+            edges.setdefault(edge["defined_in"], []).append(i)
+        tokens.append(_json_tokens(edge))
+    return edges, tokens
+
+def plan_batches(repo_summary: dict, cross_reference: list, token_budget: int = DEFAULT_TOKEN_BUDGET,
+                 overhead_tokens: int = 0) -> list :
+    """
+    Pack the files of repo_summary into batches whose estimated prompt size
+    (files + the cross-reference edges touching them + overhead_tokens) stays
+    under token_budget.
+
+    Files are packed in path order so related files tend to share a batch.
+    A file that does not fit in an empty batch gets a batch of its own.
+    cross_reference can be any sequence, e.g. a lazily read
+    artifacts.NDJSONList: it is read once in order, then only the edges
+    the batches need are looked up.
+
+    Returns a list of {"files": {path: entry}, "cross_reference": [edges],
+    "tokens": estimated tokens} dicts.
+    """
+    edges_by_file, edge_tokens = _index_edges(cross_reference)
+
+    batches = []
+    files, edge_ids, tokens = {}, {}, overhead_tokens
+
+    def flush():
+        if files:
+            batches.append({
+                "files":            files,
+                "cross_reference":  [cross_reference[i] for i in sorted(edge_ids)],
+                "tokens":           tokens
+            })
+
+    for path in sorted(repo_summary, key=lambda p: (os.path.dirname(p), p)):
+        entry = repo_summary[path]
+        new_edges = [i for i in edges_by_file.get(path, []) if i not in edge_ids]
+        cost = _json_tokens({path: entry}) + sum(edge_tokens[i] for i in new_edges)
+
+        if files and tokens + cost > token_budget:
+            flush()
+            files, edge_ids, tokens = {}, {}, overhead_tokens
+            new_edges = edges_by_file.get(path, [])
+            cost = _json_tokens({path: entry}) + sum(edge_tokens[i] for i in new_edges)
+
+        if overhead_tokens + cost > token_budget:
+            print(f"Warning: {path} alone needs ~{overhead_tokens + cost} tokens, over the {token_budget} budget")
+
+        files[path] = entry
+        edge_ids.update(dict.fromkeys(new_edges))
+        tokens += cost
+
+    flush()
+    return batches
+
+def merge_batch_results(results: list) -> dict :
+    """
+    Merge per-batch summaries (parse_prompt_1 format) into one dict.
+    "order" numbers restart in every batch, so each batch is
+    shifted past the highest order number of the batches before it.
+    """
+    merged = {}
+    offset = 0
+    for result in results:
+        highest = offset
+        for file_name_path, file_sums in result.items():
+            if not isinstance(file_sums, dict):
+                continue
+            target = merged.setdefault(file_name_path, {})
+            for section, sec_data in file_sums.items():
+                if not isinstance(sec_data, dict):
+                    continue
+                sec_data = dict(sec_data)
+                order = sec_data.get('order')
+                if isinstance(order, (int, float)):
+                    sec_data['order'] = order + offset
+                    highest = max(highest, sec_data['order'])
+                target[section] = sec_data
+        offset = highest
+    return merged
@@ -0,0 +1,357 @@
+import heapq
+import os
+import re
+from array import array
+from collections import defaultdict
+
+from .cross_reference import CrossReferenceIndex
+from .scanner import symbol_id
+from .source_reader import read_source
+
+
+# Symbols picked for the tour before any LLM call (0 sends every symbol to the model)
+DEFAULT_TOP_K = int(os.getenv('GITOURS_TOUR_SYMBOLS', 40))
+
+DAMPING = 0.85
+
+# Share of the PageRank teleport mass that goes to entry points instead of every symbol
+ENTRY_TELEPORT = 0.5
+
+# Edge weights per call site, import binding and method -> class link
+CALL_WEIGHT = 1.0
+IMPORT_WEIGHT = 0.25
+MEMBER_WEIGHT = 0.5
+
+# Files that are run directly rather than imported
+ENTRY_FILE_NAMES = ('__main__.py', 'main.py', 'app.py', 'cli.py', 'manage.py', 'wsgi.py', 'asgi.py')
+
+# Packaging files declaring console scripts ("name = pkg.mod:func")
+SCRIPT_FILES = ('pyproject.toml', 'setup.cfg', 'setup.py')
+
+# Test code is neither an entry point nor worth a tour step
+_TEST_PATH = re.compile(r'(^|/)(tests?|testing)/|(^|/)test_[^/]*\.py$|_test\.py$|(^|/)conftest\.py$')
+
+_MAIN_GUARD = re.compile(r'''^if\s+__name__\s*==\s*['"]__main__['"]\s*:''', re.M)
+_SCRIPT_TARGET = re.compile(r'''=\s*['"]?([A-Za-z_][\w.]*):([A-Za-z_][\w.]*)''')
+
+
+def _module_source(scans: dict, root_dir: str, path: str) -> str :
+    # the repo summary drops content from the scans once it is written
+    content = (scans.get(path) or {}).get('content')
+    if content is None and root_dir is not None:
+        try :
+            content = read_source(os.path.join(root_dir, path))['content']
+        except OSError :
+            content = None
+    return content or ''
+
+def _file_symbols(symbols: dict) -> dict :
+    # path -> [(lineno, end_lineno, node index)] in source order, "<module>" first
+    by_file = defaultdict(list)
+    for i, (sid, symbol) in enumerate(symbols.items()):
+        by_file[symbol['path']].append((symbol['lineno'], symbol['end_lineno'], i))
+    for spans in by_file.values():
+        spans.sort(key=lambda span: (span[0], -span[1]))
+    return by_file
+
+def _owners(spans: list) -> list :
+    """
+    Node index of the innermost symbol around every line of a file
+    (index 0 is unused).
+    """
+    last = max(end for _, end, _ in spans)
+    owners = [spans[0][2]] * (last + 1)
+    # outer symbols start first, so inner ones overwrite them
+    for start, end, i in spans:
+        owners[start:end + 1] = [i] * (end - start + 1)
+    return owners
+
+def build_symbol_graph(symbols: dict, scans: dict, index: CrossReferenceIndex) -> tuple :
+    """
+    Weighted, directed graph over the symbol IDs of a symbol table (see
+    clone_summary.build_symbol_table), as (node IDs, {(source, target):
+    weight}, [(class, method)]) with nodes given by their index.
+
+    Call sites become caller -> callee edges, attributed to the innermost
+    symbol around the call: cross-file calls as resolved by the
+    cross-reference index, same-file calls to a local or enclosing name or
+    to a method of the enclosing class by name. Import bindings become
+    importing module -> imported symbol (or module) edges, and every method
+    links to its class so busy methods lift their class too.
+    """
+    nodes = list(symbols)
+    position = {sid: i for i, sid in enumerate(nodes)}
+    edges = defaultdict(float)
+
+    def add(source: int, target: int, weight: float) -> None :
+        if source != target:
+            edges[(source, target)] += weight
+
+    def module_of(path: str) :
+        return position.get(symbol_id(path, '<module>'))
+
+    for path, spans in _file_symbols(symbols).items():
+        scan = scans.get(path) or {}
+        owners = _owners(spans)
+        module = module_of(path)
+        calls_by_name = defaultdict(list)
+
+        for call in scan.get('calls') or []:
+            lineno = call['lineno']
+            owner = owners[lineno] if lineno < len(owners) else module
+            calls_by_name[call['name']].append(owner)
+            # same-file targets; cross-file ones come from the index below
+            if call['base'] is None:
+                qualname = symbols[nodes[owner]]['qualname'] if owner != module else None
+                target = None
+                while target is None and qualname is not None:
+                    target = position.get(symbol_id(path, f'{qualname}.{call["name"]}'))
+                    qualname = qualname.rsplit('.', 1)[0] if '.' in qualname else None
+                if target is None:
+                    target = position.get(symbol_id(path, call['name']))
+            elif call['base'] in ('self', 'cls') and call['scope'] is not None:
+                target = position.get(symbol_id(path, f'{call["scope"]}.{call["name"]}'))
+            else:
+                target = None
+            if target is not None:
+                add(owner, target, CALL_WEIGHT)
+
+        for edge in index.calls_from(path):
+            defined_in, name = edge['defined_in'], edge['symbol']
+            if edge['symbol_type'] == 'method':
+                targets = [position.get(symbol_id(defined_in, f'{cls}.{name}'))
+                           for cls, methods in index.file_classes.get(defined_in, {}).items() if name in methods]
+            else:
+                targets = [position.get(symbol_id(defined_in, name))]
+            targets = [t for t in targets if t is not None] or [module_of(defined_in)]
+            if targets[0] is None:
+                continue
+            for owner in calls_by_name.get(name, [module]):
+                for target in targets:
+                    add(owner, target, CALL_WEIGHT / len(targets))
+
+        if module is not None:
+            for target_file, name in index.bindings.get(path, {}).values():
+                target = position.get(symbol_id(target_file, name)) if name is not None else None
+                if target is None:
+                    target = module_of(target_file)
+                if target is not None:
+                    add(module, target, IMPORT_WEIGHT)
+            for target_file in index.star_imports.get(path, []):
+                target = module_of(target_file)
+                if target is not None:
+                    add(module, target, IMPORT_WEIGHT)
+
+    members = []
+    for sid, symbol in symbols.items():
+        if '.' not in symbol['qualname']:
+            continue
+        parent = position.get(symbol_id(symbol['path'], symbol['qualname'].rsplit('.', 1)[0]))
+        if parent is not None and symbols[nodes[parent]]['kind'] == 'class':
+            add(position[sid], parent, MEMBER_WEIGHT)
+            members.append((parent, position[sid]))
+    edges.default_factory = None
+    return nodes, edges, members
+
+def pagerank(n: int, edges: dict, teleport: list = None, damping: float = DAMPING,
+             tol: float = 1e-9, max_iter: int = 100) -> list :
+    """
+    Weighted PageRank of n nodes by power iteration, with edges as
+    {(source, target): weight}. teleport is the restart distribution
+    (default uniform); the rank of nodes without out-edges is spread the
+    same way. Returns the scores, summing to 1.
+    """
+    if n == 0:
+        return []
+    if teleport is None:
+        teleport = [1.0 / n] * n
+    out_weight = [0.0] * n
+    out_degree = [0] * n
+    for (source, _), weight in edges.items():
+        out_weight[source] += weight
+        out_degree[source] += 1
+    # out-edges grouped by source in flat arrays (12 bytes an edge instead
+    # of a tuple each), source i's in [starts[i], starts[i + 1])
+    starts = array('l', [0]) * (n + 1)
+    for i in range(n):
+        starts[i + 1] = starts[i] + out_degree[i]
+    filled = array('l', starts[:n])
+    targets = array('l', [0]) * len(edges)
+    fractions = array('d', [0.0]) * len(edges)
+    for (source, target), weight in edges.items():
+        slot = filled[source]
+        targets[slot] = target
+        fractions[slot] = weight / out_weight[source]
+        filled[source] = slot + 1
+    del filled, out_degree
+    sources = [i for i in range(n) if starts[i + 1] > starts[i]]
+    dangling = [i for i in range(n) if not out_weight[i]]
+
+    rank = list(teleport)
+    for _ in range(max_iter):
+        restart = 1 - damping + damping * sum(rank[i] for i in dangling)
+        new = [restart * t for t in teleport]
+        for source in sources:
+            share = damping * rank[source]
+            for slot in range(starts[source], starts[source + 1]):
+                new[targets[slot]] += share * fractions[slot]
+        delta = sum(abs(a - b) for a, b in zip(new, rank))
+        rank = new
+        if delta < tol:
+            break
+    return rank
+
+def find_entry_points(symbols: dict, scans: dict, root_dir: str = None, module_index: dict = None) -> list :
+    """
+    Symbol IDs where execution starts: modules with an
+    `if __name__ == "__main__":` block or a typical script name (see
+    ENTRY_FILE_NAMES), top-level functions called main, and console scripts
+    declared in pyproject.toml, setup.cfg or setup.py. Test files are
+    left out.
+    """
+    entries = []
+    for sid, symbol in symbols.items():
+        path = symbol['path']
+        if _TEST_PATH.search(path.replace(os.sep, '/')):
+            continue
+        if symbol['kind'] == 'module':
+            content = _module_source(scans, root_dir, path)
+            if os.path.basename(path) in ENTRY_FILE_NAMES and content.strip() or _MAIN_GUARD.search(content):
+                entries.append(sid)
+        elif symbol['qualname'] == 'main':
+            entries.append(sid)
+
+    if root_dir is not None and module_index:
+        for name in SCRIPT_FILES:
+            try :
+                with open(os.path.join(root_dir, name), 'r', encoding='utf-8', errors='replace') as f:
+                    text = f.read()
+            except OSError :
+                continue
+            for module, attr in _SCRIPT_TARGET.findall(text):
+                path = module_index.get(module)
+                sid = symbol_id(path, attr) if path is not None else None
+                if sid in symbols and sid not in entries:
+                    entries.append(sid)
+    return entries
+
+def tour_order(selected: list, edges: dict, members: list, scores: list, entries: set) -> list :
+    """
+    Order the selected node indexes for the tour: a topological order of
+    the edges between them (callers and importers before what they use,
+    classes before their methods), entry points first and higher scores
+    first among the nodes that are free. Cycles are broken at their
+    highest-scored node.
+    """
+    chosen = set(selected)
+    successors = {i: [] for i in selected}
+    for source, target in edges:
+        if source in chosen and target in chosen:
+            successors[source].append(target)
+    # method -> class edges only serve the ranking, the tour shows the class first
+    for parent, child in members:
+        if parent in chosen and child in chosen:
+            successors[child].remove(parent)
+            if child not in successors[parent]:
+                successors[parent].append(child)
+    indegree = dict.fromkeys(selected, 0)
+    for source in selected:
+        for target in successors[source]:
+            indegree[target] += 1
+
+    def key(i: int) -> tuple :
+        return (i not in entries, -scores[i], i)
+
+    heap = [key(i) for i in selected if not indegree[i]]
+    heapq.heapify(heap)
+    order, done = [], set()
+    while len(order) < len(selected):
+        if not heap:
+            heapq.heappush(heap, min(key(i) for i in selected if i not in done))
+        i = heapq.heappop(heap)[-1]
+        if i in done:
+            continue
+        done.add(i)
+        order.append(i)
+        for target in successors[i]:
+            indegree[target] -= 1
+            if indegree[target] <= 0 and target not in done:
+                heapq.heappush(heap, key(target))
+    return order
+
+def rank_symbols(symbols: dict, scans: dict, index: CrossReferenceIndex, top_k: int = DEFAULT_TOP_K) -> dict :
+    """
+    Rank every symbol of a symbol table locally and pick the top_k for the
+    tour, in tour order.
+
+    Scores are a PageRank over the call and import graph (see
+    build_symbol_graph) that restarts at the entry points half of the time,
+    entry points nearer the repository root more often, so code reachable
+    from where the program starts ranks above helpers only tests call. The
+    shallowest entry points always get a tenth of the top_k slots, so the
+    tour can start where the program does. Test code and modules without
+    code are never picked.
+
+    Returns {"selected": [symbol IDs in tour order], "entry_points",
+    "scores": {symbol ID: score} of the selected symbols, "nodes", "edges"}.
+    """
+    nodes, edges, members = build_symbol_graph(symbols, scans, index)
+    entries = find_entry_points(symbols, scans, index.root_dir, index.module_index)
+    position = {sid: i for i, sid in enumerate(nodes)}
+    entry_set = {position[sid] for sid in entries}
+    n = len(nodes)
+
+    def depth(i: int) -> int :
+        return symbols[nodes[i]]['path'].replace(os.sep, '/').count('/')
+
+    teleport = None
+    if entries:
+        teleport = [(1 - ENTRY_TELEPORT) / n] * n
+        weights = {i: 1 / (1 + depth(i)) for i in entry_set}
+        total = sum(weights.values())
+        for i, weight in weights.items():
+            teleport[i] += ENTRY_TELEPORT * weight / total
+    scores = pagerank(n, edges, teleport)
+
+    def eligible(i: int) -> bool :
+        symbol = symbols[nodes[i]]
+        if _TEST_PATH.search(symbol['path'].replace(os.sep, '/')):
+            return False
+        if symbol['kind'] != 'module':
+            return True
+        return bool(_module_source(scans, index.root_dir, symbol['path']).strip())
+
+    candidates = [i for i in range(n) if eligible(i)]
+    candidates.sort(key=lambda i: -scores[i])
+    if top_k:
+        starts = sorted((i for i in entry_set if eligible(i)), key=lambda i: (depth(i), -scores[i]))
+        selected = starts[:max(1, top_k // 10)]
+        reserved = set(selected)
+        selected += [i for i in candidates if i not in reserved][:top_k - len(selected)]
+    else:
+        selected = candidates
+    order = tour_order(selected, edges, members, scores, entry_set)
+    return {
+        'selected':     [nodes[i] for i in order],
+        'entry_points': entries,
+        'scores':       {nodes[i]: scores[i] for i in order},
+        'nodes':        n,
+        'edges':        len(edges),
+    }
+
+def select_summary(repo_summary: dict, symbols: dict, ranking: dict) -> dict :
+    """
+    The part of a repo summary the model needs for a ranking: only files
+    with selected symbols, each listing only those in "symbol_ids".
+    """
+    wanted = defaultdict(set)
+    for sid in ranking['selected']:
+        wanted[symbols[sid]['path']].add(symbols[sid]['qualname'])
+    return {path: dict(entry, symbol_ids=[q for q in entry.get('symbol_ids', []) if q in wanted[path]])
+            for path, entry in repo_summary.items() if path in wanted}
+
+def tour_positions(ranking: dict) -> dict :
+    """
+    {symbol ID: position in the tour} of the selected symbols.
+    """
+    return {sid: i + 1 for i, sid in enumerate(ranking['selected'])}
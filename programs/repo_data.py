@@ -1,35 +1,128 @@
 
+import fnmatch
 import json
 import os
 import shutil
 import subprocess
+import tarfile
 import tempfile
+import zipfile
 from . import helpers
+from .mirror_cache import MirrorCache
 
 
+# Clone strategies accepted by gitRepo:
+#   full    - complete clone with full history (always used as the fallback)
+#   shallow - depth-1, blobless clone of the default branch
+#   sparse  - shallow + sparse checkout of only the files the pipeline reads
+#   mirror  - worktree checked out from a persistent local mirror (see MirrorCache)
+CLONE_MODES = ('full', 'shallow', 'sparse', 'mirror')
+DEFAULT_CLONE_MODE = os.getenv('GITOURS_CLONE_MODE', 'sparse')
+
+# Working tree files the pipeline consumes: sources and images for the repo
+# summary (see clone_summary.get_repo_json_tempfile), .gitignore files and the
+# packaging files that declare entry points. Patterns starting with "/" only
+# match at the repository root, the others at any depth (non-cone sparse checkout).
+SPARSE_CHECKOUT_PATTERNS = ['*.py', '*.png', '*.jpg', '*.jpeg', '.gitignore',
+                            '/pyproject.toml', '/setup.cfg', '/setup.py']
+
+# Archives accepted by localRepo, extracted without cloning
+ARCHIVE_EXTENSIONS = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz', '.zip')
+
+
+def is_local_source(source: str) -> bool :
+    """
+    Whether source is an existing local directory or archive rather than a
+    repository URL.
+    """
+    return os.path.isdir(source) or (source.lower().endswith(ARCHIVE_EXTENSIONS) and os.path.isfile(source))
+
 
 class gitRepo:
-    def __init__(self, repo_url: str) -> None:
+    def __init__(self, repo_url: str, clone_mode: str = DEFAULT_CLONE_MODE, mirror_cache: MirrorCache = None) -> None:
         '''
         Initialize the gitRepo object with a repository URL.
         
         Args:
             repo_url (str): The URL of the repository.
+            clone_mode (str): One of CLONE_MODES. Non-full modes fall back
+                to a full clone if they fail.
+            mirror_cache (MirrorCache): Cache used by the 'mirror' mode,
+                defaults to a MirrorCache in the default location.
         Returns:
             str path to tempdir
             '''
+        if clone_mode not in CLONE_MODES :
+            raise ValueError(f"Unknown clone mode: {clone_mode}")
+        
+        self._init_state(clone_mode, mirror_cache)
+        if clone_mode == 'mirror' and mirror_cache is None :
+            self.mirror_cache = MirrorCache()
+        
         self._set_repo_url(repo_url)
         self._clone_repo()
         
+    def _init_state(self, clone_mode: str, mirror_cache: MirrorCache = None) -> None :
+        '''
+        Per-run state shared by every kind of repository; filled in by the
+        analysis stages through the setters below.
+        '''
         self.mapping_path = None
+        self.repo_summary = None
+        self.scans = None
+        self.manifest = None
+        self.mappings = None
+        self.clone_mode = clone_mode
+        self.mirror_cache = mirror_cache
+        
+    def _clone_commands(self, clone_mode: str) -> list :
+        '''
+        Git commands that produce a working tree in self.tempdir for clone_mode.
+        '''
+        if clone_mode == 'full' :
+            return [["git", "clone", self.repo_url, self.tempdir]]
+        
+        # --depth is ignored for plain local paths, so go through file://
+        url = self.repo_url
+        if os.path.isdir(url) :
+            url = 'file://' + os.path.abspath(url)
+        
+        clone = ["git", "clone", "--depth", "1", "--filter=blob:none", "--single-branch", "--no-tags"]
+        if clone_mode == 'shallow' :
+            return [clone + [url, self.tempdir]]
+        
+        return [
+            clone + ["--sparse", url, self.tempdir],
+            ["git", "-C", self.tempdir, "sparse-checkout", "set", "--no-cone"] + SPARSE_CHECKOUT_PATTERNS,
+        ]
+        
+    def _run_clone(self, clone_mode: str) -> None :
+        if clone_mode == 'mirror' :
+            self.mirror_cache.add_worktree(self.repo_url, self.tempdir)
+            return
+        for command in self._clone_commands(clone_mode) :
+            subprocess.run(command, check=True)
         
     def _clone_repo(self) -> None :
         self.tempdir = tempfile.mkdtemp()
         
-        print(f"Cloning into temp directory: {self.tempdir}")
+        print(f"Cloning ({self.clone_mode}) into temp directory: {self.tempdir}")
         
         try :
-            subprocess.run(["git", "clone", self.repo_url, self.tempdir], check=True)
+            self._run_clone(self.clone_mode)
+            return
+        except (subprocess.CalledProcessError, OSError):
+            if self.clone_mode == 'full' :
+                print("Failed to clone the repository.")
+                self._close()
+                exit()
+        
+        print(f"{self.clone_mode} clone failed, falling back to a full clone.")
+        shutil.rmtree(self.tempdir, ignore_errors=True)
+        self.tempdir = tempfile.mkdtemp()
+        self.clone_mode = 'full'
+        try :
+            self._run_clone('full')
         except subprocess.CalledProcessError:
             print("Failed to clone the repository.")
             self._close()
@@ -39,23 +132,57 @@ class gitRepo:
         '''
         Close the gitRepo object, cleaning up any resources.
         '''
+        if getattr(self, 'clone_mode', None) == 'mirror' and hasattr(self, 'tempdir'):
+            self.mirror_cache.remove_worktree(self.repo_url, self.tempdir)
+        self._close_mappings()
         if hasattr(self, 'tempdir') and os.path.exists(self.tempdir):
             shutil.rmtree(self.tempdir)
-        if hasattr(self, 'mapping_path') and os.path.exists(self.mapping_path):
+        if getattr(self, 'mapping_path', None) is not None and os.path.exists(self.mapping_path):
             shutil.rmtree(self.mapping_path)
-        print(f"Removing temporary directory for cloning and maps:\n - {self.tempdir}\n - {self.mapping_path}")
+        removed = [path for path in (getattr(self, 'tempdir', None), self.mapping_path) if path is not None]
+        print("Removing temporary directory for cloning and maps:\n" + '\n'.join(f" - {path}" for path in removed))
+
+    def _close_mappings(self) -> None :
+        # a streamed analysis keeps its spill index open in the mapping path,
+        # the repo summary its NDJSON file
+        mappings = getattr(self, 'mappings', None)
+        if mappings is not None:
+            mappings.close()
+        close = getattr(getattr(self, 'repo_summary', None), 'close', None)
+        if close is not None:
+            close()
 
-    def save_repo_json_format(self, data: dict) -> None :
+    def set_repo_summary(self, data: dict) -> None :
+        '''
+        Keep the repo summary (see clone_summary.get_repo_json_tempfile)
+        for the summarization stage.
+        '''
+        self.repo_summary = data
+
+    def save_repo_json_format(self, data: dict = None) -> None :
+        '''
+        Opt-in: write the repo summary as compact JSON to the mapping path.
+        data may also be an iterable of (path, entry) pairs (see
+        clone_summary.iter_repo_summary); entries are written one at a time,
+        so the whole document is never built in memory.
+        '''
         if not hasattr(self, 'mapping_path') or self.mapping_path is None :
             raise ValueError("Mapping path is not set:", self.mapping_path)
         
         if not os.path.exists(self.mapping_path):
             os.mkdir(self.mapping_path)
             
+        data = data if data is not None else self.repo_summary
         with open(os.path.join(self.mapping_path, 'repo_summary.json'), "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+            f.write('{')
+            for i, (path, entry) in enumerate(data.items() if isinstance(data, dict) else data):
+                f.write((',' if i else '') + json.dumps(path) + ':' + json.dumps(entry, separators=(',', ':')))
+            f.write('}')
         
     def get_repo_json_data(self) -> dict :
+        if self.repo_summary is not None :
+            return self.repo_summary
+        
         if not hasattr(self, 'mapping_path') or self.mapping_path is None :
             raise ValueError("Mapping path is not set:", self.mapping_path)
         
@@ -64,6 +191,55 @@ class gitRepo:
         
         return data
 
+    def get_commit(self, rev: str = 'HEAD') -> str :
+        '''
+        Full SHA of rev in the cloned repository.
+        '''
+        return subprocess.run(["git", "-C", self.tempdir, "rev-parse", rev],
+                              check=True, capture_output=True, text=True).stdout.strip()
+
+    def _ensure_commit(self, commit: str) -> None :
+        has_commit = subprocess.run(["git", "-C", self.tempdir, "cat-file", "-e", commit + "^{commit}"],
+                                    capture_output=True).returncode == 0
+        if not has_commit :
+            # shallow clones only contain the latest commit
+            subprocess.run(["git", "-C", self.tempdir, "fetch", "--depth", "1", "origin", commit], check=True)
+
+    def checkout(self, commit: str) -> None :
+        '''
+        Check out a specific commit, fetching it first if the clone is shallow.
+        '''
+        self._ensure_commit(commit)
+        subprocess.run(["git", "-C", self.tempdir, "checkout", "--quiet", "--detach", commit], check=True)
+
+    def diff_name_status(self, old_commit: str, new_commit: str = 'HEAD') -> list :
+        '''
+        Files changed between two commits as (status, old_path, new_path)
+        tuples, as reported by "git diff --name-status" with rename detection.
+        old_path is None for added files and new_path is None for deleted ones.
+        '''
+        self._ensure_commit(old_commit)
+        output = subprocess.run(["git", "-C", self.tempdir, "diff", "--name-status", "-M", "-z", old_commit, new_commit],
+                                check=True, capture_output=True, text=True).stdout
+        fields = output.split('\0')
+        changes = []
+        i = 0
+        while i < len(fields) and fields[i] :
+            status = fields[i]
+            if status[0] in 'RC' :
+                changes.append((status, os.path.normpath(fields[i + 1]), os.path.normpath(fields[i + 2])))
+                i += 3
+                continue
+            path = os.path.normpath(fields[i + 1])
+            if status[0] == 'A' :
+                changes.append((status, None, path))
+            elif status[0] == 'D' :
+                changes.append((status, path, None))
+            else :
+                changes.append((status, path, path))
+            i += 2
+        return changes
+
     def get_repo_path(self) -> str :
         return self.tempdir
     
@@ -74,8 +250,183 @@ class gitRepo:
     def get_mapping_path(self) -> str :
         return self.mapping_path
     
+    def set_scans(self, scans: dict) -> None :
+        '''
+        Keep the per-file scans (see scanner.scan_project) so later stages
+        can reuse them instead of re-reading and re-parsing every file.
+        '''
+        self.scans = scans
+        
+    def get_scans(self) -> dict :
+        return self.scans
+    
+    def set_manifest(self, manifest) -> None :
+        '''
+        Keep the walker.FileManifest of the checkout so every stage lists
+        the same files without walking the tree again.
+        '''
+        self.manifest = manifest
+        
+    def get_manifest(self) :
+        return self.manifest
+    
+    def set_mappings(self, mappings) -> None :
+        '''
+        Keep the in-memory RepoArtifacts of itemizer.generate_repo_mappings so
+        later stages read it directly and it can be passed back as previous
+        for an incremental re-analysis.
+        '''
+        self.mappings = mappings
+        
+    def get_mappings(self) :
+        return self.mappings
+    
     def _set_repo_url(self, repo_url: str):
+        # Local repositories (paths or file:// URLs) are cloned as given
+        if os.path.isdir(repo_url) or repo_url.startswith('file://') :
+            self.repo_url = repo_url
+            return
         self.repo_url = helpers.convert_git_url_to_cloner(repo_url)
     
     def get_url(self) -> str :
-        return self.repo_url
\ No newline at end of file
+        return self.repo_url
+
+
+class localRepo(gitRepo):
+    '''
+    gitRepo for a source already on disk, so nothing is cloned.
+
+    A directory is analyzed in place and never modified or removed. An
+    archive (see ARCHIVE_EXTENSIONS) is streamed into a temp directory,
+    extracting only the files the pipeline reads (SPARSE_CHECKOUT_PATTERNS).
+    A single top-level directory in the archive, as in GitHub downloads,
+    becomes the repository root.
+
+    Commit-related methods work when the directory is a git checkout;
+    checkout() refuses to move the HEAD of a directory analyzed in place.
+    '''
+    def __init__(self, source: str) -> None:
+        if not is_local_source(source) :
+            raise ValueError(f"Not a local directory or archive: {source}")
+
+        self._init_state('local')
+        self.repo_url = os.path.abspath(source)
+        self._extract_dir = None
+
+        if os.path.isdir(source) :
+            self.tempdir = self.repo_url
+            print(f"Analyzing local directory in place: {self.tempdir}")
+        else :
+            self._extract_dir = tempfile.mkdtemp()
+            print(f"Extracting {self.repo_url} into temp directory: {self._extract_dir}")
+            try :
+                self._extract(self.repo_url, self._extract_dir)
+            except (tarfile.TarError, zipfile.BadZipFile, OSError) :
+                shutil.rmtree(self._extract_dir, ignore_errors=True)
+                raise
+            entries = os.listdir(self._extract_dir)
+            single = os.path.join(self._extract_dir, entries[0]) if len(entries) == 1 else None
+            self.tempdir = single if single is not None and os.path.isdir(single) else self._extract_dir
+
+    @staticmethod
+    def _wanted(name: str) -> tuple :
+        '''
+        Safe relative path parts of an archive member the pipeline reads,
+        or None to skip it.
+        '''
+        parts = [part for part in name.replace('\\', '/').split('/') if part not in ('', '.')]
+        if not parts or '..' in parts or os.path.isabs(name) or ':' in parts[0] :
+            return None
+        # the root is only known after extraction (see __init__), so
+        # root-anchored patterns match at any depth here
+        if not any(fnmatch.fnmatch(parts[-1], pattern.lstrip('/')) for pattern in SPARSE_CHECKOUT_PATTERNS) :
+            return None
+        return parts
+
+    @classmethod
+    def _extract(cls, archive: str, out_dir: str) -> None :
+        def write(parts: tuple, source) -> None :
+            target = os.path.join(out_dir, *parts)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f :
+                shutil.copyfileobj(source, f)
+
+        if archive.lower().endswith('.zip') :
+            with zipfile.ZipFile(archive) as zf :
+                for info in zf.infolist() :
+                    parts = cls._wanted(info.filename)
+                    if parts is not None and not info.is_dir() :
+                        with zf.open(info) as source :
+                            write(parts, source)
+            return
+
+        # "r|*" reads the archive as a stream, one member at a time
+        with tarfile.open(archive, 'r|*') as tf :
+            for member in tf :
+                parts = cls._wanted(member.name)
+                if parts is not None and member.isfile() :
+                    write(parts, tf.extractfile(member))
+
+    def _is_git(self) -> bool :
+        return subprocess.run(["git", "-C", self.tempdir, "rev-parse", "--show-toplevel"],
+                              capture_output=True).returncode == 0
+
+    def get_commit(self, rev: str = 'HEAD') -> str :
+        '''
+        Full SHA of rev if the source is a git checkout, otherwise None.
+        '''
+        if self._extract_dir is not None or not self._is_git() :
+            return None
+        return super().get_commit(rev)
+
+    def is_at(self, commit: str) -> bool :
+        '''
+        Whether commit resolves to the current HEAD of a git checkout.
+        '''
+        head = self.get_commit()
+        if head is None :
+            return False
+        try :
+            return self.get_commit(commit) == head
+        except subprocess.CalledProcessError :
+            return False
+
+    def checkout(self, commit: str) -> None :
+        if not self.is_at(commit) :
+            raise ValueError(f"Cannot check out {commit} in a local source analyzed in place: {self.repo_url}")
+
+    def diff_name_status(self, old_commit: str, new_commit: str = 'HEAD') -> list :
+        if self.get_commit() is None :
+            raise ValueError(f"Not a git checkout: {self.repo_url}")
+        return super().diff_name_status(old_commit, new_commit)
+
+    def _close(self) -> None :
+        '''
+        Remove the extracted archive and maps; a local directory is left alone.
+        '''
+        self._close_mappings()
+        removed = []
+        if self._extract_dir is not None and os.path.exists(self._extract_dir) :
+            shutil.rmtree(self._extract_dir)
+            removed.append(self._extract_dir)
+        if self.mapping_path is not None and os.path.exists(self.mapping_path) :
+            shutil.rmtree(self.mapping_path)
+            removed.append(self.mapping_path)
+        if removed :
+            print("Removing temporary directories:\n" + '\n'.join(f" - {path}" for path in removed))
+
+
+def open_repo(source: str, clone_mode: str = DEFAULT_CLONE_MODE, commit: str = None) -> gitRepo :
+    """
+    localRepo for a local directory or archive, gitRepo (a clone) otherwise.
+    Local directories are still cloned when a commit other than their HEAD
+    is requested, so the caller's working tree is never checked out.
+    """
+    if is_local_source(source) :
+        repo = localRepo(source)
+        if commit is None or repo.is_at(commit) :
+            return repo
+        repo._close()
+        if not os.path.isdir(source) :
+            raise ValueError(f"Cannot check out {commit} from an archive: {source}")
+    return gitRepo(repo_url=source, clone_mode=clone_mode)
@@ -0,0 +1,325 @@
+import os
+import ast
+from concurrent.futures import ProcessPoolExecutor
+
+from .analysis_cache import AnalysisCache, git_blob_shas, hash_blob
+from .walker import FileManifest, walk_repo
+
+# Number of files per process-pool work unit when scanning in parallel.
+DEFAULT_CHUNK_SIZE = 32
+
+# Bump whenever the scan record format or extraction logic changes, so
+# cached scans from older versions are not reused (see AnalysisCache).
+SCANNER_VERSION = 2
+
+
+def _definitions_from_tree(tree: ast.Module) -> dict :
+    """
+    Extract top-level definitions from a parsed module:
+      - Classes (and their methods)
+      - Functions
+      - Top-level variables
+    """
+    classes = []
+    functions = []
+    variables = []
+
+    for n in tree.body:
+        if isinstance(n, ast.ClassDef):
+            methods = [m.name for m in n.body if isinstance(m, (ast.FunctionDef, ast.AsyncFunctionDef))]
+            classes.append({"name": n.name, "methods": methods})
+        elif isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions.append(n.name)
+        elif isinstance(n, ast.Assign):
+            for target in n.targets:
+                if isinstance(target, ast.Name):
+                    variables.append(target.id)
+
+    return {
+        "classes":   classes,
+        "functions": functions,
+        "variables": variables
+    }
+
+def symbol_id(path: str, qualname: str) -> str :
+    """
+    Stable ID of a symbol: its file and qualified name, e.g.
+    "pkg/mod.py::Outer.method". Unlike line numbers it survives edits
+    elsewhere in the file.
+    """
+    return f'{path}::{qualname}'
+
+def _symbols_from_tree(tree: ast.Module) -> list :
+    """
+    Every class and function of a parsed module, nested and async ones
+    included, as {"qualname", "kind", "lineno", "end_lineno"} records in
+    source order. Nested names are dotted ("Outer.method", "func.helper");
+    a redefined name gets a "#2", "#3", ... suffix. lineno is the first
+    decorator's line, if any.
+    """
+    symbols = []
+    seen = {}
+
+    def visit(body: list, prefix: str) -> None :
+        for node in body:
+            if isinstance(node, ast.ClassDef):
+                kind = "class"
+            elif isinstance(node, ast.AsyncFunctionDef):
+                kind = "async_function"
+            elif isinstance(node, ast.FunctionDef):
+                kind = "function"
+            else:
+                # defs inside if/try/with blocks still belong to this scope
+                for field in ('body', 'handlers', 'cases', 'orelse', 'finalbody'):
+                    nested = getattr(node, field, None)
+                    if isinstance(nested, list):
+                        visit(nested, prefix)
+                continue
+            qualname = prefix + node.name
+            seen[qualname] = seen.get(qualname, 0) + 1
+            if seen[qualname] > 1:
+                qualname = f'{qualname}#{seen[qualname]}'
+            symbols.append({
+                "qualname":     qualname,
+                "kind":         kind,
+                "lineno":       min([node.lineno] + [d.lineno for d in node.decorator_list]),
+                "end_lineno":   node.end_lineno
+            })
+            visit(node.body, qualname + '.')
+
+    visit(tree.body, '')
+    return symbols
+
+def _usages_from_tree(tree: ast.Module) -> list :
+    """
+    Extract names used in function and method calls from a parsed module.
+    """
+    usages = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call):
+            continue
+        func_node = node.func
+        if isinstance(func_node, ast.Name):
+            usages.append(func_node.id)
+        elif isinstance(func_node, ast.Attribute):
+            usages.append(func_node.attr)
+    return usages
+
+def _dotted_name(node: ast.AST) -> str :
+    """
+    Render a call receiver as text: Names and Attribute chains become dotted
+    names ("self", "pkg.mod") and calls get a "()" suffix ("Cls()"). Anything
+    else (subscripts, literals, ...) cannot be resolved statically -> None.
+    """
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        value = _dotted_name(node.value)
+        return f'{value}.{node.attr}' if value and not value.endswith('()') else None
+    if isinstance(node, ast.Call):
+        func = _dotted_name(node.func)
+        return f'{func}()' if func and not func.endswith('()') else None
+    return None
+
+class _CallCollector(ast.NodeVisitor):
+    """
+    Collect call sites together with their receiver and enclosing class.
+    """
+    def __init__(self) -> None:
+        self.calls = []
+        self.class_bases = {}
+        self._class_stack = []
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        if not self._class_stack:
+            self.class_bases[node.name] = [b for b in map(_dotted_name, node.bases) if b]
+        self._class_stack.append(node.name)
+        self.generic_visit(node)
+        self._class_stack.pop()
+
+    def visit_Call(self, node: ast.Call) -> None:
+        func_node = node.func
+        if isinstance(func_node, ast.Name):
+            name, base = func_node.id, None
+        elif isinstance(func_node, ast.Attribute):
+            name, base = func_node.attr, _dotted_name(func_node.value)
+        else:
+            name = None
+        if name is not None:
+            self.calls.append({
+                "name":     name,
+                "base":     base,
+                "scope":    self._class_stack[-1] if self._class_stack else None,
+                "lineno":   node.lineno
+            })
+        self.generic_visit(node)
+
+def _calls_from_tree(tree: ast.Module) -> tuple :
+    """
+    Extract call-site records ({"name", "base", "scope", "lineno"}) and the
+    base classes of every top-level class from a parsed module.
+    """
+    collector = _CallCollector()
+    collector.visit(tree)
+    return collector.calls, collector.class_bases
+
+def _imports_from_tree(tree: ast.Module) -> list :
+    """
+    Extract every import statement in a parsed module as flat records:
+      - import a.b as c        -> {"module": "a.b", "name": None, "asname": "c", "level": 0}
+      - from ..a import b as c -> {"module": "a",   "name": "b",  "asname": "c", "level": 2}
+    """
+    imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imports.append({
+                    "module":   alias.name,
+                    "name":     None,
+                    "asname":   alias.asname,
+                    "level":    0,
+                    "lineno":   node.lineno
+                })
+        elif isinstance(node, ast.ImportFrom):
+            for alias in node.names:
+                imports.append({
+                    "module":   node.module,
+                    "name":     alias.name,
+                    "asname":   alias.asname,
+                    "level":    node.level,
+                    "lineno":   node.lineno
+                })
+    return imports
+
+def scan_file(file_path: str, rel_path: str = None) -> dict :
+    """
+    Read and parse a Python file exactly once and derive every per-file record
+    the analysis stages need from that single tree.
+
+    The returned scan has the following keys:
+      - path:        path relative to the project root (or file_path)
+      - content:     raw text of the file, None if it could not be read
+      - definitions: same format as itemizer.extract_definitions, None on failure
+      - usages:      call-site names, same format as itemizer.extract_usages
+      - imports:     import statement records (see _imports_from_tree)
+      - calls:       call-site records with receiver and class scope (see _calls_from_tree)
+      - class_bases: base class expressions of each top-level class
+      - symbols:     every class and function with its line span (see _symbols_from_tree)
+      - error:       read/parse error message, None on success
+    """
+    scan = {
+        "path":         rel_path if rel_path is not None else file_path,
+        "content":      None,
+        "definitions":  None,
+        "usages":       [],
+        "imports":      [],
+        "calls":        [],
+        "class_bases":  {},
+        "symbols":      [],
+        "error":        None
+    }
+
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            scan["content"] = f.read()
+        tree = ast.parse(scan["content"], filename=file_path)
+    except Exception as e:
+        scan["error"] = str(e)
+        return scan
+
+    scan["definitions"] = _definitions_from_tree(tree)
+    scan["usages"]      = _usages_from_tree(tree)
+    scan["imports"]     = _imports_from_tree(tree)
+    scan["calls"], scan["class_bases"] = _calls_from_tree(tree)
+    scan["symbols"]     = _symbols_from_tree(tree)
+    return scan
+
+def _scan_chunk(chunk: list) -> list :
+    """
+    Process-pool work unit: scan a chunk of (abs_path, rel_path) pairs.
+    """
+    return [scan_file(abs_path, rel_path) for abs_path, rel_path in chunk]
+
+def list_python_files(root_dir: str, manifest: FileManifest = None) -> list :
+    """
+    List (abs_path, rel_path) pairs of all Python files below root_dir, in walk order.
+    Excluded, ignored and oversized files are left out (see walker.walk_repo).
+    """
+    if manifest is None:
+        manifest = walk_repo(root_dir)
+    return manifest.paths(('.py',), oversized=False)
+
+def _scan_paths(paths: list, workers: int, chunk_size: int) -> dict :
+    if workers is None or workers <= 0:
+        workers = os.cpu_count() or 1
+    if workers == 1 or len(paths) <= chunk_size:
+        return {rel_path: scan_file(abs_path, rel_path) for abs_path, rel_path in paths}
+
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    scans = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_scans in executor.map(_scan_chunk, chunks):
+            for scan in chunk_scans:
+                scans[scan["path"]] = scan
+    return scans
+
+def _read_content(file_path: str) -> str :
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            return f.read()
+    except Exception:
+        return None
+
+def _file_blob_shas(root_dir: str, paths: list) -> dict :
+    """
+    Git blob SHA of every (abs_path, rel_path) in paths, taken from the git
+    index when possible and hashed from disk otherwise.
+    """
+    tracked = git_blob_shas(root_dir)
+    shas = {}
+    for abs_path, rel_path in paths:
+        sha = tracked.get(os.path.normpath(rel_path))
+        if sha is None:
+            try:
+                with open(abs_path, "rb") as f:
+                    sha = hash_blob(f.read())
+            except OSError:
+                continue
+        shas[rel_path] = sha
+    return shas
+
+def scan_project(root_dir: str, workers: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 cache: AnalysisCache = None, manifest: FileManifest = None) -> dict :
+    """
+    Walk through the project directory and scan each Python file once.
+    Returns a dict mapping relative paths to scans, in walk order. Pass the
+    manifest of an earlier walk_repo to avoid walking the tree again.
+
+    With workers > 1 the files are split into chunks of chunk_size and scanned
+    in a process pool. Chunks are merged back in walk order, so the result is
+    identical to the serial scan.
+
+    With a cache, files whose git blob SHA was analyzed before are not parsed
+    again; only their content is read.
+    """
+    paths = list_python_files(root_dir, manifest)
+    if cache is None:
+        return _scan_paths(paths, workers, chunk_size)
+
+    blob_shas = _file_blob_shas(root_dir, paths)
+    cached = cache.get_many(list(blob_shas.values()), SCANNER_VERSION)
+
+    hits = {}
+    misses = []
+    for abs_path, rel_path in paths:
+        sha = blob_shas.get(rel_path)
+        if sha in cached:
+            hits[rel_path] = {"path": rel_path, "content": _read_content(abs_path), **cached[sha]}
+        else:
+            misses.append((abs_path, rel_path))
+
+    scanned = _scan_paths(misses, workers, chunk_size)
+    cache.put_many({blob_shas[rel_path]: scan for rel_path, scan in scanned.items() if rel_path in blob_shas},
+                   SCANNER_VERSION)
+
+    return {rel_path: hits[rel_path] if rel_path in hits else scanned[rel_path] for _, rel_path in paths}
@@ -0,0 +1,74 @@
+import mmap
+import os
+
+
+# Files above this size are inspected through mmap instead of being read whole
+LARGE_FILE_BYTES = int(os.getenv('GITOURS_LARGE_FILE_BYTES', 256 * 1024))
+
+# Most source text of one file kept for the LLM, larger files are truncated
+DEFAULT_MAX_CONTENT_BYTES = int(os.getenv('GITOURS_MAX_CONTENT_BYTES', 200 * 1024))
+
+# A NUL byte in the first this many bytes marks a file as binary (like git)
+BINARY_SNIFF_BYTES = 8192
+
+# Window for counting lines of memory-mapped files
+_COUNT_CHUNK = 1024 ** 2
+
+
+def _count_lines(data, size: int) -> int :
+    """
+    Number of lines (as str.splitlines counts them for "\\n" endings) of
+    bytes or an mmap, read in bounded windows.
+    """
+    if size == 0:
+        return 0
+    lines = 0
+    for start in range(0, size, _COUNT_CHUNK):
+        lines += data[start:start + _COUNT_CHUNK].count(b'\n')
+    return lines + (data[size - 1:size] != b'\n')
+
+def _cut(data: bytes, max_bytes: int) -> bytes :
+    # keep whole lines only
+    head = data[:max_bytes]
+    end = head.rfind(b'\n')
+    return head[:end + 1] if end != -1 else head
+
+def read_source(path: str, max_bytes: int = DEFAULT_MAX_CONTENT_BYTES) -> dict :
+    """
+    Read a source file for the repo summary in bounded memory.
+
+    Returns {"content", "size", "lines", "binary", "truncated"}. Binary
+    files have content None. Files over max_bytes keep only their first
+    whole lines up to max_bytes, large ones are memory-mapped so only that
+    part is ever copied. Bytes that are not valid UTF-8 are replaced
+    instead of failing the run. lines always counts the whole file.
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        if size <= LARGE_FILE_BYTES:
+            data = f.read()
+            binary = b'\0' in data[:BINARY_SNIFF_BYTES]
+            lines = _count_lines(data, len(data))
+            head = _cut(data, max_bytes) if len(data) > max_bytes else data
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                binary = mm.find(b'\0', 0, BINARY_SNIFF_BYTES) != -1
+                lines = _count_lines(mm, size)
+                head = b'' if binary else _cut(mm[:max_bytes + 1], max_bytes)
+
+    truncated = not binary and len(head) < size
+    return {
+        'content':      None if binary else head.decode('utf-8', errors='replace'),
+        'size':         size,
+        'lines':        lines,
+        'binary':       binary,
+        'truncated':    truncated,
+    }
+
+def truncate_text(content: str, max_bytes: int = DEFAULT_MAX_CONTENT_BYTES) -> str :
+    """
+    First whole lines of already decoded content, about max_bytes long.
+    """
+    if len(content) <= max_bytes // 4 or len(content.encode('utf-8', 'surrogatepass')) <= max_bytes:
+        return content
+    return _cut(content.encode('utf-8', 'surrogatepass'), max_bytes).decode('utf-8', errors='replace')
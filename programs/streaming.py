@@ -0,0 +1,523 @@
+"""
+Analyze a repository too large to hold in memory.
+
+Files are scanned one at a time and their reference map records written
+out as NDJSON as they are produced. What later passes need of each file
+(symbol tables, import bindings, class bases, call sites) and every usage
+are spilled to a scratch SQLite database instead of Python dicts. The
+usage map, combined map and cross-reference (the same content as
+itemizer.analyze_usages, combine_maps and cross_reference.CrossReferenceIndex)
+are then streamed out of it, call sites being resolved against per-file
+rows read back on demand.
+
+The memory the analysis adds to the process is kept under a ceiling: the
+spill buffer is flushed early, and more often, as it gets close, and
+MemoryLimitError is raised if it cannot be kept under it.
+
+Outputs use the ndjson layout of RepoArtifacts.save, so RepoArtifacts.load
+reads them back. itemizer.generate_repo_mappings switches to this mode for
+repositories with more Python source than STREAMING_THRESHOLD_BYTES.
+
+Usage (from the project root):
+    python -m programs.streaming /path/to/repo --out-dir data --memory-limit-mb 256
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+from collections import OrderedDict
+
+from .cross_reference import CallResolver, import_bindings, symbol_tables
+from .events import stage
+from .import_resolver import build_module_index, resolve_imports
+from .repo_data import open_repo
+from .scanner import list_python_files, scan_file
+from .walker import walk_repo
+
+
+# Memory ceiling of a streaming analysis, in MiB
+DEFAULT_MEMORY_LIMIT_MB = int(os.getenv('GITOURS_MEMORY_LIMIT_MB', 256))
+
+# Repositories with more Python source than this are analyzed by streaming
+STREAMING_THRESHOLD_BYTES = int(os.getenv('GITOURS_STREAMING_BYTES', 64 * 1024 ** 2))
+
+# Files written by stream_mappings, in order
+STREAM_NAMES = ('reference_map', 'usage_map', 'combined_map', 'cross_reference')
+
+# Rough size of one buffered usage or edge row, for sizing the buffer
+_ROW_BYTES = 200
+
+# Smallest the spill buffer shrinks to when memory runs short
+_MIN_BUFFER_BYTES = 64 * 1024
+
+# Share of the ceiling at which the buffer is flushed early and shrunk
+_FLUSH_AT = 0.75
+
+# Per-file rows kept decoded for call resolution
+_CACHED_FILES = 256
+
+
+class MemoryLimitError(MemoryError):
+    '''
+    A streaming analysis could not be kept under its memory ceiling.
+    '''
+
+
+def rss_bytes() -> int :
+    """
+    Current resident set size of this process, None where it cannot be read.
+    """
+    try :
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError) :
+        return None
+
+def _dump(value) -> str :
+    return json.dumps(value, separators=(',', ':')) + '\n'
+
+def _defined_names(definitions: dict) -> list :
+    # names in the order of itemizer.combine_maps
+    names = definitions.get("functions", []) + definitions.get("variables", [])
+    for cls in definitions.get("classes", []):
+        names.append(cls.get("name"))
+        names += cls.get("methods", [])
+    return names
+
+def _read_content(file_path: str) -> str :
+    try :
+        with open(file_path, "r", encoding="utf-8") as f:
+            return f.read()
+    except Exception :
+        return None
+
+
+class _FileTable:
+    '''
+    Read-only {file: value} view of one field of the spilled per-file rows,
+    read like the tables of CrossReferenceIndex.
+    '''
+    def __init__(self, index, field: str) -> None:
+        self.index = index
+        self.field = field
+
+    def get(self, file: str, default=None) :
+        row = self.index._row(file)
+        return row[self.field] if row is not None else default
+
+    def __getitem__(self, file: str) :
+        row = self.index._row(file)
+        if row is None:
+            raise KeyError(file)
+        return row[self.field]
+
+    def __contains__(self, file: str) -> bool :
+        return self.index._row(file) is not None
+
+
+class _ScanTable(_FileTable):
+    '''
+    {file: scan} view of the spilled rows for the stages after the maps
+    (clone_summary.get_repo_json_tempfile, ranking.rank_symbols): scans
+    without usages and imports, content read back from disk on every
+    access so it is never held longer than the caller needs it.
+    '''
+    def __init__(self, index) -> None:
+        super().__init__(index, 'scan')
+
+    def get(self, file: str, default=None) :
+        row = self.index._row(file)
+        if row is None:
+            return default
+        return dict(row['scan'], content=_read_content(os.path.join(self.index.root_dir, file)))
+
+    def __getitem__(self, file: str) :
+        scan = self.get(file)
+        if scan is None:
+            raise KeyError(file)
+        return scan
+
+
+class SpillIndex(CallResolver):
+    '''
+    Per-file analysis rows, usages and cross-reference edges kept in a
+    scratch SQLite database instead of memory, for stream_mappings.
+
+    Rows are buffered and written in batches. The buffer gets an eighth of
+    memory_limit_mb, SQLite's page cache a quarter, and sorts and temporary
+    tables go to disk. Names keep the order they were first used in and
+    files their walk order, so every query returns its rows in the order of
+    the in-memory maps.
+
+    The memory limit applies to what the process gained since the index
+    was opened: past _FLUSH_AT of it the buffer is flushed at once and
+    halved, and MemoryLimitError is raised when even an empty buffer
+    leaves the process over it.
+
+    Once resolve has run, the index answers the queries the ranking makes
+    of a CrossReferenceIndex (calls_from and the per-file tables), and
+    scans gives the per-file scans without holding them in memory.
+    '''
+    def __init__(self, path: str, memory_limit_mb: int = DEFAULT_MEMORY_LIMIT_MB, root_dir: str = None,
+                 module_index: dict = None) -> None:
+        self.path = path
+        self.root_dir = root_dir
+        self.module_index = module_index if module_index is not None else {}
+        self.memory_limit = memory_limit_mb * 1024 ** 2
+        self.buffer_bytes = max(_MIN_BUFFER_BYTES, self.memory_limit // 8)
+        self.files = 0
+        self.flushes = 0
+        self._baseline = rss_bytes()
+        self._buffered = 0
+        self._rows = []
+        self._usages = []
+        self._edges = []
+        self._cache = OrderedDict()
+
+        # per-file tables of CallResolver, read back from the rows on demand
+        self.file_symbols = _FileTable(self, 'symbols')
+        self.file_classes = _FileTable(self, 'classes')
+        self.class_bases = _FileTable(self, 'class_bases')
+        self.file_imports = _FileTable(self, 'imports')
+        self.bindings = _FileTable(self, 'bindings')
+        self.star_imports = _FileTable(self, 'star_imports')
+        self.scans = _ScanTable(self)
+
+        self._conn = sqlite3.connect(path)
+        self._conn.execute('PRAGMA journal_mode = OFF')
+        self._conn.execute('PRAGMA synchronous = OFF')
+        self._conn.execute('PRAGMA temp_store = FILE')
+        self._conn.execute(f'PRAGMA cache_size = -{max(2048, self.memory_limit // 4 // 1024)}')
+        self._conn.executescript('''
+            CREATE TABLE files (
+                id          INTEGER PRIMARY KEY,
+                path        TEXT NOT NULL UNIQUE
+            );
+            CREATE TABLE rows (
+                file_id     INTEGER PRIMARY KEY,
+                data        TEXT NOT NULL
+            );
+            CREATE TABLE names (
+                id          INTEGER PRIMARY KEY,
+                name        TEXT NOT NULL UNIQUE
+            );
+            CREATE TABLE usages (
+                name_id     INTEGER NOT NULL,
+                file_id     INTEGER NOT NULL,
+                PRIMARY KEY (name_id, file_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE usage_lists (
+                name        TEXT PRIMARY KEY,
+                files       TEXT NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE edges (
+                id          INTEGER PRIMARY KEY,
+                file_id     INTEGER NOT NULL,
+                data        TEXT NOT NULL
+            );
+        ''')
+
+    # ---------------------------------------------------------------- memory
+
+    def memory_used(self) -> int :
+        '''
+        Bytes the process gained since the index was opened, None where
+        the resident set size cannot be read.
+        '''
+        rss = rss_bytes()
+        if rss is None or self._baseline is None:
+            return None
+        return max(0, rss - self._baseline)
+
+    def check_memory(self) -> None :
+        '''
+        Flush early when the process gets close to the memory limit, and
+        raise MemoryLimitError when flushing cannot keep it under.
+        '''
+        used = self.memory_used()
+        if used is None or used < self.memory_limit * _FLUSH_AT:
+            return
+        self.buffer_bytes = max(_MIN_BUFFER_BYTES, self.buffer_bytes // 2)
+        self._cache.clear()
+        self._write()
+        self._conn.execute('PRAGMA shrink_memory')
+        used = self.memory_used()
+        if used is not None and used > self.memory_limit:
+            raise MemoryLimitError(f"Streaming analysis uses {used / 1024 ** 2:.0f} MiB, over its "
+                                   f"{self.memory_limit / 1024 ** 2:.0f} MiB memory limit")
+
+    # ---------------------------------------------------------------- writing
+
+    def add_file(self, record: dict) -> None :
+        '''
+        Record one file of iter_file_records, in walk order.
+        '''
+        self.files += 1
+        definitions = record["definitions"]
+        symbols, classes = symbol_tables(definitions) if definitions is not None else ({}, {})
+        data = _dump({
+            "imports":      record["imports"],
+            "symbols":      symbols,
+            "classes":      {cls: sorted(methods) for cls, methods in classes.items()},
+            "class_bases":  record["class_bases"],
+            "bindings":     record["bindings"],
+            "star_imports": record["star_imports"],
+            "scan": {
+                "path":         record["path"],
+                "definitions":  definitions,
+                "calls":        record["calls"],
+                "class_bases":  record["class_bases"],
+                "symbols":      record["symbols"],
+            },
+        })
+        self._rows.append((self.files, record["path"], data))
+        self._usages.extend((name, self.files) for name in record["usages"])
+        self._buffered += len(data) + _ROW_BYTES * len(record["usages"])
+        if self._buffered >= self.buffer_bytes:
+            self.flush()
+        else:
+            self.check_memory()
+
+    def _write(self) -> None :
+        if not (self._rows or self._usages or self._edges):
+            return
+        with self._conn :
+            self._conn.executemany('INSERT INTO files (id, path) VALUES (?, ?)',
+                                   ((file_id, path) for file_id, path, _ in self._rows))
+            self._conn.executemany('INSERT INTO rows (file_id, data) VALUES (?, ?)',
+                                   ((file_id, data) for file_id, _, data in self._rows))
+            self._conn.executemany('INSERT OR IGNORE INTO names (name) VALUES (?)',
+                                   ((name,) for name, _ in self._usages))
+            self._conn.executemany('INSERT OR IGNORE INTO usages (name_id, file_id) '
+                                   'SELECT id, ? FROM names WHERE name = ?',
+                                   ((file_id, name) for name, file_id in self._usages))
+            self._conn.executemany('INSERT INTO edges (file_id, data) VALUES (?, ?)', self._edges)
+        self._rows, self._usages, self._edges = [], [], []
+        self._buffered = 0
+        self.flushes += 1
+
+    def flush(self) -> None :
+        '''
+        Write the buffered rows and check the process against the limit.
+        '''
+        self._write()
+        self.check_memory()
+
+    def finish(self) -> None :
+        '''
+        Flush the rows; call once every file is added.
+        '''
+        self.flush()
+
+    def resolve(self) :
+        '''
+        Resolve every call site and yield the edges of
+        CrossReferenceIndex.to_cross_reference, in the same order. The edges
+        are kept for calls_from.
+        '''
+        for file_id in range(1, self.files + 1):
+            path, data = self._conn.execute('SELECT f.path, r.data FROM files f JOIN rows r ON r.file_id = f.id '
+                                            'WHERE f.id = ?', (file_id,)).fetchone()
+            for edge in self.file_edges(path, json.loads(data)["scan"]["calls"]):
+                encoded = _dump(edge)
+                self._edges.append((file_id, encoded))
+                self._buffered += len(encoded)
+                yield edge
+            if self._buffered >= self.buffer_bytes:
+                self.flush()
+            else:
+                self.check_memory()
+        self.flush()
+        with self._conn :
+            self._conn.execute('CREATE INDEX edges_file ON edges (file_id, id)')
+
+    # ---------------------------------------------------------------- reading
+
+    def _row(self, file: str) -> dict :
+        if file in self._cache:
+            self._cache.move_to_end(file)
+            return self._cache[file]
+        found = self._conn.execute('SELECT r.data FROM files f JOIN rows r ON r.file_id = f.id '
+                                   'WHERE f.path = ?', (file,)).fetchone()
+        row = None
+        if found is not None:
+            row = json.loads(found[0])
+            row["classes"] = {cls: set(methods) for cls, methods in row["classes"].items()}
+            row["bindings"] = {local: tuple(target) for local, target in row["bindings"].items()}
+        self._cache[file] = row
+        if len(self._cache) > _CACHED_FILES:
+            self._cache.popitem(last=False)
+        return row
+
+    def usage_map(self) :
+        '''
+        Yield (name, [files calling it]) in first-use order, like
+        itemizer.analyze_usages, one name at a time.
+        '''
+        rows = self._conn.execute('''
+            SELECT n.name, f.path FROM usages u
+            JOIN names n ON n.id = u.name_id
+            JOIN files f ON f.id = u.file_id
+            ORDER BY u.name_id, u.file_id''')
+        name, files = None, []
+        for row_name, path in rows:
+            if row_name != name and files:
+                yield name, files
+                files = []
+            name = row_name
+            files.append(path)
+        if files:
+            yield name, files
+
+    def store_usage_map(self, items) -> None :
+        '''
+        Keep the (name, [files]) items of usage_map as one row per name, so
+        usages_of reads a name's files without joining every usage again.
+        '''
+        with self._conn :
+            self._conn.executemany('INSERT INTO usage_lists (name, files) VALUES (?, ?)',
+                                   ((name, json.dumps(files, separators=(',', ':'))) for name, files in items))
+
+    def usages_of(self, name: str) -> list :
+        '''
+        Files calling name, in walk order (see store_usage_map).
+        '''
+        found = self._conn.execute('SELECT files FROM usage_lists WHERE name = ?', (name,)).fetchone()
+        return json.loads(found[0]) if found is not None else []
+
+    def calls_from(self, file: str) -> list :
+        '''
+        Cross-reference edges whose caller is file.
+        '''
+        return [json.loads(data) for data, in self._conn.execute('''
+            SELECT e.data FROM files f
+            JOIN edges e ON e.file_id = f.id
+            WHERE f.path = ? ORDER BY e.id''', (file,))]
+
+    def close(self) -> None :
+        self._conn.close()
+
+
+def iter_file_records(root_dir: str, manifest=None, module_index: dict = None) :
+    """
+    Scan the Python files of root_dir one at a time and yield a record per
+    file: {"path", "imports", "definitions", "usages", "calls",
+    "class_bases", "symbols", "bindings", "star_imports", "bytes"}, imports
+    and bindings resolved like itemizer.analyze_project and
+    CrossReferenceIndex, definitions None for files that could not be
+    parsed. Source text is dropped as soon as the file is parsed.
+    """
+    paths = list_python_files(root_dir, manifest)
+    if module_index is None:
+        module_index = build_module_index(root_dir, [rel_path for _, rel_path in paths])
+    for abs_path, rel_path in paths:
+        scan = scan_file(abs_path, rel_path)
+        parsed = scan["definitions"] is not None
+        bindings, star_imports = import_bindings(rel_path, scan["imports"], module_index, root_dir)
+        yield {
+            "path":         rel_path,
+            "imports":      resolve_imports(scan["imports"], rel_path, module_index, root_dir) if parsed else [],
+            "definitions":  scan["definitions"],
+            "usages":       scan["usages"],
+            "calls":        scan["calls"],
+            "class_bases":  scan["class_bases"],
+            "symbols":      scan["symbols"],
+            "bindings":     bindings,
+            "star_imports": star_imports,
+            "bytes":        len(scan["content"].encode('utf-8', 'surrogatepass')) if scan["content"] else 0,
+        }
+
+def stream_mappings(root_dir: str, out_dir: str, memory_limit_mb: int = DEFAULT_MEMORY_LIMIT_MB,
+                    manifest=None, on_event=None, index: SpillIndex = None) -> dict :
+    """
+    Build the reference, usage and combined maps and the cross-reference of
+    root_dir with bounded memory, written to out_dir as NDJSON (see
+    STREAM_NAMES). Returns {name: path}.
+
+    Without an index, the scratch database lives in out_dir while the
+    analysis runs and is removed afterwards. A SpillIndex passed in is
+    filled and left open for the caller to query (and close). Stage
+    progress is reported to on_event (see events.emit).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {name: os.path.join(out_dir, f'{name}.ndjson') for name in STREAM_NAMES}
+    db_path = None
+    if index is None:
+        fd, db_path = tempfile.mkstemp(suffix='.sqlite3', prefix='spill-', dir=out_dir)
+        os.close(fd)
+        index = SpillIndex(db_path, memory_limit_mb)
+    try :
+        with stage(on_event, 'scan') as info:
+            if manifest is None:
+                manifest = walk_repo(root_dir)
+            index.root_dir = root_dir
+            index.module_index = build_module_index(root_dir, [rel_path for _, rel_path in
+                                                               list_python_files(root_dir, manifest)])
+            files = bytes_read = 0
+            with open(paths['reference_map'], 'w', encoding='utf-8') as f:
+                for record in iter_file_records(root_dir, manifest, index.module_index):
+                    files += 1
+                    bytes_read += record["bytes"]
+                    index.add_file(record)
+                    if record["definitions"] is not None:
+                        f.write(_dump([record["path"], {"imports": record["imports"],
+                                                        "definitions": record["definitions"]}]))
+            index.finish()
+            info['files'] = files
+            info['bytes_read'] = bytes_read
+
+        with stage(on_event, 'usages'):
+            with open(paths['usage_map'], 'w', encoding='utf-8') as f:
+                for item in index.usage_map():
+                    f.write(_dump(list(item)))
+            with open(paths['usage_map'], 'r', encoding='utf-8') as f:
+                index.store_usage_map(json.loads(line) for line in f)
+
+        with stage(on_event, 'combined_map'):
+            with open(paths['reference_map'], 'r', encoding='utf-8') as src, \
+                 open(paths['combined_map'], 'w', encoding='utf-8') as f:
+                for line in src:
+                    file, entry = json.loads(line)
+                    definitions = entry["definitions"]
+                    f.write(_dump([file, {
+                        "imports": entry["imports"],
+                        "definitions": definitions,
+                        "usage": {name: index.usages_of(name) for name in _defined_names(definitions)}
+                    }]))
+
+        with stage(on_event, 'cross_reference') as info:
+            edges = 0
+            with open(paths['cross_reference'], 'w', encoding='utf-8') as f:
+                for edge in index.resolve():
+                    f.write(_dump(edge))
+                    edges += 1
+            info['edges'] = edges
+    finally :
+        if db_path is not None:
+            index.close()
+            os.remove(db_path)
+    return paths
+
+def main(argv: list = None) -> None :
+    parser = argparse.ArgumentParser(prog='streaming', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', help='GitHub URL, local directory or archive')
+    parser.add_argument('--out-dir', default='data', help='where the NDJSON maps go (default %(default)s)')
+    parser.add_argument('--memory-limit-mb', type=int, default=DEFAULT_MEMORY_LIMIT_MB)
+    parser.add_argument('--commit', help='analyze this commit instead of HEAD')
+    args = parser.parse_args(argv)
+
+    repo = open_repo(args.source, commit=args.commit)
+    try :
+        if args.commit is not None:
+            repo.checkout(args.commit)
+        paths = stream_mappings(repo.get_repo_path(), args.out_dir, args.memory_limit_mb)
+    finally :
+        repo._close()
+    for name, path in paths.items():
+        print(f"Saved '{name}' to '{path}'")
+
+
+if __name__ == '__main__':
+    main()
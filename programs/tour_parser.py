@@ -0,0 +1,156 @@
+import json
+import re
+
+
+_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+
+# Next character that can change the parser state, and one whole JSON string
+_STRUCTURAL = re.compile(r'[{}":,\[\]]')
+_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.S)
+
+
+def _loads_object(raw: str) :
+    """
+    json.loads for one object, retrying once without trailing commas.
+    Returns None if it still cannot be decoded.
+    """
+    for text in (raw, _TRAILING_COMMA.sub(r'\1', raw)):
+        try :
+            value = json.loads(text)
+        except json.JSONDecodeError :
+            continue
+        return value if isinstance(value, dict) else None
+    return None
+
+def _loads_sections(raw_sections: dict) -> dict :
+    sections = {}
+    for section_key, raw in raw_sections.items():
+        section = _loads_object(raw)
+        if section is not None:
+            sections[section_key] = section
+    return sections
+
+def parse_summaries(text: str) -> dict :
+    """
+    Recover every complete file and section object from a whole
+    summarization response ({file: {section: {...}}}, see
+    clone_summary.PROMPT_ONE).
+
+    Prose or code fences around the JSON are skipped and trailing commas
+    are tolerated. A file object that is malformed or cut off is recovered
+    section by section, so one broken brace or a truncated response only
+    loses the section it is in. The clients return whole responses, so the
+    text is parsed in one pass rather than incrementally.
+    """
+    # fast path: the outermost object is well-formed
+    start, end = text.find('{'), text.rfind('}')
+    if start != -1 and end > start:
+        try :
+            data = json.loads(text[start:end + 1])
+        except json.JSONDecodeError :
+            data = None
+        if isinstance(data, dict) and all(isinstance(sections, dict) for sections in data.values()):
+            return data
+
+    files, partial = {}, set()
+    raw_sections = {}           # file -> {section: raw text} closed so far
+    stack = []                  # start offsets of the open objects
+    keys = {}                   # depth -> last key seen at that depth
+    last_string = None
+    pos = 0
+    while True:
+        match = _STRUCTURAL.search(text, pos)
+        if match is None:
+            break
+        pos = match.start()
+        char = text[pos]
+        if char == '"':
+            if stack:
+                string = _STRING.match(text, pos)
+                if string is None:
+                    break       # cut off inside a string
+                last_string = string.group()
+                pos = string.end()
+                continue
+        elif char == ':' and last_string is not None:
+            try :
+                keys[len(stack)] = json.loads(last_string)
+            except json.JSONDecodeError :
+                keys[len(stack)] = None
+            last_string = None
+        elif char == '{':
+            stack.append(pos)
+            for depth in [d for d in keys if d >= len(stack)]:
+                del keys[depth]
+            last_string = None
+        elif char == '}':
+            if stack:
+                start = stack.pop()
+                depth = len(stack)
+                file_key = keys.get(1)
+                if depth == 2 and file_key is not None and keys.get(2) is not None:
+                    # only decoded if the whole file object turns out to be unusable
+                    raw_sections.setdefault(file_key, {})[keys[2]] = text[start:pos + 1]
+                elif depth == 1 and file_key is not None:
+                    sections = _loads_object(text[start:pos + 1])
+                    if sections is None:
+                        sections = _loads_sections(raw_sections.pop(file_key, {}))
+                        partial.add(file_key)
+                    else:
+                        raw_sections.pop(file_key, None)
+                        partial.discard(file_key)
+                    if sections:
+                        files.setdefault(file_key, {}).update(sections)
+            last_string = None
+        else:
+            last_string = None
+        pos += 1
+
+    # files whose object never closed keep their completed sections
+    for file_key, sections in raw_sections.items():
+        sections = _loads_sections(sections)
+        if sections:
+            files.setdefault(file_key, {}).update(sections)
+            partial.add(file_key)
+
+    if partial:
+        print(f"Recovered {len(partial)} partially malformed file(s): {sorted(partial)}")
+    return files
+
+def validate_symbols(files: dict, symbol_ids: dict) -> tuple :
+    """
+    Check every section key against the symbol IDs of its file ({path:
+    set of qualified names}, see scanner.symbol_id). Sections naming a
+    symbol the file does not have, and files that do not exist, are
+    dropped. Keys written as full "path::qualname" IDs are accepted, also
+    at the top level instead of a file.
+
+    Returns (valid files, problems) with problems as readable strings.
+    """
+    grouped, problems = {}, []
+    for key, value in files.items():
+        if key not in symbol_ids and '::' in key:
+            path, qualname = key.split('::', 1)
+            grouped.setdefault(path, {})[qualname] = value
+        elif isinstance(value, dict):
+            grouped.setdefault(key, {}).update(value)
+        else:
+            problems.append(f"{key}: expected an object of sections")
+
+    valid = {}
+    for path, sections in grouped.items():
+        if path not in symbol_ids:
+            problems.append(f"{path}: not a file of this repository")
+            continue
+        kept = {}
+        for section, sec_data in sections.items():
+            if not isinstance(sec_data, dict):
+                continue
+            qualname = section[len(path) + 2:] if section.startswith(path + '::') else section
+            if qualname not in symbol_ids[path]:
+                problems.append(f"{path} [{section}]: not a symbol of this file")
+                continue
+            kept[qualname] = sec_data
+        if kept:
+            valid[path] = kept
+    return valid, problems
@@ -0,0 +1,265 @@
+import os
+import re
+
+
+# gitignore-style patterns that are never worth analyzing or sending to the LLM
+DEFAULT_EXCLUDES = (
+    '.git/', '.hg/', '.svn/',
+    '__pycache__/', '.mypy_cache/', '.pytest_cache/', '.ruff_cache/', '.tox/', '.nox/',
+    'node_modules/', 'site-packages/', 'dist-packages/', '.venv/', 'venv/', '.eggs/', '*.egg-info/',
+    '/build/', '/dist/', '/_build/',
+    '*_pb2.py', '*_pb2_grpc.py',
+)
+
+# Extra patterns, comma separated, e.g. GITOURS_EXCLUDE="docs/,examples/,*_generated.py"
+EXTRA_EXCLUDES = tuple(p.strip() for p in os.getenv('GITOURS_EXCLUDE', '').split(',') if p.strip())
+
+# Files larger than this stay in the manifest but are not parsed, only read
+# truncated for the repo summary (0 disables the cap)
+DEFAULT_MAX_FILE_BYTES = int(os.getenv('GITOURS_MAX_FILE_BYTES', 1024 ** 2))
+
+
+def _glob_to_regex(glob: str) -> str :
+    """
+    Translate a gitignore glob ("*", "?", "[...]", "**") into a regex for
+    slash-separated paths.
+    """
+    out, i = [], 0
+    while i < len(glob):
+        if glob.startswith('**/', i):
+            out.append('(?:.*/)?')
+            i += 3
+        elif glob.startswith('**', i):
+            out.append('.*')
+            i += 2
+        elif glob[i] == '*':
+            out.append('[^/]*')
+            i += 1
+        elif glob[i] == '?':
+            out.append('[^/]')
+            i += 1
+        elif glob[i] == '[' and glob.find(']', i + 1) != -1:
+            end = glob.find(']', i + 1)
+            body = glob[i + 1:end]
+            if body.startswith('!'):
+                body = '^' + body[1:]
+            out.append(f'[{body}]')
+            i = end + 1
+        elif glob[i] == '\\' and i + 1 < len(glob):
+            out.append(re.escape(glob[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(glob[i]))
+            i += 1
+    return ''.join(out)
+
+
+class IgnoreRules:
+    '''
+    Patterns of one .gitignore file (or of an exclude list), matched
+    against paths relative to the directory the rules belong to.
+
+    Supports negation ("!"), directory-only patterns (trailing "/"),
+    anchored patterns (containing a "/") and "**".
+    '''
+    def __init__(self, lines) -> None:
+        self.rules = []
+        for line in lines:
+            line = line.rstrip('\n').rstrip()
+            if not line or line.startswith('#'):
+                continue
+            negate = line.startswith('!')
+            if negate or line.startswith('\\!') or line.startswith('\\#'):
+                line = line[1:]
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            if not line:
+                continue
+            anchored = '/' in line
+            pattern = _glob_to_regex(line.lstrip('/'))
+            regex = re.compile(pattern + '$' if anchored else '(?:.*/)?' + pattern + '$')
+            self.rules.append((regex, negate, dir_only))
+
+    @classmethod
+    def from_file(cls, path: str) :
+        try :
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                return cls(f.readlines())
+        except OSError :
+            return None
+
+    def match(self, rel_path: str, is_dir: bool) :
+        '''
+        True if ignored, False if explicitly re-included, None if no rule
+        applies. The last matching rule wins.
+        '''
+        result = None
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path):
+                result = not negate
+        return result
+
+
+def _ignored(stack: list, rel_path: str, is_dir: bool) -> bool :
+    # stack holds (base dir relative to the root, rules), outermost first
+    ignored = False
+    for base, rules in stack:
+        if base and not rel_path.startswith(base + '/'):
+            continue
+        result = rules.match(rel_path[len(base) + 1:] if base else rel_path, is_dir)
+        if result is not None:
+            ignored = result
+    return ignored
+
+def _is_virtualenv(path: str) -> bool :
+    return os.path.isfile(os.path.join(path, 'pyvenv.cfg'))
+
+
+class FileManifest:
+    '''
+    The files of one checkout that survived walk_repo, in walk order,
+    shared by every stage that needs to list files.
+
+    entries holds (abs_path, rel_path, size) tuples (size is None when
+    walked without a size cap), oversized maps the relative paths of the
+    entries over the size cap to their size. Those are listed like any other
+    file but left out of parsing (see paths).
+    '''
+    def __init__(self, root_dir: str, entries: list, oversized: dict) -> None:
+        self.root_dir = root_dir
+        self.entries = entries
+        self.oversized = oversized
+
+    def __len__(self) -> int :
+        return len(self.entries)
+
+    def paths(self, extensions: tuple = None, oversized: bool = True) -> list :
+        '''
+        (abs_path, rel_path) pairs, optionally only those with one of the
+        given extensions (e.g. ('.py',)). oversized=False leaves out the
+        files over the size cap, for the stages that parse files.
+        '''
+        return [(abs_path, rel_path) for abs_path, rel_path, _ in self.entries
+                if (extensions is None or rel_path.endswith(extensions))
+                and (oversized or rel_path not in self.oversized)]
+
+    def total_bytes(self, extensions: tuple = None, oversized: bool = True) -> int :
+        '''
+        Summed size of the files, optionally only those with one of the
+        given extensions and without the ones over the size cap. Files
+        walked without a size cap are stat'ed.
+        '''
+        return sum(size if size is not None else os.path.getsize(abs_path)
+                   for abs_path, rel_path, size in self.entries
+                   if (extensions is None or rel_path.endswith(extensions))
+                   and (oversized or rel_path not in self.oversized))
+
+
+def _exclude_rules(excludes) -> IgnoreRules :
+    return IgnoreRules(DEFAULT_EXCLUDES + EXTRA_EXCLUDES if excludes is None else excludes)
+
+def walk_repo(root_dir: str, excludes: tuple = None, max_file_bytes: int = DEFAULT_MAX_FILE_BYTES,
+              use_gitignore: bool = True) -> FileManifest :
+    """
+    Walk root_dir with os.scandir, top-down in the same order as os.walk,
+    and return the FileManifest of the files to analyze.
+
+    Directories matching excludes (gitignore-style patterns, default
+    DEFAULT_EXCLUDES plus GITOURS_EXCLUDE), ignored by a .gitignore or
+    .git/info/exclude, or holding a virtualenv are pruned without being
+    entered. Files over max_file_bytes are listed as oversized. Symlinked
+    directories are not followed. Paths are relative to root_dir with OS separators.
+    """
+    stack = [('', _exclude_rules(excludes))]
+    if use_gitignore:
+        info_exclude = IgnoreRules.from_file(os.path.join(root_dir, '.git', 'info', 'exclude'))
+        if info_exclude is not None:
+            stack.append(('', info_exclude))
+
+    entries, oversized = [], {}
+    checked = any(rules.rules for _, rules in stack) or use_gitignore
+    to_os = (lambda path: path) if os.sep == '/' else (lambda path: path.replace('/', os.sep))
+
+    def walk(dir_path: str, rel_dir: str) -> None :
+        pushed = False
+        if use_gitignore:
+            rules = IgnoreRules.from_file(os.path.join(dir_path, '.gitignore'))
+            if rules is not None and rules.rules:
+                stack.append((rel_dir, rules))
+                pushed = True
+        try :
+            with os.scandir(dir_path) as it:
+                dir_entries = list(it)
+        except OSError :
+            dir_entries = []
+
+        subdirs = []
+        for entry in dir_entries:
+            rel_path = f'{rel_dir}/{entry.name}' if rel_dir else entry.name
+            try :
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError :
+                continue
+            if checked and _ignored(stack, rel_path, is_dir):
+                continue
+            if not is_dir and entry.is_symlink() and entry.is_dir():
+                # os.walk does not list symlinked directories as files either
+                continue
+            if is_dir:
+                if not _is_virtualenv(entry.path):
+                    subdirs.append((entry.path, rel_path))
+                continue
+            if max_file_bytes:
+                try :
+                    size = entry.stat().st_size
+                except OSError :
+                    continue
+                if size > max_file_bytes:
+                    oversized[to_os(rel_path)] = size
+            else:
+                size = None
+            entries.append((entry.path, to_os(rel_path), size))
+
+        for sub_path, sub_rel in subdirs:
+            walk(sub_path, sub_rel)
+        if pushed:
+            stack.pop()
+
+    walk(root_dir, '')
+    if oversized:
+        print(f"Not parsing {len(oversized)} file(s) over {max_file_bytes} bytes: {sorted(oversized)}")
+    return FileManifest(root_dir, entries, oversized)
+
+def is_excluded(root_dir: str, rel_path: str, excludes: tuple = None, max_file_bytes: int = DEFAULT_MAX_FILE_BYTES,
+                use_gitignore: bool = True) -> bool :
+    """
+    Whether the file at rel_path is left out of parsing because it or one
+    of its directories is excluded or ignored, or it is over max_file_bytes
+    (see FileManifest.oversized). Used for single changed files, without
+    walking the tree.
+    """
+    try :
+        if max_file_bytes and os.path.getsize(os.path.join(root_dir, rel_path)) > max_file_bytes:
+            return True
+    except OSError :
+        pass
+    parts = rel_path.replace(os.sep, '/').split('/')
+    stack = [('', _exclude_rules(excludes))]
+    if use_gitignore:
+        info_exclude = IgnoreRules.from_file(os.path.join(root_dir, '.git', 'info', 'exclude'))
+        if info_exclude is not None:
+            stack.append(('', info_exclude))
+    for depth in range(len(parts)):
+        rel_dir = '/'.join(parts[:depth])
+        if use_gitignore:
+            rules = IgnoreRules.from_file(os.path.join(root_dir, *parts[:depth], '.gitignore'))
+            if rules is not None and rules.rules:
+                stack.append((rel_dir, rules))
+        is_dir = depth < len(parts) - 1
+        if _ignored(stack, '/'.join(parts[:depth + 1]), is_dir):
+            return True
+        if is_dir and _is_virtualenv(os.path.join(root_dir, *parts[:depth + 1])):
+            return True
+    return False
@@ -0,0 +1,71 @@
+import os
+import subprocess
+
+import pytest
+
+
+def git(repo_dir: str, *args: str) -> str :
+    """
+    Run git in repo_dir with a fixed identity and return its stdout.
+    """
+    return subprocess.run(['git', '-C', repo_dir, '-c', 'user.email=tests@example.com', '-c', 'user.name=tests',
+                           *args], check=True, capture_output=True, text=True).stdout.strip()
+
+def write_files(root_dir: str, files: dict) -> None :
+    for rel_path, content in files.items():
+        path = os.path.join(root_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+def commit_all(repo_dir: str, message: str = 'commit') -> str :
+    git(repo_dir, 'add', '-A')
+    git(repo_dir, 'commit', '-q', '-m', message)
+    return git(repo_dir, 'rev-parse', 'HEAD')
+
+
+@pytest.fixture
+def make_git_repo(tmp_path):
+    """
+    Factory for a committed git repository with the given {path: content}
+    files; returns its directory.
+    """
+    def make(files: dict, name: str = 'repo') -> str :
+        repo_dir = str(tmp_path / name)
+        os.makedirs(repo_dir)
+        git(repo_dir, 'init', '-q', '-b', 'main')
+        write_files(repo_dir, files)
+        commit_all(repo_dir, 'initial')
+        return repo_dir
+    return make
+
+@pytest.fixture
+def make_bare_repo(tmp_path, make_git_repo):
+    """
+    Factory for a bare repository with two commits: the given files, then
+    a change to app.py. Returns (bare repo path, [first, second commit]).
+    """
+    def make(files: dict) -> tuple :
+        work_dir = make_git_repo(files, name='work')
+        first = git(work_dir, 'rev-parse', 'HEAD')
+        write_files(work_dir, {'app.py': files.get('app.py', '') + '\ndef added():\n    pass\n'})
+        second = commit_all(work_dir, 'second')
+        bare_dir = str(tmp_path / 'bare.git')
+        subprocess.run(['git', 'clone', '-q', '--bare', work_dir, bare_dir], check=True)
+        return bare_dir, [first, second]
+    return make
+
+def summary_inputs(root_dir: str) -> tuple :
+    """
+    (cross_reference, repo_summary) of a git repository, as the pipeline
+    passes them to clone_summary.summarize_with_llm_2. The summary is read
+    into a dict, its file goes away with the repo.
+    """
+    from programs import clone_summary, itemizer
+
+    repo = itemizer.generate_repo_mappings(root_dir)
+    try :
+        clone_summary.get_repo_json_tempfile(repo)
+        return repo.get_mappings().cross_reference, dict(repo.get_repo_json_data().items())
+    finally :
+        repo._close()
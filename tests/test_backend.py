@@ -0,0 +1,61 @@
+import importlib
+import os
+import threading
+
+import pytest
+
+from programs.jobs import JobQueue
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    # keep the module-level caches out of the home directory
+    monkeypatch.setenv('GITOURS_ANALYSIS_CACHE', str(tmp_path / 'analysis.sqlite3'))
+    monkeypatch.setenv('GITOURS_LLM_CACHE', str(tmp_path / 'llm.sqlite3'))
+    module = importlib.import_module('backend.backend')
+    monkeypatch.setattr(module, 'RECORD_DIR', str(tmp_path / 'records'))
+    return module
+
+
+def _capture_runs(backend, monkeypatch) -> list :
+    runs = []
+    def fake_generate_tour(repo_url, **kwargs):
+        runs.append(kwargs)
+        return {'steps': []}
+    monkeypatch.setattr(backend, 'generate_tour', fake_generate_tour)
+    return runs
+
+def test_jobs_save_no_records_by_default(backend, monkeypatch):
+    runs = _capture_runs(backend, monkeypatch)
+    monkeypatch.setattr(backend, 'SAVE_RECORDS', False)
+    backend.run_pipeline('https://github.com/owner/repo')
+    assert runs[0]['save_record'] is False
+    assert not os.path.exists(backend.RECORD_DIR)
+
+def test_saved_records_get_a_directory_per_job(backend, monkeypatch):
+    runs = _capture_runs(backend, monkeypatch)
+    monkeypatch.setattr(backend, 'SAVE_RECORDS', True)
+    backend.run_pipeline('https://github.com/owner/repo')
+    backend.run_pipeline('https://github.com/owner/repo')
+    assert all(run['save_record'] for run in runs)
+    assert runs[0]['record_dir'] != runs[1]['record_dir']
+    assert sorted(os.listdir(backend.RECORD_DIR)) == sorted(os.path.basename(run['record_dir']) for run in runs)
+
+def test_get_retrieve_does_not_wait_for_the_job(backend, monkeypatch):
+    release = threading.Event()
+    def run(repo_url, commit=None, on_event=None):
+        release.wait(10)
+        return {'steps': ['step']}
+    monkeypatch.setattr(backend, 'jobs', JobQueue(run, max_workers=1))
+    client = backend.app.test_client()
+
+    response = client.get('/retrieve/github.com/owner/repo?commit=abc123')
+    assert response.status_code == 202
+    job_id = response.get_json()['job_id']
+    assert response.headers['Location'] == f'/jobs/{job_id}'
+
+    release.set()
+    backend.jobs.get(job_id).done.wait(10)
+    # the same pinned commit is served from the finished job
+    response = client.get('/retrieve/github.com/owner/repo?commit=abc123')
+    assert response.status_code == 200 and response.get_json() == {'steps': ['step']}
@@ -0,0 +1,42 @@
+import os
+
+from benchmarks.fake_openai_server import FakeChatClient
+
+from programs.analysis_cache import AnalysisCache
+from programs.batch import run_batch
+from programs.llm_cache import LLMCache
+from programs.llm_executor import RateLimiter
+
+
+class CountingRateLimiter(RateLimiter):
+    def __init__(self) -> None:
+        super().__init__()
+        self.acquired = 0
+
+    def acquire(self, tokens: int = 0) -> None :
+        self.acquired += 1
+        super().acquire(tokens)
+
+
+def _project(name: str) -> dict :
+    return {
+        f'{name}/__init__.py': '',
+        f'{name}/core.py': 'def run():\n    return helper()\n\ndef helper():\n    return 1\n',
+        'main.py': f'from {name}.core import run\n\nif __name__ == "__main__":\n    run()\n',
+    }
+
+
+def test_batch_shares_one_rate_limiter(make_git_repo, tmp_path):
+    sources = [(make_git_repo(_project(name), name=name), None) for name in ('alpha', 'beta', 'gamma')]
+    client = FakeChatClient()
+    limiter = CountingRateLimiter()
+
+    summary = run_batch(sources, str(tmp_path / 'tours'), jobs=3, client=client, rate_limiter=limiter,
+                        analysis_cache=AnalysisCache(str(tmp_path / 'analysis.sqlite3')),
+                        llm_cache=LLMCache(str(tmp_path / 'llm.sqlite3')))
+
+    assert summary['done'] == 3
+    assert all(os.path.exists(os.path.join(tmp_path, 'tours', record['tour'])) for record in summary['repos'])
+    # every request of every repository went through the one limiter
+    assert client.requests >= 3
+    assert limiter.acquired == client.requests
@@ -0,0 +1,29 @@
+import json
+
+from programs.codetours import parse_prompt_1
+
+
+def test_line_spans_come_from_the_symbol_table():
+    response = json.dumps({'app.py': {
+        'main': {'order': 2, 'summary': 'Entry point.', 'core': True},
+        'helper': {'order': 1, 'summary': 'Not core.', 'core': False},
+        'ghost': {'order': 3, 'summary': 'Unknown symbol.', 'core': True},
+    }})
+    symbols = {'app.py::main': {'lineno': 4, 'end_lineno': 9}, 'app.py::helper': {'lineno': 1, 'end_lineno': 2}}
+
+    assert parse_prompt_1(response, symbols) == [
+        {'path': 'app.py', 'symbol': 'app.py::main', 'line_start': 4, 'line_end': 9, 'summary': 'Entry point.',
+         'order': 2},
+    ]
+
+def test_line_spans_come_from_the_response_without_a_symbol_table():
+    response = json.dumps({'app.py': {
+        '4': {'RECOMMENDED_ORDER_NUMBER': 1, 'STARTING_LINE_NUMBER': 4, 'LINE_NUMBER_END': 9,
+              'SUMMARY': 'Entry point.', 'CORE': True},
+        '12': {'RECOMMENDED_ORDER_NUMBER': 2, 'STARTING_LINE_NUMBER': 12, 'SUMMARY': 'No end line.', 'CORE': True},
+    }})
+
+    assert parse_prompt_1(response) == [
+        {'path': 'app.py', 'symbol': 'app.py::4', 'line_start': 4, 'line_end': 9, 'summary': 'Entry point.',
+         'order': 1},
+    ]
@@ -0,0 +1,198 @@
+import json
+import os
+
+import pytest
+
+from benchmarks.synthetic_repo import generate_repo
+from conftest import commit_all, git, write_files
+
+from programs import itemizer
+from programs.repo_data import gitRepo
+from programs.scanner import scan_project
+
+
+INITIAL_FILES = {
+    'pkg/__init__.py': 'from .core import Engine\n',
+    'pkg/core.py': (
+        'from .util import helper\n'
+        '\n'
+        'class Engine:\n'
+        '    def run(self):\n'
+        '        return helper()\n'
+        '\n'
+        'def start():\n'
+        '    return Engine().run()\n'
+    ),
+    'pkg/util.py': (
+        'def helper():\n'
+        '    return 1\n'
+        '\n'
+        'def unused():\n'
+        '    pass\n'
+    ),
+    'app.py': (
+        'from pkg.core import start\n'
+        'from legacy import old_entry\n'
+        'from gone import vanish\n'
+        '\n'
+        'def main():\n'
+        '    start()\n'
+        '    old_entry()\n'
+        '    vanish()\n'
+    ),
+    'legacy.py': (
+        'from pkg.util import helper\n'
+        '\n'
+        'def old_entry():\n'
+        '    return helper()\n'
+    ),
+    'gone.py': (
+        'def vanish():\n'
+        '    pass\n'
+    ),
+    # never changed, but its imports only resolve once modern.py and pkg/tools.py exist
+    'client.py': (
+        'import modern\n'
+        'from pkg import tools\n'
+        '\n'
+        'def use():\n'
+        '    modern.old_entry()\n'
+        '    tools.helper()\n'
+    ),
+}
+
+
+def _normalized(mappings) -> dict :
+    # list order differs between a patched and a rebuilt result, contents must not
+    return {
+        'reference_map': mappings.reference_map,
+        'usage_map': {name: sorted(files) for name, files in mappings.usage_map.items()},
+        'combined_map': {file: dict(entry, usage={name: sorted(files) for name, files in entry['usage'].items()})
+                         for file, entry in mappings.combined_map.items()},
+        'cross_reference': sorted(json.dumps(edge, sort_keys=True) for edge in mappings.cross_reference),
+    }
+
+def _full_build(root_dir: str):
+    return itemizer.build_mappings(root_dir, scan_project(root_dir))
+
+@pytest.fixture
+def repo(make_git_repo):
+    # a full clone, so the tests can commit to it and diff against the clone
+    repo = gitRepo(make_git_repo(INITIAL_FILES), clone_mode='full')
+    yield repo
+    repo._close()
+
+
+def test_update_mappings_matches_full_rebuild(repo):
+    root_dir = repo.get_repo_path()
+    old_commit = repo.get_commit()
+    mappings = _full_build(root_dir)
+
+    # modify, add, delete and rename (one unchanged, one edited) in one commit
+    write_files(root_dir, {
+        'pkg/core.py': (
+            'from .tools import helper, unused\n'
+            '\n'
+            'class Engine:\n'
+            '    def run(self):\n'
+            '        unused()\n'
+            '        return helper()\n'
+            '\n'
+            '    def stop(self):\n'
+            '        pass\n'
+        ),
+        'pkg/extra.py': (
+            'from .core import Engine\n'
+            '\n'
+            'def start():\n'
+            '    Engine().stop()\n'
+        ),
+        'app.py': (
+            'from pkg.extra import start\n'
+            'from modern import old_entry\n'
+            '\n'
+            'def main():\n'
+            '    start()\n'
+            '    old_entry()\n'
+        ),
+    })
+    os.remove(os.path.join(root_dir, 'gone.py'))
+    git(root_dir, 'mv', 'legacy.py', 'modern.py')
+    git(root_dir, 'mv', 'pkg/util.py', 'pkg/tools.py')
+    with open(os.path.join(root_dir, 'pkg', 'tools.py'), 'a', encoding='utf-8') as f:
+        f.write('\ndef more():\n    return helper()\n')
+    commit_all(root_dir, 'change')
+
+    changes = repo.diff_name_status(old_commit)
+    assert {status[0] for status, _, _ in changes} >= {'M', 'A', 'D', 'R'}
+
+    updated = itemizer.update_mappings(mappings, root_dir, changes)
+    assert _normalized(updated) == _normalized(_full_build(root_dir))
+
+
+def test_update_mappings_without_module_changes(repo):
+    root_dir = repo.get_repo_path()
+    old_commit = repo.get_commit()
+    mappings = _full_build(root_dir)
+
+    # pkg/util.py is unchanged, but unused() gets its first caller
+    write_files(root_dir, {'gone.py': 'from pkg.util import unused\n\ndef vanish():\n    unused()\n'})
+    commit_all(root_dir, 'modify only')
+
+    updated = itemizer.update_mappings(mappings, root_dir, repo.diff_name_status(old_commit))
+    assert _normalized(updated) == _normalized(_full_build(root_dir))
+
+
+def test_update_mappings_patches_the_cross_reference_in_place(repo, monkeypatch):
+    root_dir = repo.get_repo_path()
+    old_commit = repo.get_commit()
+    mappings = _full_build(root_dir)
+    cross_reference = mappings.cross_reference
+
+    # a non-Python file is added, so the module index is kept
+    write_files(root_dir, {'README.md': '# docs\n', 'pkg/util.py': 'def helper():\n    return 2\n'})
+    commit_all(root_dir, 'docs and an edit')
+    def no_rebuild(*args, **kwargs):
+        raise AssertionError('the module index was rebuilt')
+    monkeypatch.setattr(itemizer, 'build_module_index', no_rebuild)
+
+    updated = itemizer.update_mappings(mappings, root_dir, repo.diff_name_status(old_commit))
+    monkeypatch.undo()
+    assert updated.cross_reference is cross_reference
+    assert _normalized(updated) == _normalized(_full_build(root_dir))
+
+def test_update_mappings_rebuilds_when_a_gitignore_changes(repo):
+    root_dir = repo.get_repo_path()
+    old_commit = repo.get_commit()
+    mappings = _full_build(root_dir)
+
+    # legacy.py itself is unchanged, but the walk leaves it out from now on
+    write_files(root_dir, {'.gitignore': 'legacy.py\n'})
+    commit_all(root_dir, 'ignore legacy')
+
+    updated = itemizer.update_mappings(mappings, root_dir, repo.diff_name_status(old_commit))
+    assert 'legacy.py' not in updated.reference_map
+    assert _normalized(updated) == _normalized(_full_build(root_dir))
+
+def test_find_imports_without_module_index_does_not_parse_the_project(make_git_repo, monkeypatch):
+    root_dir = make_git_repo(INITIAL_FILES)
+    expected = itemizer.analyze_project(root_dir)['app.py']['imports']
+
+    def no_scan(*args, **kwargs):
+        raise AssertionError('find_imports parsed the whole project')
+    monkeypatch.setattr(itemizer, 'scan_project', no_scan)
+    assert itemizer.find_imports(os.path.join(root_dir, 'app.py'), root_dir=root_dir) == expected
+
+def test_parallel_analysis_matches_the_serial_one(tmp_path):
+    root_dir = generate_repo(str(tmp_path / 'repo'), file_count=60, symbols_per_file=4)
+    serial_scans = scan_project(root_dir, workers=1)
+    # small chunks, so the pool gets several of them per worker
+    parallel_scans = scan_project(root_dir, workers=4, chunk_size=7)
+    assert list(parallel_scans) == list(serial_scans) and parallel_scans == serial_scans
+
+    serial = (itemizer.analyze_project(root_dir, workers=1), itemizer.analyze_usages(root_dir, workers=1))
+    for parallel in ((itemizer.analyze_project(root_dir, workers=4), itemizer.analyze_usages(root_dir, workers=4)),
+                     (itemizer.analyze_project(root_dir, scans=parallel_scans),
+                      itemizer.analyze_usages(root_dir, scans=parallel_scans))):
+        # same content in the same order, down to the usage lists
+        assert json.dumps(parallel) == json.dumps(serial)
@@ -0,0 +1,201 @@
+import json
+
+import pytest
+
+from benchmarks.fake_openai_server import FakeChatClient
+from conftest import summary_inputs
+
+from programs import clone_summary, llm_executor
+from programs.llm_executor import LLMExecutor, LLMRequestError, RateLimiter
+
+
+class FailingClient:
+    '''
+    Echoes prompts, but fails every request whose prompt contains marker.
+    '''
+    def __init__(self, marker: str) -> None:
+        self.marker = marker
+        self.calls = []
+
+    def __call__(self, system_prompt: str, prompt: str, timeout: float = None) -> str :
+        self.calls.append(prompt)
+        if self.marker in prompt:
+            raise LLMRequestError(f"rejected {prompt}")
+        return prompt.upper()
+
+
+class FakeClock:
+    '''
+    Stands in for the time module: sleep() advances the clock instead of
+    blocking and every sleep is recorded.
+    '''
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float :
+        return self.now
+
+    perf_counter = monotonic
+
+    def sleep(self, seconds: float) -> None :
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class ScriptedClient:
+    '''
+    Raises the queued errors in turn, then answers; records the clock
+    time of every call.
+    '''
+    def __init__(self, clock: FakeClock, errors: list = ()) -> None:
+        self.clock = clock
+        self.errors = list(errors)
+        self.times = []
+
+    def __call__(self, system_prompt: str, prompt: str, timeout: float = None) -> str :
+        self.times.append(self.clock.now)
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+
+class FlakyChatClient(FakeChatClient):
+    '''
+    FakeChatClient failing its first `failures` requests that mention marker.
+    '''
+    def __init__(self, marker: str, failures: int = 1) -> None:
+        super().__init__()
+        self.marker = marker
+        self.failures = failures
+
+    def __call__(self, system_prompt: str, prompt: str, timeout: float = None) -> str :
+        if self.marker in prompt and self.failures:
+            self.failures -= 1
+            self.requests += 1
+            raise LLMRequestError('HTTP 500', retryable=True)
+        return super().__call__(system_prompt, prompt, timeout)
+
+
+@pytest.mark.parametrize('max_concurrency', [1, 4])
+def test_failed_request_does_not_discard_the_others(max_concurrency):
+    client = FailingClient('bad')
+    executor = LLMExecutor(client=client, max_concurrency=max_concurrency, max_retries=0)
+    requests = [('system', prompt) for prompt in ('one', 'bad', 'three', 'four')]
+
+    finished, failed = {}, {}
+    results = executor.run(requests, on_result=finished.__setitem__, on_error=failed.__setitem__)
+
+    assert results == ['ONE', None, 'THREE', 'FOUR']
+    assert finished == {0: 'ONE', 2: 'THREE', 3: 'FOUR'}
+    assert list(failed) == [1] and isinstance(failed[1], LLMRequestError)
+
+@pytest.mark.parametrize('max_concurrency', [1, 4])
+def test_failed_request_is_raised_after_the_others_without_on_error(max_concurrency):
+    client = FailingClient('bad')
+    executor = LLMExecutor(client=client, max_concurrency=max_concurrency, max_retries=0)
+    finished = {}
+    with pytest.raises(LLMRequestError):
+        executor.run([('system', prompt) for prompt in ('bad', 'two', 'three')], on_result=finished.__setitem__)
+    assert sorted(client.calls) == ['bad', 'three', 'two']
+    assert finished == {1: 'TWO', 2: 'THREE'}
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_executor, 'time', clock)
+    return clock
+
+def test_rate_limiter_spaces_requests_once_the_bucket_is_empty(clock):
+    limiter = RateLimiter(requests_per_minute=60)
+    times = []
+    for _ in range(63):
+        limiter.acquire()
+        times.append(clock.now)
+    # the full bucket lets the first 60 through at once, then one per second
+    assert times[:60] == [1000.0] * 60
+    assert times[60:] == pytest.approx([1001.0, 1002.0, 1003.0])
+
+def test_rate_limiter_refills_tokens_over_time(clock):
+    limiter = RateLimiter(tokens_per_minute=600)
+    limiter.acquire(600)
+    clock.now += 30
+    limiter.acquire(300)
+    assert clock.sleeps == []
+    # the bucket is empty again: 100 tokens take 10 seconds to refill
+    limiter.acquire(100)
+    assert sum(clock.sleeps) == pytest.approx(10)
+    # requests larger than the bucket wait for a full bucket, not forever
+    limiter.acquire(5000)
+    assert sum(clock.sleeps) == pytest.approx(70)
+
+def test_rate_limiter_blocks_on_the_tighter_limit(clock):
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=60)
+    limiter.acquire(60)
+    limiter.acquire(30)
+    assert sum(clock.sleeps) == pytest.approx(30)
+
+def test_retries_back_off_with_full_jitter(clock, monkeypatch):
+    bounds = []
+    monkeypatch.setattr(llm_executor.random, 'uniform', lambda low, high: bounds.append((low, high)) or high)
+    errors = [LLMRequestError('HTTP 500', retryable=True) for _ in range(4)]
+    client = ScriptedClient(clock, errors)
+    executor = LLMExecutor(client=client, rate_limiter=RateLimiter(), max_retries=4, base_delay=1.0, max_delay=5.0)
+
+    assert executor.call('system', 'prompt') == 'ok'
+    # exponential caps, clipped at max_delay, jittered down from 0
+    assert bounds == [(0, 1.0), (0, 2.0), (0, 4.0), (0, 5.0)]
+    assert [b - a for a, b in zip(client.times, client.times[1:])] == [1.0, 2.0, 4.0, 5.0]
+    assert executor.stats()['retries'] == 4 and executor.stats()['requests'] == 1
+
+def test_retry_after_overrides_the_backoff(clock, monkeypatch):
+    monkeypatch.setattr(llm_executor.random, 'uniform', lambda low, high: pytest.fail('jitter used'))
+    client = ScriptedClient(clock, [LLMRequestError('HTTP 429', retryable=True, retry_after=7.5)])
+    executor = LLMExecutor(client=client, rate_limiter=RateLimiter(), max_retries=2)
+
+    assert executor.call('system', 'prompt') == 'ok'
+    assert clock.sleeps == [7.5] and client.times == [1000.0, 1007.5]
+
+def test_retries_stop_after_max_retries_and_on_fatal_errors(clock):
+    client = ScriptedClient(clock, [LLMRequestError('HTTP 503', retryable=True) for _ in range(5)])
+    executor = LLMExecutor(client=client, rate_limiter=RateLimiter(), max_retries=2)
+    with pytest.raises(LLMRequestError, match='503'):
+        executor.call('system', 'prompt')
+    assert len(client.times) == 3 and executor.stats()['retries'] == 2
+
+    client = ScriptedClient(clock, [LLMRequestError('HTTP 400'), LLMRequestError('HTTP 500', retryable=True)])
+    executor = LLMExecutor(client=client, rate_limiter=RateLimiter(), max_retries=2)
+    with pytest.raises(LLMRequestError, match='400'):
+        executor.call('system', 'prompt')
+    assert len(client.times) == 1 and executor.stats()['retries'] == 0
+
+def test_retries_go_through_the_rate_limiter(clock):
+    client = ScriptedClient(clock, [LLMRequestError('HTTP 429', retryable=True, retry_after=0.5)])
+    executor = LLMExecutor(client=client, rate_limiter=RateLimiter(requests_per_minute=1), max_retries=1)
+    assert executor.call('system', 'prompt') == 'ok'
+    # the retry waits out the 0.5s Retry-After, then the rest of the 60s request spacing
+    assert client.times == pytest.approx([1000.0, 1060.0])
+
+
+FILES = {f'pkg/module{i}.py': f'def function{i}():\n    return {i}\n' for i in range(6)}
+
+def test_summarize_re_requests_the_files_of_a_failed_batch(make_git_repo):
+    cross_reference, repo_summary = summary_inputs(make_git_repo(FILES))
+    client = FlakyChatClient('pkg/module3.py')
+    events = []
+
+    response = clone_summary.summarize_with_llm_2(
+        cross_reference, repo_summary, token_budget=300,
+        executor=LLMExecutor(client=client, max_retries=0),
+        on_event=lambda event, data: events.append((event, data)))
+
+    failed = [data for event, data in events if event == 'chunk_failed']
+    assert len(failed) == 1 and 'pkg/module3.py' in failed[0]['files']
+    assert not [data for event, data in events if event == 'missing']
+    assert set(json.loads(response)) == set(FILES)
+
+def test_summarize_raises_when_every_batch_fails(make_git_repo):
+    cross_reference, repo_summary = summary_inputs(make_git_repo(FILES))
+    with pytest.raises(LLMRequestError):
+        clone_summary.summarize_with_llm_2(cross_reference, repo_summary,
+                                           executor=LLMExecutor(client=FailingClient('pkg/'), max_retries=0))
@@ -0,0 +1,37 @@
+import os
+import time
+
+from conftest import commit_all, git, write_files
+
+from programs.mirror_cache import MirrorCache, _LAST_FETCHED_FILE
+
+
+def _head(path: str) -> str :
+    return git(path, 'rev-parse', 'HEAD')
+
+
+def test_fetch_is_throttled_on_last_fetch_not_last_use(make_git_repo, tmp_path):
+    source = make_git_repo({'app.py': 'def main():\n    pass\n'})
+    cache = MirrorCache(cache_dir=str(tmp_path / 'mirrors'), fetch_interval=60)
+
+    first = str(tmp_path / 'first')
+    mirror_path = cache.add_worktree(source, first)
+    assert _head(first) == _head(source)
+
+    write_files(source, {'app.py': 'def main():\n    return 1\n'})
+    new_commit = commit_all(source, 'second')
+
+    # within the interval the mirror is reused as-is
+    second = str(tmp_path / 'second')
+    cache.add_worktree(source, second)
+    assert _head(second) != new_commit
+
+    # recent use must not postpone the fetch once the last fetch is old
+    stale = time.time() - 120
+    os.utime(os.path.join(mirror_path, _LAST_FETCHED_FILE), (stale, stale))
+    third = str(tmp_path / 'third')
+    cache.add_worktree(source, third)
+    assert _head(third) == new_commit
+
+    for dest in (first, second, third):
+        cache.remove_worktree(source, dest)
@@ -0,0 +1,38 @@
+import os
+
+from benchmarks.fake_openai_server import FakeChatClient
+
+from programs.llm_executor import LLMExecutor
+from programs.pipeline import generate_tour
+
+
+FILES = {
+    'app/__init__.py': '',
+    'app/service.py': 'def handle():\n    return render()\n\ndef render():\n    return ""\n',
+    'main.py': 'from app.service import handle\n\nif __name__ == "__main__":\n    handle()\n',
+}
+
+
+def test_records_go_to_the_run_record_dir_only(make_git_repo, tmp_path, monkeypatch):
+    source = make_git_repo(FILES)
+    cwd = tmp_path / 'cwd'
+    cwd.mkdir()
+    monkeypatch.chdir(cwd)
+
+    record_dirs = [str(tmp_path / 'records' / name) for name in ('first', 'second')]
+    for record_dir in record_dirs:
+        tour = generate_tour(source, executor=LLMExecutor(client=FakeChatClient()), save_record=True,
+                             record_dir=record_dir)
+        assert tour['steps']
+
+    for record_dir in record_dirs:
+        assert {'llm_prompt.txt', 'llm_response.txt', 'cross_reference.json'} <= set(os.listdir(record_dir))
+    # nothing is dumped into the working directory of the process
+    assert os.listdir(cwd) == []
+
+def test_nothing_is_written_without_save_record(make_git_repo, tmp_path, monkeypatch):
+    source = make_git_repo(FILES)
+    monkeypatch.chdir(tmp_path)
+    before = set(os.listdir(tmp_path))
+    generate_tour(source, executor=LLMExecutor(client=FakeChatClient()))
+    assert set(os.listdir(tmp_path)) == before
@@ -0,0 +1,83 @@
+import json
+
+from benchmarks.fake_openai_server import FakeChatClient
+from conftest import summary_inputs
+
+from programs import clone_summary
+from programs.llm_executor import LLMExecutor
+from programs.prompt_planner import estimate_tokens, merge_batch_results, plan_batches
+
+
+class RecordingClient(FakeChatClient):
+    def __init__(self) -> None:
+        super().__init__()
+        self.prompts = []
+
+    def __call__(self, system_prompt: str, prompt: str, timeout: float = None) -> str :
+        self.prompts.append((system_prompt, prompt))
+        return super().__call__(system_prompt, prompt, timeout)
+
+
+def _project(modules: int = 24) -> dict :
+    # every module calls into the one before it, so batches share cross-reference edges
+    files = {'pkg/__init__.py': ''}
+    for i in range(modules):
+        body = f'from pkg.module{i - 1} import function{i - 1}\n\n' if i else ''
+        body += f'def function{i}(value):\n    """Step {i} of the pipeline."""\n'
+        body += f'    return function{i - 1}(value) + {i}\n' if i else '    return value\n'
+        body += f'\nclass Stage{i}:\n    def run(self):\n        return function{i}({i})\n'
+        files[f'pkg/module{i}.py'] = body
+    return files
+
+
+def test_plan_batches_respects_the_budget():
+    repo_summary = {f'dir{i % 3}/file{i}.py': {'content': 'x' * (200 + 37 * i)} for i in range(30)}
+    cross_reference = [{'symbol': f's{i}', 'symbol_type': 'function', 'used_in': f'dir{i % 3}/file{i}.py',
+                        'defined_in': f'dir{(i + 1) % 3}/file{(i + 1) % 30}.py'} for i in range(30)]
+    budget = 1500
+
+    batches = plan_batches(repo_summary, cross_reference, budget, overhead_tokens=100)
+
+    assert len(batches) > 1
+    planned = [path for batch in batches for path in batch['files']]
+    assert sorted(planned) == sorted(repo_summary) and len(planned) == len(set(planned))
+    for batch in batches:
+        assert batch['tokens'] <= budget
+        touching = [edge for edge in cross_reference
+                    if edge['used_in'] in batch['files'] or edge['defined_in'] in batch['files']]
+        assert batch['cross_reference'] == touching
+
+def test_file_over_the_budget_gets_a_batch_of_its_own():
+    repo_summary = {'a.py': {'content': 'a' * 400}, 'big.py': {'content': 'b' * 8000}, 'c.py': {'content': 'c' * 400}}
+    batches = plan_batches(repo_summary, [], token_budget=1000)
+    assert [list(batch['files']) for batch in batches] == [['a.py'], ['big.py'], ['c.py']]
+
+def test_merge_batch_results_shifts_order_past_earlier_batches():
+    merged = merge_batch_results([
+        {'a.py': {'a.py::f': {'order': 1, 'summary': 'f'}, 'a.py::g': {'order': 2, 'summary': 'g'}}},
+        {},
+        {'b.py': {'b.py::h': {'order': 1, 'summary': 'h'}}, 'broken.py': 'not a dict'},
+        {'a.py': {'a.py::k': {'order': 1, 'summary': 'k'}}},
+    ])
+    assert {file: {sid: entry['order'] for sid, entry in sections.items()} for file, sections in merged.items()} == {
+        'a.py': {'a.py::f': 1, 'a.py::g': 2, 'a.py::k': 4},
+        'b.py': {'b.py::h': 3},
+    }
+
+
+def test_summarize_sends_budgeted_batches_and_merges_every_symbol(make_git_repo):
+    cross_reference, repo_summary = summary_inputs(make_git_repo(_project()))
+    client = RecordingClient()
+    budget = 2500
+
+    response = json.loads(clone_summary.summarize_with_llm_2(
+        cross_reference, repo_summary, token_budget=budget, executor=LLMExecutor(client=client)))
+
+    assert len(client.prompts) > 1
+    for system_prompt, prompt in client.prompts:
+        assert estimate_tokens(system_prompt) + estimate_tokens(prompt) <= budget
+
+    expected = {path: set(entry['symbol_ids']) for path, entry in repo_summary.items() if entry.get('symbol_ids')}
+    assert {path: set(sections) for path, sections in response.items()} == expected
+    orders = [section['order'] for sections in response.values() for section in sections.values()]
+    assert sorted(orders) == list(range(1, len(orders) + 1))
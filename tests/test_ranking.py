@@ -0,0 +1,52 @@
+from programs import clone_summary as get_files
+from programs import itemizer
+from programs.ranking import rank_symbols
+
+
+# Apart from the app.py make_bare_repo adds, the entry points are console
+# scripts only: no main function and no __main__ guard
+FILES = {
+    'pyproject.toml': '[project.scripts]\nbuild-index = "pkg.indexer:build"\n',
+    'setup.cfg': '[options.entry_points]\nconsole_scripts =\n    serve-index = pkg.server:serve\n',
+    'README.md': '# project\n',
+    'pkg/__init__.py': '',
+    'pkg/indexer.py': (
+        'from .storage import save\n'
+        '\n'
+        'def build():\n'
+        '    save(collect())\n'
+        '\n'
+        'def collect():\n'
+        '    return []\n'
+    ),
+    'pkg/server.py': (
+        'from .storage import load\n'
+        '\n'
+        'def serve():\n'
+        '    return load()\n'
+    ),
+    'pkg/storage.py': (
+        'def save(items):\n'
+        '    pass\n'
+        '\n'
+        'def load():\n'
+        '    return []\n'
+    ),
+}
+
+
+def test_console_scripts_are_entry_points_in_a_sparse_clone(make_bare_repo):
+    bare_dir, _ = make_bare_repo(FILES)
+    # a file:// URL is cloned; a plain path would be analyzed in place
+    repo = itemizer.generate_repo_mappings('file://' + bare_dir, clone_mode='sparse')
+    try :
+        assert repo.clone_mode == 'sparse'
+        get_files.get_repo_json_tempfile(repo)
+        artifacts = repo.get_mappings()
+        ranking = rank_symbols(artifacts.symbols, artifacts.scans, artifacts.index, top_k=4)
+    finally :
+        repo._close()
+
+    assert {'pkg/indexer.py::build', 'pkg/server.py::serve'} <= set(ranking['entry_points'])
+    assert ranking['selected'][0] in ranking['entry_points']
+    assert len(ranking['selected']) == 4
@@ -0,0 +1,100 @@
+import io
+import os
+import tarfile
+
+import pytest
+
+from conftest import git
+
+from programs.mirror_cache import MirrorCache
+from programs.repo_data import gitRepo, localRepo
+
+
+FILES = {
+    'app.py': 'from pkg.core import run\n\ndef main():\n    run()\n',
+    'pkg/__init__.py': '',
+    'pkg/core.py': 'def run():\n    pass\n',
+    'pkg/.gitignore': 'generated/\n',
+    '.gitignore': 'build/\n',
+    'pyproject.toml': '[project.scripts]\ntool = "app:main"\n',
+    'setup.cfg': '[metadata]\nname = tool\n',
+    'docs/logo.png': 'png',
+    'README.md': '# readme\n',
+    'data/table.csv': 'a,b\n',
+}
+
+# Files every mode must check out: sources, images, .gitignore and root packaging files
+REQUIRED = ['app.py', 'pkg/core.py', 'pkg/.gitignore', '.gitignore', 'pyproject.toml', 'setup.cfg', 'docs/logo.png']
+
+
+def _exists(repo: gitRepo, rel_path: str) -> bool :
+    return os.path.isfile(os.path.join(repo.get_repo_path(), rel_path))
+
+
+@pytest.mark.parametrize('clone_mode', ['full', 'shallow', 'sparse', 'mirror'])
+def test_clone_modes_check_out_head(make_bare_repo, tmp_path, clone_mode):
+    bare_dir, commits = make_bare_repo(FILES)
+    mirror_cache = MirrorCache(cache_dir=str(tmp_path / 'mirrors')) if clone_mode == 'mirror' else None
+    repo = gitRepo(bare_dir, clone_mode=clone_mode, mirror_cache=mirror_cache)
+    try :
+        assert repo.clone_mode == clone_mode
+        assert repo.get_commit() == commits[-1]
+        for rel_path in REQUIRED:
+            assert _exists(repo, rel_path), rel_path
+    finally :
+        repo._close()
+    assert not os.path.exists(repo.get_repo_path())
+
+def test_sparse_clone_skips_unread_files(make_bare_repo):
+    bare_dir, _ = make_bare_repo(FILES)
+    repo = gitRepo(bare_dir, clone_mode='sparse')
+    try :
+        assert not _exists(repo, 'README.md')
+        assert not _exists(repo, 'data/table.csv')
+    finally :
+        repo._close()
+
+def test_shallow_clone_fetches_older_commits_on_demand(make_bare_repo):
+    bare_dir, commits = make_bare_repo(FILES)
+    repo = gitRepo(bare_dir, clone_mode='shallow')
+    try :
+        assert git(repo.get_repo_path(), 'rev-parse', '--is-shallow-repository') == 'true'
+        assert [status for status, _, _ in repo.diff_name_status(commits[0])] == ['M']
+        repo.checkout(commits[0])
+        assert repo.get_commit() == commits[0]
+    finally :
+        repo._close()
+
+def test_failed_clone_mode_falls_back_to_full(make_bare_repo, monkeypatch):
+    bare_dir, commits = make_bare_repo(FILES)
+    def failing_commands(self, clone_mode):
+        if clone_mode == 'sparse':
+            return [['git', 'clone', '--no-such-option', bare_dir, self.tempdir]]
+        return [['git', 'clone', '-q', bare_dir, self.tempdir]]
+    monkeypatch.setattr(gitRepo, '_clone_commands', failing_commands)
+    repo = gitRepo(bare_dir, clone_mode='sparse')
+    try :
+        assert repo.clone_mode == 'full'
+        assert repo.get_commit() == commits[-1]
+    finally :
+        repo._close()
+
+def test_unknown_clone_mode_is_rejected():
+    with pytest.raises(ValueError):
+        gitRepo('https://github.com/example/project', clone_mode='partial')
+
+def test_archive_extracts_the_files_the_pipeline_reads(tmp_path):
+    archive = str(tmp_path / 'project.tar.gz')
+    with tarfile.open(archive, 'w:gz') as tf:
+        for rel_path, content in FILES.items():
+            data = content.encode('utf-8')
+            info = tarfile.TarInfo('project-main/' + rel_path)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    repo = localRepo(archive)
+    try :
+        for rel_path in REQUIRED:
+            assert _exists(repo, rel_path), rel_path
+        assert not _exists(repo, 'README.md')
+    finally :
+        repo._close()
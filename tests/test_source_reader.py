@@ -0,0 +1,101 @@
+import os
+
+import pytest
+
+from conftest import write_files
+
+from programs import clone_summary, source_reader
+from programs.repo_data import localRepo
+from programs.scanner import scan_project
+from programs.source_reader import BINARY_SNIFF_BYTES, read_source, truncate_text
+from programs.walker import walk_repo
+
+
+def _write(tmp_path, data: bytes) -> str :
+    path = tmp_path / 'file.py'
+    path.write_bytes(data)
+    return str(path)
+
+@pytest.fixture(params=[False, True], ids=['read', 'mmap'])
+def large_files(request, monkeypatch):
+    """
+    Runs a test once reading files whole and once through mmap, checking
+    that mmap is used exactly when expected.
+    """
+    mapped = []
+    real_mmap = source_reader.mmap.mmap
+    def spy(*args, **kwargs):
+        mapped.append(args)
+        return real_mmap(*args, **kwargs)
+    monkeypatch.setattr(source_reader.mmap, 'mmap', spy)
+    if request.param:
+        monkeypatch.setattr(source_reader, 'LARGE_FILE_BYTES', 16)
+    yield
+    assert bool(mapped) == request.param
+
+
+def test_small_file_is_read_whole(tmp_path, large_files):
+    source = read_source(_write(tmp_path, b'def f():\n    return 1\n'))
+    assert source == {'content': 'def f():\n    return 1\n', 'size': 22, 'lines': 2, 'binary': False,
+                      'truncated': False}
+
+def test_nul_byte_near_the_start_marks_a_binary_file(tmp_path, large_files):
+    source = read_source(_write(tmp_path, b'\x89PNG\r\n\x1a\n\0\0\0\rIHDR' + b'x' * 100))
+    assert source['binary'] and source['content'] is None and not source['truncated']
+
+def test_nul_byte_past_the_sniff_window_is_text(tmp_path, large_files):
+    data = b'x = 1\n' * (BINARY_SNIFF_BYTES // 6 + 1) + b'\0\n'
+    source = read_source(_write(tmp_path, data), max_bytes=len(data))
+    assert not source['binary'] and source['content'].endswith('\0\n')
+
+def test_bad_encoding_is_replaced(tmp_path, large_files):
+    source = read_source(_write(tmp_path, b'name = "caf\xe9"\nvalue = "\xff\xfe"\n'))
+    assert source['content'] == 'name = "caf�"\nvalue = "��"\n'
+    assert source['lines'] == 2 and not source['binary']
+
+def test_truncation_keeps_whole_lines_and_counts_all_of_them(tmp_path, large_files):
+    data = b''.join(b'line_%03d = %d\n' % (i, i) for i in range(100))
+    source = read_source(_write(tmp_path, data), max_bytes=50)
+    # 15-byte lines: three fit in 50 bytes
+    assert source['content'] == 'line_000 = 0\nline_001 = 1\nline_002 = 2\n'
+    assert source['truncated'] and source['lines'] == 100 and source['size'] == len(data)
+
+def test_last_line_without_newline_is_counted(tmp_path, large_files):
+    assert read_source(_write(tmp_path, b'a = 1\nb = 2\nc = 3'))['lines'] == 3
+
+def test_truncate_text_cuts_at_a_line_in_utf8_bytes():
+    text = 'é = 1\n' * 10
+    assert truncate_text(text, max_bytes=1000) is text
+    assert truncate_text(text, max_bytes=20) == 'é = 1\n' * 2
+
+
+def test_repo_summary_is_written_per_file_and_keeps_oversized_files(tmp_path):
+    big = ''.join(f'value_{i} = {i}\n' for i in range(30_000))
+    root_dir = str(tmp_path / 'repo')
+    write_files(root_dir, {'small.py': 'def f():\n    return 1\n', 'big.py': big})
+    assert len(big) > source_reader.DEFAULT_MAX_CONTENT_BYTES
+
+    repo = localRepo(root_dir)
+    try :
+        # big.py is too large to parse, but stays in the manifest
+        manifest = walk_repo(root_dir, max_file_bytes=len(big) - 1)
+        assert list(manifest.oversized) == ['big.py']
+        repo.set_manifest(manifest)
+        repo.set_scans(scan_project(root_dir, manifest=manifest))
+        assert list(repo.get_scans()) == ['small.py']
+
+        clone_summary.get_repo_json_tempfile(repo)
+        summary = repo.get_repo_json_data()
+
+        assert os.path.isfile(os.path.join(repo.get_mapping_path(), 'repo_summary.ndjson'))
+        assert sorted(summary) == ['big.py', 'small.py']
+        assert summary['small.py']['content'] == 'def f():\n    return 1\n'
+        assert summary['small.py']['symbol_ids'] == ['<module>', 'f']
+        entry = summary['big.py']
+        assert entry['truncated'] and entry['lines'] == 30_000 and big.startswith(entry['content'])
+        assert len(entry['content'].encode()) <= source_reader.DEFAULT_MAX_CONTENT_BYTES
+        assert entry['symbol_ids'] == ['<module>']
+        # the summary holds the content now, the scans do not
+        assert repo.get_scans()['small.py']['content'] is None
+    finally :
+        repo._close()
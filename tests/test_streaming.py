@@ -0,0 +1,207 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from benchmarks.fake_openai_server import FakeChatClient
+from benchmarks.synthetic_repo import generate_repo
+
+from programs import clone_summary, itemizer
+from programs.artifacts import NDJSONList, NDJSONMap, RepoArtifacts
+from programs.cross_reference import CrossReferenceIndex
+from programs.llm_executor import LLMExecutor
+from programs.pipeline import generate_tour
+from programs.scanner import scan_project
+from programs.streaming import MemoryLimitError, SpillIndex, rss_bytes, stream_mappings
+
+
+FILES = {
+    'pkg/__init__.py': 'from .core import Engine, start\nfrom .helpers import *\n',
+    'pkg/core.py': textwrap.dedent('''\
+        from .helpers import clean
+
+        LIMIT = 3
+
+        class Base:
+            def setup(self):
+                return clean("")
+
+        class Engine(Base):
+            def run(self):
+                self.setup()
+                return clean("run")
+
+        def start():
+            return Engine().run()
+    '''),
+    'pkg/helpers.py': 'def clean(text):\n    return text.strip()\n\ndef shout(text):\n    return text.upper()\n',
+    'app.py': textwrap.dedent('''\
+        import pkg.core as core
+        from pkg import Engine, shout, start
+
+        class Turbo(Engine):
+            def boost(self):
+                return self.run()
+
+        def main():
+            start()
+            core.start()
+            Turbo().boost()
+            return shout("done")
+
+        if __name__ == "__main__":
+            main()
+    '''),
+    'broken.py': 'def oops(:\n    start()\n',
+}
+
+
+def _in_memory_maps(root_dir: str) -> dict :
+    scans = scan_project(root_dir)
+    reference_map = itemizer.analyze_project(root_dir, scans=scans)
+    usage_map = itemizer.analyze_usages(root_dir, scans=scans)
+    return {
+        'reference_map': reference_map,
+        'usage_map': usage_map,
+        'combined_map': itemizer.combine_maps(reference_map, usage_map),
+        'cross_reference': CrossReferenceIndex(reference_map, scans, root_dir).to_cross_reference(),
+    }
+
+
+def test_streamed_maps_match_the_in_memory_maps(make_git_repo, tmp_path):
+    root_dir = make_git_repo(FILES)
+    paths = stream_mappings(root_dir, str(tmp_path / 'out'), memory_limit_mb=16)
+
+    streamed = {name: RepoArtifacts.load(path) for name, path in paths.items()}
+    expected = _in_memory_maps(root_dir)
+    assert streamed == expected
+    # resolved through imports, re-exports and base classes, not by bare name
+    assert {'symbol': 'run', 'symbol_type': 'method', 'used_in': 'app.py',
+            'defined_in': 'pkg/core.py'} in streamed['cross_reference']
+    # the scratch database is gone
+    assert sorted(os.listdir(tmp_path / 'out')) == sorted(f'{name}.ndjson' for name in paths)
+
+def test_large_repos_are_streamed_through_the_pipeline(make_git_repo, tmp_path, monkeypatch):
+    source = make_git_repo(FILES)
+    expected = generate_tour(source, executor=LLMExecutor(client=FakeChatClient()))
+
+    monkeypatch.setattr(itemizer, 'STREAMING_THRESHOLD_BYTES', 0)
+    record_dir = str(tmp_path / 'record')
+    tour = generate_tour(source, executor=LLMExecutor(client=FakeChatClient()), save_record=True,
+                         record_dir=record_dir)
+
+    assert tour['steps'] and tour == expected
+    assert {'cross_reference.ndjson', 'combined_map.ndjson'} <= set(os.listdir(record_dir))
+
+def test_streamed_index_answers_the_ranking_queries(make_git_repo):
+    repo = itemizer.generate_repo_mappings(make_git_repo(FILES), streaming=True)
+    try :
+        index = repo.get_mappings().index
+        expected = CrossReferenceIndex(_in_memory_maps(repo.get_repo_path())['reference_map'],
+                                       scan_project(repo.get_repo_path()), repo.get_repo_path())
+        for file in FILES:
+            assert index.calls_from(file) == expected.calls_from(file)
+            assert index.bindings.get(file, {}) == expected.bindings.get(file, {})
+            assert index.file_classes.get(file, {}) == expected.file_classes.get(file, {})
+        assert repo.get_scans()['app.py']['content'] == FILES['app.py']
+    finally :
+        repo._close()
+
+def test_streamed_cross_reference_and_summary_are_read_lazily(make_git_repo):
+    repo = itemizer.generate_repo_mappings(make_git_repo(FILES), streaming=True)
+    try :
+        clone_summary.get_repo_json_tempfile(repo)
+        artifacts = repo.get_mappings()
+        assert isinstance(artifacts.cross_reference, NDJSONList)
+        assert isinstance(artifacts.repo_summary, NDJSONMap)
+
+        expected = _in_memory_maps(repo.get_repo_path())['cross_reference']
+        assert list(artifacts.cross_reference) == expected
+        assert [artifacts.cross_reference[i] for i in reversed(range(len(expected)))] == expected[::-1]
+        assert sorted(artifacts.repo_summary) == sorted(FILES)
+        assert artifacts.repo_summary['app.py']['content'] == FILES['app.py']
+        assert dict(artifacts.repo_summary.items())['pkg/core.py'] == artifacts.repo_summary['pkg/core.py']
+    finally :
+        repo._close()
+
+@pytest.mark.skipif(rss_bytes() is None, reason='resident set size is not readable here')
+def test_memory_limit_is_enforced(tmp_path):
+    index = SpillIndex(str(tmp_path / 'spill.sqlite3'), memory_limit_mb=4)
+    buffer_bytes = index.buffer_bytes
+    ballast = b'x' * (16 * 1024 ** 2)
+    try :
+        with pytest.raises(MemoryLimitError):
+            index.add_file({"path": 'a.py', "imports": [], "definitions": None, "usages": ['f'], "calls": [],
+                            "class_bases": {}, "symbols": [], "bindings": {}, "star_imports": []})
+        # the buffered rows were flushed before giving up, and the buffer shrunk
+        assert index.flushes == 1 and index.buffer_bytes < buffer_bytes
+    finally :
+        del ballast
+        index.close()
+
+
+_PEAK_RSS_CHILD = '''
+import json, resource, sys
+from programs.streaming import stream_mappings
+
+def peak():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+before = peak()
+stream_mappings(sys.argv[1], sys.argv[2], int(sys.argv[3]))
+print(json.dumps({'growth': peak() - before}))
+'''
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='needs the resource module')
+def test_peak_rss_stays_under_the_limit_on_a_large_repo(tmp_path):
+    # 800 files with ~6k usages and ~7k resolved edges: the in-memory maps
+    # of this repo grow the process by more than twice the limit
+    root_dir = generate_repo(str(tmp_path / 'repo'), file_count=800)
+    limit_mb = 16
+    child = subprocess.run([sys.executable, '-c', _PEAK_RSS_CHILD, root_dir, str(tmp_path / 'out'), str(limit_mb)],
+                           capture_output=True, text=True, check=True,
+                           cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    growth = json.loads(child.stdout.strip().splitlines()[-1])['growth']
+    assert growth < limit_mb * 1024 ** 2
+
+
+_PIPELINE_PEAK_RSS_CHILD = '''
+import json, resource, sys
+from benchmarks.fake_openai_server import FakeChatClient
+from programs.llm_executor import LLMExecutor
+from programs.pipeline import generate_tour
+
+def peak():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+before = peak()
+tour = generate_tour(sys.argv[1], executor=LLMExecutor(client=FakeChatClient()), streaming=True,
+                     memory_limit_mb=int(sys.argv[2]))
+print(json.dumps({'growth': peak() - before, 'steps': len(tour['steps'])}))
+'''
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='needs the resource module')
+def test_peak_rss_of_the_streamed_pipeline_does_not_grow_with_the_sources(tmp_path):
+    # ~27 MiB of source: held in the scans and again in the repo summary,
+    # the run would grow by well over twice the limit
+    root_dir = generate_repo(str(tmp_path / 'repo'), file_count=600, symbols_per_file=4, call_density=2)
+    padding = ''.join(f'# padding line {i:05d} of commentary the analysis never keeps in memory\n'
+                      for i in range(500))
+    for dir_path, _, names in os.walk(root_dir):
+        for name in names:
+            if name.endswith('.py') and name != '__init__.py':
+                with open(os.path.join(dir_path, name), 'a', encoding='utf-8') as f:
+                    f.write('\n' + padding)
+
+    limit_mb = 16
+    child = subprocess.run([sys.executable, '-c', _PIPELINE_PEAK_RSS_CHILD, root_dir, str(limit_mb)],
+                           capture_output=True, text=True, check=True,
+                           cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    result = json.loads(child.stdout.strip().splitlines()[-1])
+    assert result['steps']
+    # the analysis stays under the limit; the ranking graph and one batch
+    # of prompts come on top of it, the sources never do
+    assert result['growth'] < 2 * limit_mb * 1024 ** 2
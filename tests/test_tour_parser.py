@@ -0,0 +1,75 @@
+import json
+
+from programs.tour_parser import parse_summaries, validate_symbols
+
+
+SECTIONS = {
+    'app.py': {
+        'main': {'order': 1, 'summary': 'Entry point, calls "start".', 'core': True},
+        'helper': {'order': 2, 'summary': 'Formats {braces} and \\ escapes.', 'core': False},
+    },
+    'pkg/core.py': {
+        'Engine.run': {'order': 3, 'summary': 'Runs the engine.', 'core': True},
+    },
+}
+
+
+def test_well_formed_response():
+    assert parse_summaries(json.dumps(SECTIONS)) == SECTIONS
+
+def test_prose_and_code_fences_are_skipped():
+    text = f'Here is the tour for "app.py":\n```json\n{json.dumps(SECTIONS, indent=2)}\n```\nAnything else {{?}}'
+    assert parse_summaries(text) == SECTIONS
+
+def test_trailing_commas_are_tolerated():
+    text = json.dumps(SECTIONS, indent=2).replace('true\n', 'true,\n').replace('}\n', '},\n')
+    assert parse_summaries(text) == SECTIONS
+
+def test_malformed_section_only_loses_itself():
+    text = json.dumps(SECTIONS).replace('"order": 2,', '"order": 2 oops')
+    assert parse_summaries(text) == {
+        'app.py': {'main': SECTIONS['app.py']['main']},
+        'pkg/core.py': SECTIONS['pkg/core.py'],
+    }
+
+def test_truncated_response_keeps_the_completed_sections():
+    text = json.dumps(SECTIONS)
+    # cut inside the second section of the first file, and inside a string
+    for cut in (text.index('"Formats'), text.index('braces')):
+        assert parse_summaries(text[:cut]) == {'app.py': {'main': SECTIONS['app.py']['main']}}
+    # cut after the first file closed
+    text = json.dumps(SECTIONS, indent=2)
+    assert parse_summaries(text[:text.index('"Engine.run"')]) == {'app.py': SECTIONS['app.py']}
+
+def test_garbage_yields_nothing():
+    assert parse_summaries('') == {}
+    assert parse_summaries('I could not summarize this repository.') == {}
+    assert parse_summaries('{"app.py": "not sections"}') == {}
+
+
+SYMBOL_IDS = {'app.py': {'main', 'helper'}, 'pkg/core.py': {'Engine', 'Engine.run'}}
+
+def test_validate_symbols_keeps_known_symbols():
+    assert validate_symbols(SECTIONS, SYMBOL_IDS) == (SECTIONS, [])
+
+def test_validate_symbols_accepts_full_symbol_ids():
+    files = {
+        'app.py': {'app.py::main': SECTIONS['app.py']['main']},
+        'pkg/core.py::Engine.run': SECTIONS['pkg/core.py']['Engine.run'],
+    }
+    assert validate_symbols(files, SYMBOL_IDS) == (
+        {'app.py': {'main': SECTIONS['app.py']['main']}, 'pkg/core.py': SECTIONS['pkg/core.py']}, [])
+
+def test_validate_symbols_drops_unknown_files_and_symbols():
+    files = {
+        'app.py': {'main': {'order': 1}, 'ghost': {'order': 2}, 'helper': 'not an object'},
+        'missing.py': {'main': {'order': 3}},
+        'notes': 'not sections',
+    }
+    valid, problems = validate_symbols(files, SYMBOL_IDS)
+    assert valid == {'app.py': {'main': {'order': 1}}}
+    assert sorted(problems) == [
+        'app.py [ghost]: not a symbol of this file',
+        'missing.py: not a file of this repository',
+        'notes: expected an object of sections',
+    ]